@@ -23,7 +23,9 @@ from __future__ import print_function
 import os
 import time
 import copy
+import inspect
 import logging
+import functools
 from datetime import datetime
 from salt._compat import string_types
 
@@ -53,6 +55,29 @@ except ImportError:
 log = logging.getLogger(__name__)
 
 
+def _releases_job(func):
+    '''
+    Drop the event subscriptions of the job ``jid`` once the wrapped
+    LocalClient method is done collecting its returns
+    '''
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def wrapper(self, jid, *args, **kwargs):
+            try:
+                for ret in func(self, jid, *args, **kwargs):
+                    yield ret
+            finally:
+                self._unsubscribe_job(jid)
+    else:
+        @functools.wraps(func)
+        def wrapper(self, jid, *args, **kwargs):
+            try:
+                return func(self, jid, *args, **kwargs)
+            finally:
+                self._unsubscribe_job(jid)
+    return wrapper
+
+
 def get_local_client(
         c_path=os.path.join(syspaths.CONFIG_DIR, 'master'),
         mopts=None,
@@ -118,6 +143,9 @@ class LocalClient(object):
                 self.opts['sock_dir'],
                 self.opts['transport'],
                 listen=not self.opts.get('__worker', False))
+        # The tags subscribed to for the jobs whose returns are still to be
+        # collected
+        self._job_tags = {}
 
         self.returners = salt.loader.returners(self.opts, {})
 
@@ -170,6 +198,39 @@ class LocalClient(object):
             print('Range server exception: {0}'.format(err))
             return []
 
+    def _job_tracked(self):
+        '''
+        Return whether the job tracker of the master reports on the jobs
+        '''
+        return self.opts.get('job_tracker', False) and \
+            not self.opts['order_masters']
+
+    def _subscribe_job(self, jid):
+        '''
+        Only receive the events of the job from now on, together with the
+        events of the other jobs whose returns are still to be collected
+        '''
+        tags = [jid]
+        if self._job_tracked():
+            for suffix in ('running', 'complete'):
+                tags.append(salt.utils.event.tagify([jid, suffix], 'job'))
+        for tag in tags:
+            self.event.subscribe(tag)
+        self._job_tags[jid] = tags
+        self.event.unsubscribe('')
+
+    def _unsubscribe_job(self, jid):
+        '''
+        Drop the subscriptions of the job, once no job is left the client
+        receives every event again
+        '''
+        if jid not in self._job_tags:
+            return
+        if len(self._job_tags) == 1:
+            self.event.subscribe('')
+        for tag in self._job_tags.pop(jid):
+            self.event.unsubscribe(tag)
+
     def _get_timeout(self, timeout):
         '''
         Return the timeout to use
@@ -251,12 +312,18 @@ class LocalClient(object):
             ret='',
             timeout=None,
             kwarg=None,
+            listen=True,
             **kwargs):
         '''
         Asynchronously send a command to connected minions
 
         Prep the job directory and publish a command to any targeted minions.
 
+        :param listen: Only receive the events of the job on this client until
+            its returns are collected by one of the ``get_*returns`` methods.
+            Pass ``False`` when the returns are not collected with this
+            client.
+
         :return: A dictionary of (validated) ``pub_data`` or an empty
             dictionary on failure. The ``pub_data`` contains the job ID and a
             list of all minions that are expected to return data.
@@ -282,7 +349,12 @@ class LocalClient(object):
             timeout=self._get_timeout(timeout),
             **kwargs)
 
-        return self._check_pub_data(pub_data)
+        pub_data = self._check_pub_data(pub_data)
+        if pub_data and listen:
+            # Only the events of this job are needed from now on, have the
+            # publisher drop the others
+            self._subscribe_job(pub_data['jid'])
+        return pub_data
 
     def cmd_async(
             self,
@@ -312,6 +384,7 @@ class LocalClient(object):
                                 arg,
                                 expr_form,
                                 ret,
+                                listen=False,
                                 **kwargs)
         try:
             return pub_data['jid']
@@ -778,6 +851,7 @@ class LocalClient(object):
             if len(found.intersection(minions)) >= len(minions):
                 raise StopIteration()
 
+    @_releases_job
     def get_iter_returns(
             self,
             jid,
@@ -809,6 +883,11 @@ class LocalClient(object):
             yield {}
             # stop the iteration, since the jid is invalid
             raise StopIteration()
+        if self._job_tracked():
+            for ret in self._get_tracked_returns(
+                    jid, minions, timeout, expect_minions, **kwargs):
+                yield ret
+            raise StopIteration()
         # Wait for the hosts to check in
         syndic_wait = 0
         last_time = False
@@ -886,6 +965,19 @@ class LocalClient(object):
                         yield {minion: {'failed': True}}
                 break
             if int(time.time()) > timeout_at:
+                # Pick up the returns the event listener missed from the
+                # event journal before asking the minions
+                for raw in self._journal_returns(jid, found):
+                    found.add(raw['id'])
+                    if kwargs.get('raw', False):
+                        yield raw
+                        continue
+                    ret = {raw['id']: {'ret': raw['return']}}
+                    if 'out' in raw:
+                        ret[raw['id']]['out'] = raw['out']
+                    yield ret
+                if len(found.intersection(minions)) >= len(minions):
+                    continue
                 # The timeout has been reached, check the jid to see if the
                 # timeout needs to be increased
                 jinfo = self.gather_job_info(jid, tgt, tgt_type, minions - found, **kwargs)
@@ -906,6 +998,97 @@ class LocalClient(object):
                     continue
             time.sleep(0.01)
 
+    def _get_tracked_returns(
+            self,
+            jid,
+            minions,
+            timeout,
+            expect_minions=False,
+            **kwargs):
+        '''
+        Yield the returns of a job until the job tracker of the master reports
+        it complete, instead of asking the minions whether they still run it
+        '''
+        complete_tag = salt.utils.event.tagify([jid, 'complete'], 'job')
+        running_tag = salt.utils.event.tagify([jid, 'running'], 'job')
+        found = set()
+        # The tracker reports on the job at least this often
+        silence = timeout + self.opts['gather_job_timeout'] + 10
+        silent_at = time.time() + silence
+        while len(found.intersection(minions)) < len(minions):
+            raw = self.event.get_event(max(silent_at - time.time(), 1),
+                                       full=True)
+            if raw is None:
+                if time.time() < silent_at:
+                    continue
+                log.warning(
+                    'jid {0} the job tracker of the master did not report '
+                    'on the job in {1} seconds'.format(jid, silence)
+                )
+                break
+            if raw['tag'] == running_tag:
+                log.debug('jid {0} still running on {1}'.format(
+                    jid, raw['data']['running']))
+                silent_at = time.time() + silence
+                continue
+            if raw['tag'] == complete_tag:
+                log.debug('jid {0} complete, stragglers {1}'.format(
+                    jid, raw['data']['stragglers']))
+                break
+            if raw['tag'] != jid or 'return' not in raw['data']:
+                continue
+            raw = raw['data']
+            found.add(raw['id'])
+            if kwargs.get('raw', False):
+                yield raw
+                continue
+            ret = {raw['id']: {'ret': raw['return']}}
+            if 'out' in raw:
+                ret[raw['id']]['out'] = raw['out']
+            log.debug('jid {0} return from {1}'.format(jid, raw['id']))
+            yield ret
+        if len(found.intersection(minions)) >= len(minions):
+            raise StopIteration()
+        # Pick up the returns the event listener missed
+        for raw in self._journal_returns(jid, found):
+            found.add(raw['id'])
+            if kwargs.get('raw', False):
+                yield raw
+                continue
+            ret = {raw['id']: {'ret': raw['return']}}
+            if 'out' in raw:
+                ret[raw['id']]['out'] = raw['out']
+            yield ret
+        if minions - found:
+            log.info('jid {0} minions {1} did not return in time'.format(
+                jid, minions - found))
+            if expect_minions:
+                for minion in minions - found:
+                    yield {minion: {'failed': True}}
+
+    def _journal_returns(self, jid, found):
+        '''
+        Yield the returns of the job in the master event journal from the
+        minions which are not in ``found``, the caller adds the minions it
+        got a return from to ``found``
+        '''
+        if not self.opts.get('event_journal', False):
+            return
+        start_time = None
+        if salt.utils.is_jid(jid):
+            # Segments last written before the job started can be skipped
+            start_time = time.mktime(
+                datetime.strptime(jid[:14], '%Y%m%d%H%M%S').timetuple())
+        journal = salt.utils.event.EventJournal(self.opts)
+        for event in journal.read(tag=jid, start_time=start_time):
+            # The header tells whose return it is without decoding it
+            if event['tag'] != jid or event.header.get('id') in found:
+                continue
+            if 'return' not in event['data'] or 'id' not in event['data']:
+                continue
+            yield event['data']
+
+    @_releases_job
     def get_returns(
             self,
             jid,
@@ -1032,6 +1215,7 @@ class LocalClient(object):
 
         return ret
 
+    @_releases_job
     def get_cli_static_event_returns(
             self,
             jid,
@@ -1104,6 +1288,7 @@ class LocalClient(object):
             time.sleep(0.01)
         return ret
 
+    @_releases_job
     def get_cli_event_returns(
             self,
             jid,
@@ -1243,6 +1428,7 @@ class LocalClient(object):
                     last_time = True
             time.sleep(0.01)
 
+    @_releases_job
     def get_event_iter_returns(self, jid, minions, timeout=None):
         '''
         Gather the return data from the event system, break hard when timeout
@@ -1337,6 +1523,9 @@ class LocalClient(object):
         # If we're a syndication master, pass the timeout
         if self.opts['order_masters']:
             payload_kwargs['to'] = timeout
+        elif self.opts.get('job_tracker'):
+            # The job tracker of the master waits as long for the returns
+            payload_kwargs['timeout'] = timeout
 
         return payload_kwargs
 
@@ -140,7 +140,7 @@ class APIClient(object):
 
         .. seealso:: :ref:`python-api`
         '''
-        return self.localClient.run_job(**kwargs)
+        return self.localClient.run_job(listen=False, **kwargs)
 
     def minion_sync(self, **kwargs):
         '''
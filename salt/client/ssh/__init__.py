@@ -31,6 +31,7 @@ import salt.state
 import salt.utils
 import salt.utils.args
 import salt.utils.event
+import salt.utils.minions
 import salt.utils.atomicfile
 import salt.utils.thin
 import salt.utils.verify
@@ -651,6 +652,7 @@ class Single(object):
                                 'pillar': pillar_data}
                             )
                         )
+            salt.utils.minions.minion_data_changed(self.opts, self.id)
         with salt.utils.fopen(datap, 'rb') as fp_:
             data = self.serial.load(fp_)
         opts = data.get('opts', {})
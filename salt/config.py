@@ -75,6 +75,9 @@ VALID_OPTS = {
     'sock_dir': str,
     'backup_mode': str,
     'renderer': str,
+    'render_cache': bool,
+    'render_cache_size': int,
+    'render_cache_functions': list,
     'failhard': bool,
     'autoload_dynamic_modules': bool,
     'environment': str,
@@ -97,6 +100,8 @@ VALID_OPTS = {
     'outputter_dirs': list,
     'utils_dirs': list,
     'providers': dict,
+    'virtual_cache': bool,
+    'virtual_cache_expire': int,
     'clean_dynamic_modules': bool,
     'open_mode': bool,
     'multiprocessing': bool,
@@ -104,6 +109,8 @@ VALID_OPTS = {
     'ipc_mode': str,
     'ipv6': bool,
     'file_buffer_size': int,
+    'file_buffer_size_max': int,
+    'file_fetch_window': int,
     'tcp_pub_port': int,
     'tcp_pull_port': int,
     'log_file': str,
@@ -115,6 +122,10 @@ VALID_OPTS = {
     'log_fmt_logfile': tuple,
     'log_granular_levels': dict,
     'max_event_size': int,
+    'event_journal': bool,
+    'event_journal_segment_size': int,
+    'event_journal_segments': int,
+    'job_tracker': bool,
     'test': bool,
     'cython_enable': bool,
     'show_timeout': bool,
@@ -150,6 +161,7 @@ VALID_OPTS = {
     'pub_hwm': int,
     'rep_hwm': int,
     'worker_threads': int,
+    'worker_io_threads': int,
     'ret_port': int,
     'keep_jobs': int,
     'master_roots': dict,
@@ -187,6 +199,13 @@ VALID_OPTS = {
     'ext_pillar': list,
     'pillar_version': int,
     'pillar_opts': bool,
+    'pillar_opts_lean': bool,
+    'pillar_cache': bool,
+    'pillar_cache_ttl': int,
+    'ext_pillar_cache_ttl': dict,
+    'ext_pillar_threads': int,
+    'ext_pillar_timeout': int,
+    'ext_pillar_timeouts': dict,
     'pillar_source_merging_strategy': str,
     'peer': dict,
     'syndic_master': str,
@@ -203,6 +222,9 @@ VALID_OPTS = {
     'fileserver_followsymlinks': bool,
     'fileserver_ignoresymlinks': bool,
     'fileserver_limit_traversal': bool,
+    'fileserver_inotify': bool,
+    'fileserver_mmap': bool,
+    'fileserver_chunk_cache_size': int,
     'max_open_files': int,
     'auto_accept': bool,
     'autosign_timeout': int,
@@ -212,6 +234,10 @@ VALID_OPTS = {
     'ext_job_cache': str,
     'master_job_cache': str,
     'minion_data_cache': bool,
+    'job_cache_write_behind': bool,
+    'job_cache_batch_size': int,
+    'job_cache_batch_interval': float,
+    'job_cache_queue_size': int,
     'publish_session': int,
     'reactor': list,
     'reactor_refresh_interval': int,
@@ -231,6 +257,7 @@ VALID_OPTS = {
     'jinja_trim_blocks': bool,
     'minion_id_caching': bool,
     'sign_pub_messages': bool,
+    'aes_cipher': str,
     'keysize': int,
     'transport': str,
     'enumerate_proxy_minions': bool,
@@ -283,6 +310,10 @@ DEFAULT_MINION_OPTS = {
     'sock_dir': os.path.join(salt.syspaths.SOCK_DIR, 'minion'),
     'backup_mode': '',
     'renderer': 'yaml_jinja',
+    'render_cache': False,
+    'render_cache_size': 1000,
+    'render_cache_functions': ['grains.get', 'grains.item', 'grains.items',
+                               'pillar.get', 'pillar.item', 'config.get'],
     'failhard': False,
     'autoload_dynamic_modules': True,
     'environment': None,
@@ -310,6 +341,8 @@ DEFAULT_MINION_OPTS = {
     'outputter_dirs': [],
     'utils_dirs': [],
     'providers': {},
+    'virtual_cache': False,
+    'virtual_cache_expire': 3600,
     'clean_dynamic_modules': True,
     'open_mode': False,
     'auto_accept': True,
@@ -319,6 +352,8 @@ DEFAULT_MINION_OPTS = {
     'ipc_mode': 'ipc',
     'ipv6': False,
     'file_buffer_size': 262144,
+    'file_buffer_size_max': 8388608,
+    'file_fetch_window': 1,
     'tcp_pub_port': 4510,
     'tcp_pull_port': 4511,
     'log_file': os.path.join(salt.syspaths.LOGS_DIR, 'minion'),
@@ -388,6 +423,7 @@ DEFAULT_MASTER_OPTS = {
     'auth_mode': 1,
     'user': 'root',
     'worker_threads': 5,
+    'worker_io_threads': 0,
     'sock_dir': os.path.join(salt.syspaths.SOCK_DIR, 'master'),
     'ret_port': '4506',
     'timeout': 5,
@@ -434,6 +470,10 @@ DEFAULT_MASTER_OPTS = {
     'svnfs_env_whitelist': [],
     'svnfs_env_blacklist': [],
     'max_event_size': 1048576,
+    'event_journal': False,
+    'event_journal_segment_size': 67108864,
+    'event_journal_segments': 8,
+    'job_tracker': False,
     'minionfs_env': 'base',
     'minionfs_mountpoint': '',
     'minionfs_whitelist': [],
@@ -441,6 +481,13 @@ DEFAULT_MASTER_OPTS = {
     'ext_pillar': [],
     'pillar_version': 2,
     'pillar_opts': True,
+    'pillar_opts_lean': False,
+    'pillar_cache': False,
+    'pillar_cache_ttl': 3600,
+    'ext_pillar_cache_ttl': {},
+    'ext_pillar_threads': 0,
+    'ext_pillar_timeout': 60,
+    'ext_pillar_timeouts': {},
     'pillar_source_merging_strategy': 'smart',
     'peer': {},
     'syndic_master': '',
@@ -453,18 +500,26 @@ DEFAULT_MASTER_OPTS = {
     'file_recv': False,
     'file_recv_max_size': 100,
     'file_buffer_size': 1048576,
+    'file_buffer_size_max': 8388608,
     'file_ignore_regex': None,
     'file_ignore_glob': None,
     'fileserver_backend': ['roots'],
     'fileserver_followsymlinks': True,
     'fileserver_ignoresymlinks': False,
     'fileserver_limit_traversal': False,
+    'fileserver_inotify': True,
+    'fileserver_mmap': False,
+    'fileserver_chunk_cache_size': 33554432,
     'max_open_files': 100000,
     'hash_type': 'md5',
     'conf_file': os.path.join(salt.syspaths.CONFIG_DIR, 'master'),
     'open_mode': False,
     'auto_accept': False,
     'renderer': 'yaml_jinja',
+    'render_cache': False,
+    'render_cache_size': 1000,
+    'render_cache_functions': ['grains.get', 'grains.item', 'grains.items',
+                               'pillar.get', 'pillar.item', 'config.get'],
     'failhard': False,
     'state_top': 'top.sls',
     'master_tops': {},
@@ -474,6 +529,10 @@ DEFAULT_MASTER_OPTS = {
     'master_job_cache': 'local_cache',
     'minion_data_cache': True,
     'enforce_mine_cache': False,
+    'job_cache_write_behind': False,
+    'job_cache_batch_size': 100,
+    'job_cache_batch_interval': 1.0,
+    'job_cache_queue_size': 10000,
     'ipv6': False,
     'log_file': os.path.join(salt.syspaths.LOGS_DIR, 'master'),
     'log_level': None,
@@ -515,6 +574,7 @@ DEFAULT_MASTER_OPTS = {
     'jinja_lstrip_blocks': False,
     'jinja_trim_blocks': False,
     'sign_pub_messages': False,
+    'aes_cipher': 'aes-cbc-hmac',
     'keysize': 4096,
     'transport': 'zeromq',
     'enumerate_proxy_minions': False,
@@ -23,6 +23,12 @@ try:
 except ImportError:
     # No need for crypt in local mode
     pass
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    HAS_AESGCM = True
+except ImportError:
+    HAS_AESGCM = False
 
 # Import salt libs
 import salt.utils
@@ -37,6 +43,19 @@ from salt.exceptions import (
 log = logging.getLogger(__name__)
 
 
+if hasattr(hmac, 'compare_digest'):
+    _compare_digest = hmac.compare_digest
+else:
+    def _compare_digest(digest_a, digest_b):
+        '''
+        Compare two digests in constant time
+        '''
+        result = 0
+        for zipped_x, zipped_y in zip(digest_a, digest_b):
+            result |= ord(zipped_x) ^ ord(zipped_y)
+        return result == 0
+
+
 def dropfile(cachedir, user=None):
     '''
     Set an aes dropfile to update the publish session key
@@ -46,8 +65,8 @@ def dropfile(cachedir, user=None):
 
     def ready():
         '''
-        Because MWorker._update_aes uses second-precision mtime
-        to detect changes to the file, we must avoid writing two
+        Because AESKey.load_dropfile in salt.master uses second-precision
+        mtime to detect changes to the file, we must avoid writing two
         versions with the same mtime.
 
         Note that this only makes rapid updates in serial safe: concurrent
@@ -331,6 +350,9 @@ class Auth(object):
             pass
         with salt.utils.fopen(self.pub_path, 'r') as fp_:
             payload['load']['pub'] = fp_.read()
+        if HAS_AESGCM:
+            # The master picks the cipher of the AES session
+            payload['load']['ciphers'] = list(Crypticle.CIPHERS)
         return payload
 
     def decrypt_aes(self, payload, master_pub=True):
@@ -621,6 +643,7 @@ class Auth(object):
                 if salt.utils.pem_finger(m_pub_fn) != self.opts['master_finger']:
                     self._finger_fail(self.opts['master_finger'], m_pub_fn)
         auth['publish_port'] = payload['publish_port']
+        auth['cipher'] = payload.get('cipher', 'aes-cbc-hmac')
         return auth
 
     def _finger_fail(self, finger, master_key):
@@ -644,16 +667,44 @@ class Crypticle(object):
 
     Encryption algorithm: AES-CBC
     Signing algorithm: HMAC-SHA256
+
+    or, with the ``aes-gcm`` cipher, AES-GCM, which needs the cryptography
+    library. Messages encrypted with AES-GCM start with ``AEAD_MAGIC``, any
+    Crypticle which can decrypt them does so whatever its own cipher is.
+    AES-GCM uses a key derived from the session key, not the AES-CBC key.
     '''
 
     PICKLE_PAD = 'pickle::'
     AES_BLOCK_SIZE = 16
     SIG_SIZE = hashlib.sha256().digest_size
+    CIPHERS = ('aes-cbc-hmac', 'aes-gcm')
+    AEAD_MAGIC = '\xa5gcm'
+    NONCE_SIZE = 12
 
-    def __init__(self, opts, key_string, key_size=192):
+    def __init__(self, opts, key_string, key_size=192, cipher=None):
         self.keys = self.extract_keys(key_string, key_size)
+        self.key_string = key_string
         self.key_size = key_size
+        self.opts = opts
         self.serial = salt.payload.Serial(opts)
+        if cipher is None:
+            cipher = 'aes-cbc-hmac'
+            if isinstance(opts, dict):
+                cipher = opts.get('aes_cipher', cipher)
+        if cipher not in self.CIPHERS:
+            log.error('Unknown AES cipher {0!r}, using aes-cbc-hmac'
+                      .format(cipher))
+            cipher = 'aes-cbc-hmac'
+        if cipher == 'aes-gcm' and not HAS_AESGCM:
+            log.error('The aes-gcm cipher needs the cryptography library, '
+                      'using aes-cbc-hmac')
+            cipher = 'aes-cbc-hmac'
+        self.cipher = cipher
+        # The AES key schedule is set up once
+        self._aead = None
+        if HAS_AESGCM:
+            self._aead = AESGCM(self.derive_key(self.keys, 'aes-gcm'))
+        self._twins = {cipher: self}
 
     @classmethod
     def generate_key_string(cls, key_size=192):
@@ -666,10 +717,55 @@ class Crypticle(object):
         assert len(key) == key_size / 8 + cls.SIG_SIZE, 'invalid key'
         return key[:-cls.SIG_SIZE], key[-cls.SIG_SIZE:]
 
+    @classmethod
+    def derive_key(cls, keys, cipher):
+        '''
+        Return the key of a cipher derived from the session keys, of the size
+        of the AES-CBC key
+        '''
+        aes_key, hmac_key = keys
+        return hmac.new(aes_key + hmac_key,
+                        'salt {0} key'.format(cipher),
+                        hashlib.sha256).digest()[:len(aes_key)]
+
+    @classmethod
+    def is_aead(cls, data):
+        '''
+        Return whether the message looks encrypted with AES-GCM
+        '''
+        return isinstance(data, str) and data.startswith(cls.AEAD_MAGIC)
+
+    def with_cipher(self, cipher):
+        '''
+        Return a Crypticle with the same key which encrypts with the given
+        cipher
+        '''
+        if cipher not in self._twins:
+            twin = Crypticle(self.opts, self.key_string, self.key_size, cipher)
+            self._twins[twin.cipher] = twin
+            self._twins[cipher] = twin
+        return self._twins[cipher]
+
+    def for_reply(self, data):
+        '''
+        Return the Crypticle to encrypt the reply to a message with, the
+        reply uses the cipher of the message
+        '''
+        if self.is_aead(data) and self._aead is not None:
+            return self.with_cipher('aes-gcm')
+        return self.with_cipher('aes-cbc-hmac')
+
     def encrypt(self, data):
         '''
-        encrypt data with AES-CBC and sign it with HMAC-SHA256
+        encrypt data with AES-CBC and sign it with HMAC-SHA256, or encrypt it
+        with AES-GCM
         '''
+        if self.cipher == 'aes-gcm':
+            nonce = os.urandom(self.NONCE_SIZE)
+            # The tag is appended to the cipher text by the library
+            return ''.join((self.AEAD_MAGIC,
+                            nonce,
+                            self._aead.encrypt(nonce, data, None)))
         aes_key, hmac_key = self.keys
         pad = self.AES_BLOCK_SIZE - len(data) % self.AES_BLOCK_SIZE
         data = data + pad * chr(pad)
@@ -681,8 +777,19 @@ class Crypticle(object):
 
     def decrypt(self, data):
         '''
-        verify HMAC-SHA256 signature and decrypt data with AES-CBC
+        verify HMAC-SHA256 signature and decrypt data with AES-CBC, or
+        decrypt and verify data encrypted with AES-GCM
         '''
+        if self._aead is not None and data.startswith(self.AEAD_MAGIC):
+            start = len(self.AEAD_MAGIC)
+            try:
+                return self._aead.decrypt(
+                    data[start:start + self.NONCE_SIZE],
+                    data[start + self.NONCE_SIZE:],
+                    None)
+            except InvalidTag:
+                # An AES-CBC message can start with the magic too
+                pass
         aes_key, hmac_key = self.keys
         sig = data[-self.SIG_SIZE:]
         data = data[:-self.SIG_SIZE]
@@ -690,10 +797,7 @@ class Crypticle(object):
         if len(mac_bytes) != len(sig):
             log.debug('Failed to authenticate message')
             raise AuthenticationError('message authentication failed')
-        result = 0
-        for zipped_x, zipped_y in zip(mac_bytes, sig):
-            result |= ord(zipped_x) ^ ord(zipped_y)
-        if result != 0:
+        if not _compare_digest(mac_bytes, sig):
             log.debug('Failed to authenticate message')
             raise AuthenticationError('message authentication failed')
         iv_bytes = data[:self.AES_BLOCK_SIZE]
@@ -755,4 +859,4 @@ class SAuth(Auth):
                     log.debug('Authentication wait time is {0}'.format(acceptance_wait_time))
                 continue
             break
-        return Crypticle(self.opts, creds['aes'])
+        return Crypticle(self.opts, creds['aes'], cipher=creds['cipher'])
@@ -18,6 +18,13 @@ except ImportError:
     pass
 
 
+# Import third party libs
+try:
+    from M2Crypto import RSA, BIO
+except ImportError:
+    # No need for crypt in local mode
+    pass
+
 # Import salt libs
 import salt.crypt
 import salt.utils
@@ -345,6 +352,95 @@ class AutoKey(object):
         return False
 
 
+class MinionKeyCache(object):
+    '''
+    Keep the public keys of the minions, and the RSA objects of the keys
+    used to encrypt the AES key, in memory for the authentication of the
+    minions.
+
+    With inotify the key directories are watched, a key is dropped on any
+    event for its file and the authentication of a known minion does not
+    touch the disk. Otherwise the key files are stat'ed and a cached key is
+    used as long as its mtime, size, inode and ctime match.
+    '''
+    DIRS = ('minions', 'minions_pre', 'minions_rejected')
+
+    def __init__(self, opts):
+        self.keys = {}
+        self.watcher = salt.fileserver.MtimeMapWatcher(
+            {'pki': [os.path.join(opts['pki_dir'], name)
+                     for name in self.DIRS]})
+        if not self.watcher.inotify:
+            self.watcher = None
+
+    def refresh(self):
+        '''
+        Drop the keys which changed on disk
+        '''
+        if self.watcher is None:
+            return
+        changes = self.watcher.update()
+        if self.watcher.touched is None:
+            # The kernel dropped events, a key may have been rewritten with
+            # the same mtime
+            self.keys.clear()
+            return
+        for path in self.watcher.touched.union(changes):
+            self.keys.pop(path, None)
+
+    def _stamp(self, path):
+        '''
+        Return what identifies the version of a key file, None if there is no
+        such file
+        '''
+        if self.watcher is not None:
+            return self.watcher.mtime_map.get(path)
+        try:
+            stats = os.stat(path)
+        except os.error:
+            return None
+        if not stat.S_ISREG(stats.st_mode):
+            return None
+        # The ctime changes with any write, even if the mtime is set back
+        return stats.st_mtime, stats.st_size, stats.st_ino, stats.st_ctime
+
+    def exists(self, path):
+        '''
+        Return True if the key file exists
+        '''
+        return self._stamp(path) is not None
+
+    def read(self, path):
+        '''
+        Return the key in the key file, None if there is no such file
+        '''
+        stamp = self._stamp(path)
+        if stamp is None:
+            return None
+        cached = self.keys.get(path)
+        if cached is None or cached[0] != stamp:
+            try:
+                with salt.utils.fopen(path, 'r') as fp_:
+                    cached = [stamp, fp_.read(), None]
+            except (IOError, OSError):
+                return None
+            self.keys[path] = cached
+        return cached[1]
+
+    def rsa(self, path):
+        '''
+        Return the RSA object of the key in the key file, raises RSA.RSAError
+        if the file does not hold a valid key
+        '''
+        pub = self.read(path)
+        if pub is None:
+            raise RSA.RSAError('no such file')
+        cached = self.keys[path]
+        if cached[2] is None:
+            cached[2] = RSA.load_pub_key_bio(BIO.MemoryBuffer(pub))
+        return cached[2]
+
+
 class RemoteFuncs(object):
     '''
     Funcitons made available to minions, this class includes the raw routines
@@ -659,6 +755,7 @@ class RemoteFuncs(object):
                             {'grains': load['grains'],
                              'pillar': data})
                             )
+            salt.utils.minions.minion_data_changed(self.opts, load['id'])
         return data
 
     def _minion_event(self, load):
@@ -8,7 +8,9 @@ import contextlib
 import logging
 import hashlib
 import os
+import Queue
 import shutil
+import threading
 import time
 import requests
 
@@ -948,6 +950,9 @@ class RemoteClient(Client):
                 saltenv, path
             )
         )
+        if self.opts.get('file_fetch_window', 1) > 1 \
+                and getattr(self.channel, 'ttype', None) == 'zeromq':
+            return self._get_file_windowed(path, dest, makedirs, saltenv, gzip)
         d_tries = 0
         path = self._check_proto(path)
         load = {'path': path,
@@ -956,6 +961,11 @@ class RemoteClient(Client):
         if gzip:
             gzip = int(gzip)
             load['gzip'] = gzip
+        # Start with small chunks and ask for larger ones as long as the
+        # master sends full chunks, up to file_buffer_size_max
+        load['buffer_size'] = self.opts['file_buffer_size']
+        buffer_size_max = self.opts.get('file_buffer_size_max',
+                                        load['buffer_size'])
 
         fn_ = None
         if dest:
@@ -1018,6 +1028,9 @@ class RemoteClient(Client):
             else:
                 data = data['data']
             fn_.write(data)
+            if len(data) >= load['buffer_size']:
+                load['buffer_size'] = min(load['buffer_size'] * 2,
+                                          buffer_size_max)
         if fn_:
             fn_.close()
             log.info(
@@ -1027,6 +1040,173 @@ class RemoteClient(Client):
             )
         return dest
 
+    def _get_file_windowed(self, path, dest, makedirs, saltenv, gzip):
+        '''
+        Get a single file from the salt-master, keeping file_fetch_window
+        chunk requests in flight. The file is downloaded next to its
+        destination and moved into place once its hash matches the hash of
+        the file on the master. An interrupted download is resumed from the
+        last chunk written, as long as the file on the master is unchanged.
+        '''
+        hash_server = self.hash_file(path, saltenv)
+        if not hash_server:
+            # The file does not exist on the master
+            return ''
+        rel_path = self._check_proto(path)
+        if dest:
+            destdir = os.path.dirname(dest)
+            if not os.path.isdir(destdir):
+                if makedirs:
+                    os.makedirs(destdir)
+                else:
+                    return False
+        else:
+            with self._cache_loc(rel_path, saltenv) as cache_dest:
+                dest = cache_dest
+        part = '{0}.part'.format(dest)
+        state_path = '{0}.p'.format(part)
+        serial = salt.payload.Serial(self.opts)
+        load = {'path': rel_path,
+                'saltenv': saltenv,
+                'cmd': '_serve_file',
+                'buffer_size': self.opts.get('file_buffer_size_max',
+                                             self.opts['file_buffer_size'])}
+        if gzip:
+            load['gzip'] = int(gzip)
+
+        for d_tries in range(1, 4):
+            loc = 0
+            try:
+                with salt.utils.fopen(state_path, 'rb') as fp_:
+                    state = serial.load(fp_)
+                if state['hsum'] == hash_server['hsum'] \
+                        and os.path.getsize(part) >= state['loc']:
+                    loc = state['loc']
+            except Exception:
+                # No usable partial download
+                pass
+            if loc:
+                log.debug('Resuming download of {0} at {1} bytes'.format(
+                    path, loc))
+            with salt.utils.fopen(part, 'ab+') as fn_:
+                fn_.truncate(loc)
+                fn_.seek(loc)
+
+                def _write(data):
+                    fn_.write(data)
+                    fn_.flush()
+                    with salt.utils.fopen(state_path, 'w+b') as fp_:
+                        serial.dump({'hsum': hash_server['hsum'],
+                                     'loc': fn_.tell()}, fp_)
+
+                try:
+                    self._fetch_chunks(load, loc, _write)
+                except SaltReqTimeoutError:
+                    return ''
+            hsum = salt.utils.get_hash(part, hash_server['hash_type'])
+            if hsum == hash_server['hsum']:
+                if os.path.isdir(dest):
+                    salt.utils.rm_rf(dest)
+                os.rename(part, dest)
+                os.remove(state_path)
+                log.info(
+                    'Fetching file from saltenv {0!r}, ** done ** {1!r}'.format(
+                        saltenv, path
+                    )
+                )
+                return dest
+            log.warn('Bad download of file {0}, attempt {1} of 3'.format(
+                path, d_tries))
+            os.remove(state_path)
+            # The file may have changed on the master during the download
+            hash_server = self.hash_file(path, saltenv)
+            if not hash_server:
+                break
+        return ''
+
+    def _fetch_chunks(self, load, loc, write):
+        '''
+        Fetch a file from the master starting at ``loc``, passing the chunks
+        to ``write`` in order. The first chunk tells the chunk size the master
+        serves, the following ones are requested by file_fetch_window threads
+        with a request in flight each.
+        '''
+        def _get(chunk_loc, channel):
+            data = channel.send(dict(load, loc=chunk_loc))
+            if not data or 'data' not in data:
+                raise SaltReqTimeoutError(
+                    'Invalid reply to a chunk request: {0}'.format(data))
+            if data.get('gzip', None):
+                return salt.utils.gzip_util.uncompress(data['data'])
+            return data['data']
+
+        data = _get(loc, self._get_channel())
+        if not data:
+            return
+        write(data)
+        chunk = len(data)
+        loc += chunk
+        state = {'next': loc, 'eof': None, 'error': None}
+        lock = threading.Lock()
+        results = Queue.Queue()
+
+        def _run():
+            channel = self._get_channel()
+            while True:
+                with lock:
+                    if state['error'] is not None:
+                        return
+                    if state['eof'] is not None \
+                            and state['next'] >= state['eof']:
+                        return
+                    chunk_loc = state['next']
+                    state['next'] += chunk
+                try:
+                    data = _get(chunk_loc, channel)
+                except Exception as exc:
+                    with lock:
+                        state['error'] = exc
+                    results.put((chunk_loc, None))
+                    return
+                if len(data) < chunk:
+                    with lock:
+                        if state['eof'] is None \
+                                or chunk_loc + len(data) < state['eof']:
+                            state['eof'] = chunk_loc + len(data)
+                results.put((chunk_loc, data))
+
+        # Requests go through a channel per thread, the thread names keep the
+        # cached channels reused between downloads
+        threads = []
+        for num in range(self.opts['file_fetch_window']):
+            thread = threading.Thread(
+                target=_run,
+                name='{0}-fetch-{1}'.format(
+                    threading.current_thread().name, num)
+            )
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        try:
+            pending = {}
+            while state['eof'] is None or loc < state['eof']:
+                chunk_loc, data = results.get()
+                if data is None:
+                    raise state['error']
+                pending[chunk_loc] = data
+                while loc in pending:
+                    data = pending.pop(loc)
+                    if not data:
+                        break
+                    write(data)
+                    loc += len(data)
+        finally:
+            with lock:
+                if state['error'] is None:
+                    state['error'] = False
+            for thread in threads:
+                thread.join()
+
     def file_list(self, saltenv='base', prefix='', env=None):
         '''
         List the files on the master
@@ -15,6 +15,13 @@ import time
 import salt.loader
 import salt.utils
 
+# Import third party libs
+try:
+    import pyinotify
+    HAS_PYINOTIFY = True
+except ImportError:
+    HAS_PYINOTIFY = False
+
 log = logging.getLogger(__name__)
 
 
@@ -190,19 +197,162 @@ def diff_mtime_map(map1, map2):
     '''
     Is there a change to the mtime map? return a boolean
     '''
-    # check if the file lists are different
-    if cmp(sorted(map1.keys()), sorted(map2.keys())) != 0:
-        #log.debug('diff_mtime_map: the keys are different')
-        return True
+    return map1 != map2
 
-    # check if the mtimes are the same
-    if cmp(sorted(map1), sorted(map2)) != 0:
-        #log.debug('diff_mtime_map: the maps are different')
-        return True
 
-    # we made it, that means we have no changes
-    #log.debug('diff_mtime_map: the maps are the same')
-    return False
+def mtime_map_changes(map1, map2):
+    '''
+    Return a dict of the files which differ between two mtime maps, mapped to
+    their mtime in ``map2`` or ``None`` if they are not in ``map2``
+    '''
+    changes = dict(
+        (file_path, None) for file_path in map1 if file_path not in map2
+    )
+    for file_path, mtime in map2.iteritems():
+        if map1.get(file_path) != mtime:
+            changes[file_path] = mtime
+    return changes
+
+
+class MtimeMapWatcher(object):
+    '''
+    Keep a filename -> mtime map of the paths in a path map up to date.
+
+    On Linux with pyinotify installed the paths are watched with inotify and
+    :py:meth:`update` only looks at the files the kernel reported as changed.
+    Everywhere else, or if the paths can not be watched (for instance
+    because ``fs.inotify.max_user_watches`` is too low), every call walks the
+    paths like :py:func:`generate_mtime_map` does.
+
+    After an update, :py:attr:`touched` holds the paths inotify reported,
+    also those whose mtime did not change, or None if the paths were walked.
+    '''
+    MASK = 0
+    if HAS_PYINOTIFY:
+        MASK = (pyinotify.IN_ATTRIB | pyinotify.IN_CLOSE_WRITE |
+                pyinotify.IN_CREATE | pyinotify.IN_DELETE |
+                pyinotify.IN_MODIFY | pyinotify.IN_MOVED_FROM |
+                pyinotify.IN_MOVED_TO)
+
+    def __init__(self, path_map, use_inotify=True):
+        self.path_map = path_map
+        self.mtime_map = generate_mtime_map(path_map)
+        self._changed = set()
+        self._overflow = False
+        self._notifier = None
+        self.touched = None
+        if use_inotify and HAS_PYINOTIFY:
+            self._start_inotify()
+
+    def _start_inotify(self):
+        '''
+        Set up the inotify watches, falling back to walking the paths if
+        any of them can not be watched
+        '''
+        try:
+            manager = pyinotify.WatchManager()
+        except (OSError, pyinotify.WatchManagerError) as exc:
+            # Out of inotify instances
+            log.warning('Unable to set up inotify, falling back to walking '
+                        'the paths: {0}'.format(exc))
+            return
+        for path_list in self.path_map.itervalues():
+            for path in path_list:
+                if not os.path.isdir(path):
+                    continue
+                wdds = manager.add_watch(
+                        path, self.MASK, rec=True, auto_add=True, quiet=True)
+                failed = [wpath for wpath, wdd in wdds.iteritems() if wdd < 0]
+                if failed:
+                    log.warning(
+                        'Unable to watch {0} with inotify, falling back to '
+                        'walking the file roots'.format(', '.join(failed))
+                    )
+                    manager.close()
+                    return
+        self._notifier = pyinotify.Notifier(
+                manager, default_proc_fun=self._process_event, timeout=0)
+
+    def _process_event(self, event):
+        '''
+        Remember the path of an inotify event
+        '''
+        if event.mask & pyinotify.IN_Q_OVERFLOW:
+            self._overflow = True
+        elif event.pathname:
+            self._changed.add(event.pathname)
+
+    @property
+    def inotify(self):
+        '''
+        True if the paths are watched with inotify
+        '''
+        return self._notifier is not None
+
+    def stop(self):
+        '''
+        Release the inotify watches
+        '''
+        if self._notifier is not None:
+            self._notifier.stop()
+            self._notifier = None
+
+    def update(self):
+        '''
+        Bring the mtime map up to date and return the changes, see
+        :py:func:`mtime_map_changes`
+        '''
+        if self._notifier is not None:
+            while self._notifier.check_events(timeout=0):
+                self._notifier.read_events()
+            self._notifier.process_events()
+        if self._notifier is None or self._overflow:
+            # Nothing to go on, or the kernel dropped events
+            self._overflow = False
+            self._changed.clear()
+            self.touched = None
+            new_mtime_map = generate_mtime_map(self.path_map)
+            changes = mtime_map_changes(self.mtime_map, new_mtime_map)
+            self.mtime_map = new_mtime_map
+            return changes
+        changes = {}
+        changed, self._changed = self._changed, set()
+        self.touched = changed
+        for path in changed:
+            if os.path.isdir(path) and not os.path.islink(path):
+                # A directory was created or moved in, pick up its files
+                for directory, dirnames, filenames in os.walk(path):
+                    for item in filenames:
+                        self._update_file(os.path.join(directory, item),
+                                          changes)
+            elif path in self.mtime_map or os.path.lexists(path):
+                self._update_file(path, changes)
+            else:
+                # A directory was removed or moved away
+                prefix = os.path.join(path, '')
+                for file_path in [file_path for file_path in self.mtime_map
+                                  if file_path.startswith(prefix)]:
+                    del self.mtime_map[file_path]
+                    changes[file_path] = None
+        return changes
+
+    def _update_file(self, file_path, changes):
+        '''
+        Refresh the mtime of a single file, recording it in changes if it
+        differs from the map
+        '''
+        try:
+            mtime = os.path.getmtime(file_path)
+        except (OSError, IOError):
+            # Removed, or a dangling symlink, which generate_mtime_map skips
+            mtime = None
+        if mtime is None:
+            if file_path in self.mtime_map:
+                del self.mtime_map[file_path]
+                changes[file_path] = None
+        elif self.mtime_map.get(file_path) != mtime:
+            self.mtime_map[file_path] = mtime
+            changes[file_path] = mtime
 
 
 def reap_fileserver_cache_dir(cache_base, find_func):
@@ -8,15 +8,40 @@ option.
 
 # Import python libs
 import os
+import json
+import mmap
+import shutil
 import logging
+import threading
 
 # Import salt libs
 import salt.fileserver
+import salt.payload
 import salt.utils
+import salt.utils.atomicfile
+import salt.utils.gzip_util
 from salt.utils.event import tagify
+from salt.utils.odict import OrderedDict
 
 log = logging.getLogger(__name__)
 
+# Watches the file_roots for changes between runs of update()
+_WATCHER = None
+
+# In memory copy of the hash index, see _hash_index()
+_HASH_INDEX = {'mtime': None, 'files': {}}
+
+# Memory maps of the served files, see _read_chunk()
+_MMAPS = OrderedDict()
+MMAPS_MAX = 64
+
+# Compressed chunks served recently, see _gzip_chunk()
+_GZIP_CHUNKS = OrderedDict()
+_GZIP_CHUNKS_SIZE = [0]
+
+# Master workers can serve files from several threads
+_CHUNKS_LOCK = threading.RLock()
+
 
 def find_file(path, saltenv='base', env=None, **kwargs):
     '''
@@ -88,61 +113,270 @@ def serve_file(load, fnd):
     ret['dest'] = fnd['rel']
     gzip = load.get('gzip', None)
 
-    with salt.utils.fopen(fnd['path'], 'rb') as fp_:
-        fp_.seek(load['loc'])
-        data = fp_.read(__opts__['file_buffer_size'])
-        if gzip and data:
-            data = salt.utils.gzip_util.compress(data, gzip)
+    # Clients may ask for larger chunks than file_buffer_size, up to
+    # file_buffer_size_max
+    buffer_size = __opts__['file_buffer_size']
+    if load.get('buffer_size'):
+        buffer_size = max(
+            buffer_size,
+            min(int(load['buffer_size']),
+                __opts__.get('file_buffer_size_max', buffer_size))
+        )
+
+    try:
+        stat = os.stat(fnd['path'])
+    except OSError:
+        return ret
+    if gzip:
+        data = _gzip_chunk(fnd['path'], stat, load['loc'], buffer_size, gzip)
+        if data:
             ret['gzip'] = gzip
-        ret['data'] = data
+    else:
+        data = _read_chunk(fnd['path'], stat, load['loc'], buffer_size)
+    ret['data'] = data
     return ret
 
 
-def update():
+def _read_chunk(path, stat, loc, size):
+    '''
+    Return ``size`` bytes of the file at ``loc``, from a memory map of the
+    file if fileserver_mmap is enabled
+    '''
+    if not __opts__.get('fileserver_mmap', False):
+        with salt.utils.fopen(path, 'rb') as fp_:
+            fp_.seek(loc)
+            return fp_.read(size)
+    if loc >= stat.st_size:
+        return ''
+    key = (stat.st_ino, stat.st_size, stat.st_mtime)
+    with _CHUNKS_LOCK:
+        entry = _MMAPS.pop(path, None)
+        if entry is not None and entry[0] != key:
+            entry[1].close()
+            entry = None
+        if entry is None:
+            with salt.utils.fopen(path, 'rb') as fp_:
+                entry = (key,
+                         mmap.mmap(fp_.fileno(), 0, access=mmap.ACCESS_READ))
+            while len(_MMAPS) >= MMAPS_MAX:
+                _MMAPS.popitem(last=False)[1][1].close()
+        # Most recently used maps are kept at the end
+        _MMAPS[path] = entry
+        return entry[1][loc:loc + size]
+
+
+def _gzip_chunk(path, stat, loc, size, level):
+    '''
+    Return the compressed chunk of the file at ``loc``, compressed chunks
+    are kept in memory up to fileserver_chunk_cache_size bytes
+    '''
+    max_size = __opts__.get('fileserver_chunk_cache_size', 0)
+    key = (path, stat.st_ino, stat.st_mtime, loc, size, level)
+    with _CHUNKS_LOCK:
+        if key in _GZIP_CHUNKS:
+            data = _GZIP_CHUNKS.pop(key)
+            _GZIP_CHUNKS[key] = data
+            return data
+    data = _read_chunk(path, stat, loc, size)
+    if not data:
+        return data
+    data = salt.utils.gzip_util.compress(data, level)
+    if len(data) > max_size:
+        return data
+    with _CHUNKS_LOCK:
+        if key not in _GZIP_CHUNKS:
+            _GZIP_CHUNKS_SIZE[0] += len(data)
+        _GZIP_CHUNKS[key] = data
+        while _GZIP_CHUNKS_SIZE[0] > max_size:
+            _GZIP_CHUNKS_SIZE[0] -= len(_GZIP_CHUNKS.popitem(last=False)[1])
+    return data
+
+
+def _hash_index_path(suffix='p'):
+    '''
+    Return the path to the hash index, or to its journal
     '''
-    When we are asked to update (regular interval) lets reap the cache
+    return os.path.join(__opts__['cachedir'],
+                        'roots',
+                        'hash_index.{0}'.format(suffix))
+
+
+def _read_hash_index():
+    '''
+    Read the hash index file, returns the mapping of file paths to
+    ``[size, mtime, inode, digest]`` lists for the configured hash type
     '''
     try:
-        salt.fileserver.reap_fileserver_cache_dir(
-            os.path.join(__opts__['cachedir'], 'roots/hash'),
-            find_file
-        )
+        with salt.utils.fopen(_hash_index_path(), 'rb') as fp_:
+            data = salt.payload.Serial(__opts__).load(fp_)
     except (IOError, OSError):
-        # Hash file won't exist if no files have yet been served up
-        pass
+        return {}
+    except Exception as exc:
+        log.warning('Discarding unreadable roots hash index: {0}'.format(exc))
+        return {}
+    if not isinstance(data, dict) \
+            or data.get('hash_type') != __opts__['hash_type']:
+        return {}
+    return data.get('files', {})
 
-    mtime_map_path = os.path.join(__opts__['cachedir'], 'roots/mtime_map')
-    # data to send on event
-    data = {'changed': False,
-            'backend': 'roots'}
 
-    old_mtime_map = {}
+def _hash_index():
+    '''
+    Return the in memory hash index, reloading it if the fileserver update
+    loop wrote a new one
+    '''
+    try:
+        mtime = os.path.getmtime(_hash_index_path())
+    except OSError:
+        mtime = None
+    if mtime != _HASH_INDEX['mtime']:
+        files = _read_hash_index()
+        # Keep the entries hashed here which did not make it into the index
+        # yet, they are still validated against the file on every lookup
+        for path, entry in _HASH_INDEX['files'].iteritems():
+            files.setdefault(path, entry)
+        _HASH_INDEX['files'] = files
+        _HASH_INDEX['mtime'] = mtime
+    return _HASH_INDEX['files']
+
+
+def _update_hash_index(changes):
+    '''
+    Fold the hashes recorded by the workers into the hash index file and
+    rehash the indexed files which changed, in one write
+    '''
+    journal = _hash_index_path('journal')
+    pending = '{0}.{1}'.format(journal, os.getpid())
+    try:
+        os.rename(journal, pending)
+    except OSError:
+        pending = None
+    if pending is None and not changes:
+        return
+    files = _read_hash_index()
+    dirty = False
+    if pending is not None:
+        with salt.utils.fopen(pending, 'rb') as fp_:
+            for line in fp_:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A partial line from a crashed worker
+                    continue
+                if entry[0] == __opts__['hash_type']:
+                    files[entry[1]] = entry[2:]
+                    dirty = True
+        os.remove(pending)
+    for file_path, mtime in changes.iteritems():
+        if file_path not in files:
+            continue
+        dirty = True
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            mtime = None
+        if mtime is None:
+            del files[file_path]
+            continue
+        files[file_path] = [stat.st_size,
+                            stat.st_mtime,
+                            stat.st_ino,
+                            salt.utils.get_hash(file_path,
+                                                __opts__['hash_type'])]
+    if not dirty:
+        return
+    index_dir = os.path.dirname(_hash_index_path())
+    if not os.path.isdir(index_dir):
+        os.makedirs(index_dir)
+    with salt.utils.atomicfile.atomic_open(_hash_index_path(), 'w+b') as fp_:
+        fp_.write(salt.payload.Serial(__opts__).dumps(
+            {'hash_type': __opts__['hash_type'], 'files': files}))
+
+
+def _read_mtime_map(mtime_map_path):
+    '''
+    Load the mtime map written by the last update
+    '''
+    mtime_map = {}
     # if you have an old map, load that
     if os.path.exists(mtime_map_path):
         with salt.utils.fopen(mtime_map_path, 'rb') as fp_:
             for line in fp_:
                 try:
-                    file_path, mtime = line.split(':', 1)
-                    old_mtime_map[file_path] = mtime
+                    file_path, mtime = line.rsplit(':', 1)
+                    mtime_map[file_path] = float(mtime)
                 except ValueError:
                     # Document the invalid entry in the log
                     log.warning('Skipped invalid cache mtime entry in {0}: {1}'
                                 .format(mtime_map_path, line))
+    return mtime_map
 
-    # generate the new map
-    new_mtime_map = salt.fileserver.generate_mtime_map(__opts__['file_roots'])
 
-    # compare the maps, set changed to the return value
-    data['changed'] = salt.fileserver.diff_mtime_map(old_mtime_map, new_mtime_map)
+def _clear_file_list_cache(changes):
+    '''
+    Remove the file list caches of the environments containing any of the
+    changed files, so that the next file list request rebuilds them
+    '''
+    list_cachedir = os.path.join(__opts__['cachedir'], 'file_lists/roots')
+    for saltenv, path_list in __opts__['file_roots'].iteritems():
+        prefixes = tuple(os.path.join(path, '') for path in path_list)
+        if not any(file_path.startswith(prefixes) for file_path in changes):
+            continue
+        try:
+            os.remove(os.path.join(list_cachedir, '{0}.p'.format(saltenv)))
+        except OSError:
+            # No cache yet
+            pass
 
-    # write out the new map
-    mtime_map_path_dir = os.path.dirname(mtime_map_path)
-    if not os.path.exists(mtime_map_path_dir):
-        os.makedirs(mtime_map_path_dir)
-    with salt.utils.fopen(mtime_map_path, 'w') as fp_:
-        for file_path, mtime in new_mtime_map.iteritems():
-            fp_.write('{file_path}:{mtime}\n'.format(file_path=file_path,
-                                                     mtime=mtime))
+
+def update():
+    '''
+    When we are asked to update (regular interval) lets reap the cache and
+    fold the file hashes computed by the workers into the hash index
+    '''
+    # The per file hash cache of older releases has been replaced by the
+    # hash index, clean it out
+    legacy_hash_cache = os.path.join(__opts__['cachedir'], 'roots/hash')
+    if os.path.isdir(legacy_hash_cache):
+        shutil.rmtree(legacy_hash_cache, ignore_errors=True)
+
+    mtime_map_path = os.path.join(__opts__['cachedir'], 'roots/mtime_map')
+    # data to send on event
+    data = {'changed': False,
+            'backend': 'roots'}
+
+    global _WATCHER
+    if _WATCHER is None or _WATCHER.path_map != __opts__['file_roots']:
+        if _WATCHER is not None:
+            _WATCHER.stop()
+        _WATCHER = salt.fileserver.MtimeMapWatcher(
+            __opts__['file_roots'],
+            use_inotify=__opts__.get('fileserver_inotify', True)
+        )
+        # Compare the freshly walked map against the one from the last run
+        changes = salt.fileserver.mtime_map_changes(
+            _read_mtime_map(mtime_map_path),
+            _WATCHER.mtime_map
+        )
+    else:
+        changes = _WATCHER.update()
+
+    # compare the maps, set changed to the return value
+    data['changed'] = bool(changes)
+
+    _update_hash_index(changes)
+
+    if changes:
+        _clear_file_list_cache(changes)
+        # write out the new map
+        mtime_map_path_dir = os.path.dirname(mtime_map_path)
+        if not os.path.exists(mtime_map_path_dir):
+            os.makedirs(mtime_map_path_dir)
+        with salt.utils.fopen(mtime_map_path, 'w') as fp_:
+            for file_path, mtime in _WATCHER.mtime_map.iteritems():
+                fp_.write('{file_path}:{mtime!r}\n'.format(
+                    file_path=file_path,
+                    mtime=mtime))
 
     if __opts__.get('fileserver_events', False):
         # if there is a change, fire an event
@@ -178,50 +412,29 @@ def file_hash(load, fnd):
     # set the hash_type as it is determined by config-- so mechanism won't change that
     ret['hash_type'] = __opts__['hash_type']
 
-    # check if the hash is cached
-    # cache file's contents should be "hash:mtime"
-    cache_path = os.path.join(__opts__['cachedir'],
-                              'roots/hash',
-                              load['saltenv'],
-                              '{0}.hash.{1}'.format(fnd['rel'],
-                              __opts__['hash_type']))
-    # if we have a cache, serve that if the mtime hasn't changed
-    if os.path.exists(cache_path):
-        try:
-            with salt.utils.fopen(cache_path, 'rb') as fp_:
-                try:
-                    hsum, mtime = fp_.read().split(':')
-                except ValueError:
-                    log.debug('Fileserver attempted to read incomplete cache file. Retrying.')
-                    # Delete the file since its incomplete (either corrupted or incomplete)
-                    try:
-                        os.unlink(cache_path)
-                    except OSError:
-                        pass
-                    return file_hash(load, fnd)
-                if os.path.getmtime(path) == mtime:
-                    # check if mtime changed
-                    ret['hsum'] = hsum
-                    return ret
-        except (os.error, IOError):  # Can't use Python select() because we need Windows support
-            log.debug("Fileserver encountered lock when reading cache file. Retrying.")
-            # Delete the file since its incomplete (either corrupted or incomplete)
-            try:
-                os.unlink(cache_path)
-            except OSError:
-                pass
-            return file_hash(load, fnd)
-
-    # if we don't have a cache entry-- lets make one
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return {}
+    index = _hash_index()
+    entry = index.get(path)
+    if entry is not None and entry[:3] == \
+            [stat.st_size, stat.st_mtime, stat.st_ino]:
+        ret['hsum'] = entry[3]
+        return ret
+
+    # if we don't have an index entry-- lets make one
     ret['hsum'] = salt.utils.get_hash(path, __opts__['hash_type'])
-    cache_dir = os.path.dirname(cache_path)
-    # make cache directory if it doesn't exist
-    if not os.path.exists(cache_dir):
-        os.makedirs(cache_dir)
-    # save the cache object "hash:mtime"
-    cache_object = '{0}:{1}'.format(ret['hsum'], os.path.getmtime(path))
-    with salt.utils.flopen(cache_path, 'w') as fp_:
-        fp_.write(cache_object)
+    entry = [stat.st_size, stat.st_mtime, stat.st_ino, ret['hsum']]
+    index[path] = entry
+    # Hand the new entry to the fileserver update loop, which folds it into
+    # the index file for the other workers
+    try:
+        with salt.utils.fopen(_hash_index_path('journal'), 'a') as fp_:
+            fp_.write(json.dumps([__opts__['hash_type'], path] + entry))
+            fp_.write('\n')
+    except (IOError, OSError) as exc:
+        log.debug('Unable to record hash of {0}: {1}'.format(path, exc))
     return ret
 
 
@@ -6,6 +6,7 @@ Routines to set up a minion
 # Import python libs
 import os
 import imp
+import re
 import sys
 import salt
 import logging
@@ -15,6 +16,11 @@ import time
 from collections import MutableMapping
 
 # Import salt libs
+import salt.payload
+import salt.utils
+import salt.utils.atomicfile
+from salt.utils.cache import RecordingDict
+import salt.version
 from salt.exceptions import LoaderError
 from salt.template import check_render_pipe_str
 from salt.utils.decorators import Depends
@@ -31,6 +37,15 @@ log = logging.getLogger(__name__)
 SALT_BASE_PATH = os.path.abspath(os.path.dirname(salt.__file__))
 LOADED_BASE_NAME = 'salt.loaded'
 
+# Returned by VirtualCache.get() when there is no usable result
+_MISS = object()
+
+# Find the virtual name of a module in its source, see _read_virtualname()
+_VIRTUALNAME_ASSIGN_RE = re.compile(r'^__virtualname__\s*=', re.M)
+_VIRTUALNAME_RE = re.compile(
+    r'''^__virtualname__\s*=\s*['"](\w+)['"]\s*(?:#.*)?$''', re.M
+)
+
 # Because on the cloud drivers we do `from salt.cloud.libcloudfuncs import *`
 # which simplifies code readability, it adds some unsupported functions into
 # the driver's module scope.
@@ -114,7 +129,9 @@ def minion_mods(opts, context=None, whitelist=None):
     Load execution modules
 
     Returns a dictionary of execution modules appropriate for the current
-    system by evaluating the __virtual__() function in each module.
+    system by evaluating the __virtual__() function in each module. The
+    modules are loaded lazily, a module is only imported when one of its
+    functions is first used.
 
     .. code-block:: python
 
@@ -132,14 +149,10 @@ def minion_mods(opts, context=None, whitelist=None):
             'value': context}
     if not whitelist:
         whitelist = opts.get('whitelist_modules', None)
-    functions = load.gen_functions(
-        pack,
-        whitelist=whitelist,
-        provider_overrides=True
-    )
-    # Enforce dependencies of module functions from "functions"
-    Depends.enforce_dependencies(functions)
-    return functions
+    return LazyLoader(load,
+                      pack=pack,
+                      whitelist=whitelist,
+                      provider_overrides=True)
 
 
 def raw_mod(opts, name, functions):
@@ -498,6 +511,143 @@ def in_pack(pack, name):
     return False
 
 
+def _source_path(mod_path):
+    '''
+    Return the path of the source file of a module file or package
+    '''
+    if os.path.isdir(mod_path):
+        return os.path.join(mod_path, '__init__.py')
+    if mod_path.endswith(('.pyc', '.pyo')):
+        return mod_path[:-1]
+    return mod_path
+
+
+def _read_virtualname(path):
+    '''
+    Return the ``__virtualname__`` set in the module source at ``path``,
+    False if it does not set one and None if it can not be told
+    '''
+    if not path.endswith(('.py', '.pyx')):
+        return None
+    try:
+        with salt.utils.fopen(path, 'r') as fp_:
+            source = fp_.read()
+    except (IOError, OSError):
+        return None
+    if not _VIRTUALNAME_ASSIGN_RE.search(source):
+        return False
+    match = _VIRTUALNAME_RE.search(source)
+    if match is None:
+        return None
+    return match.group(1)
+
+
+def _deps_match(deps, current):
+    '''
+    Return True if the keys recorded by RecordingDict.deps() have the same
+    values in the current dict
+    '''
+    if deps['all']:
+        return dict(current) == deps['values']
+    for key, val in deps['values'].iteritems():
+        if key not in current or current[key] != val:
+            return False
+    for key in deps['missing']:
+        if key in current:
+            return False
+    return True
+
+
+class VirtualCache(object):
+    '''
+    The results of the ``__virtual__`` functions of a loader's modules,
+    kept in the cachedir.
+
+    A result is reused as long as the module file has the same mtime and
+    size, salt has the same version, the grains and options the
+    ``__virtual__`` function looked at have the same values, and it is not
+    older than ``virtual_cache_expire`` seconds.
+    '''
+    def __init__(self, opts, tag):
+        self.path = os.path.join(opts['cachedir'],
+                                 'loader',
+                                 '{0}_virtual.p'.format(tag))
+        self.expire = opts.get('virtual_cache_expire', 3600)
+        self.serial = salt.payload.Serial(opts)
+        self.dirty = False
+        self.entries = {}
+        try:
+            with salt.utils.fopen(self.path, 'rb') as fp_:
+                data = self.serial.load(fp_)
+            if data.get('version') == salt.version.__version__:
+                self.entries = data['entries']
+        except Exception:
+            # No usable cache
+            pass
+
+    def _stat(self, source):
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None
+        return [stat.st_mtime, stat.st_size]
+
+    def get(self, source, grains, opts):
+        '''
+        Return the cached result of the module's ``__virtual__`` function,
+        or _MISS
+        '''
+        entry = self.entries.get(source)
+        if entry is None:
+            return _MISS
+        if time.time() - entry['time'] > self.expire:
+            return _MISS
+        if entry['stat'] != self._stat(source):
+            return _MISS
+        if not _deps_match(entry['grains'], grains) \
+                or not _deps_match(entry['opts'], opts):
+            return _MISS
+        return entry['virtual']
+
+    def set(self, source, virtual, grains, opts):
+        '''
+        Store the result of a module's ``__virtual__`` function along with
+        the grains and opts it looked at, given as RecordingDicts
+        '''
+        stat = self._stat(source)
+        if stat is None:
+            return
+        entry = {'stat': stat,
+                 'time': time.time(),
+                 'virtual': virtual,
+                 'grains': grains.deps(),
+                 'opts': opts.deps()}
+        try:
+            self.serial.dumps(entry)
+        except Exception:
+            # The values looked at can not be stored, don't cache
+            return
+        self.entries[source] = entry
+        self.dirty = True
+
+    def write(self):
+        '''
+        Write the cache out if it changed
+        '''
+        if not self.dirty:
+            return
+        self.dirty = False
+        try:
+            if not os.path.isdir(os.path.dirname(self.path)):
+                os.makedirs(os.path.dirname(self.path))
+            with salt.utils.atomicfile.atomic_open(self.path, 'w+b') as fp_:
+                self.serial.dump({'version': salt.version.__version__,
+                                  'entries': self.entries}, fp_)
+        except (IOError, OSError) as exc:
+            log.debug('Unable to write the virtual cache {0}: {1}'.format(
+                self.path, exc))
+
+
 class Loader(object):
     '''
     Used to load in arbitrary modules from a directory, the Loader can
@@ -527,6 +677,9 @@ class Loader(object):
         self.mod_type_check = mod_type_check or _mod_type
         if self.opts.get('grains_cache', False):
             self.serial = salt.payload.Serial(self.opts)
+        self.virtual_cache = None
+        if self.opts.get('virtual_cache', False) and 'cachedir' in self.opts:
+            self.virtual_cache = VirtualCache(self.opts, self.tag)
 
     def __prep_mod_opts(self, opts):
         '''
@@ -694,11 +847,14 @@ class Loader(object):
                 self._apply_outputter(func, mod)
         if not hasattr(mod, '__salt__'):
             mod.__salt__ = functions
+        # Only look at the functions a LazyLoader already loaded, listing its
+        # keys would load all of them
+        loaded = getattr(functions, 'loaded_functions', functions)
         try:
             context = sys.modules[
-                functions[functions.keys()[0]].__module__
+                loaded[next(iter(loaded))].__module__
             ].__context__
-        except (AttributeError, IndexError):
+        except (AttributeError, TypeError, StopIteration):
             context = {}
         mod.__context__ = context
         return funcs
@@ -709,78 +865,14 @@ class Loader(object):
         Return a dict of functions found in the defined module_dirs
         '''
         funcs = {}
-        self.load_modules()
+        self.load_modules(skip_unavailable=virtual_enable)
         for mod in self.modules:
-            # If this is a proxy minion then MOST modules cannot work.  Therefore, require that
-            # any module that does work with salt-proxy-minion define __proxyenabled__ as a list
-            # containing the names of the proxy types that the module supports.
-            if not hasattr(mod, 'render') and 'proxy' in self.opts:
-                if not hasattr(mod, '__proxyenabled__'):
-                    # This is a proxy minion but this module doesn't support proxy
-                    # minions at all
-                    continue
-                if not self.opts['proxy']['proxytype'] in mod.__proxyenabled__ or \
-                        '*' in mod.__proxyenabled__:
-                    # This is a proxy minion, this module supports proxy
-                    # minions, but not this particular minion
-                    log.debug(mod)
-                    continue
-
-            if hasattr(mod, '__opts__'):
-                mod.__opts__.update(self.opts)
-            else:
-                mod.__opts__ = self.opts
-
-            mod.__grains__ = self.grains
-            mod.__pillar__ = self.pillar
-
-            if pack:
-                if isinstance(pack, list):
-                    for chunk in pack:
-                        if not isinstance(chunk, dict):
-                            continue
-                        try:
-                            setattr(mod, chunk['name'], chunk['value'])
-                        except KeyError:
-                            pass
-                else:
-                    setattr(mod, pack['name'], pack['value'])
-
-            # Call a module's initialization method if it exists
-            if hasattr(mod, '__init__'):
-                if callable(mod.__init__):
-                    try:
-                        mod.__init__(self.opts)
-                    except TypeError:
-                        pass
-
-            # Trim the full pathname to just the module
-            # this will be the short name that other salt modules and state
-            # will refer to it as.
-            module_name = mod.__name__.rsplit('.', 1)[-1]
-
-            if virtual_enable:
-                # if virtual modules are enabled, we need to look for the
-                # __virtual__() function inside that module and run it.
-                (virtual_ret, virtual_name) = self.process_virtual(mod,
-                                                                   module_name)
-
-                # if process_virtual returned a non-True value then we are
-                # supposed to not process this module
-                if virtual_ret is not True:
-                    continue
-
-                # update our module name to reflect the virtual name
-                module_name = virtual_name
-
-            if whitelist:
-                # If a whitelist is defined then only load the module if it is
-                # in the whitelist
-                if module_name not in whitelist:
-                    continue
-
+            ret = self.prep_module(mod, pack, virtual_enable, whitelist)
+            if ret is None:
+                continue
             # load the functions from the module and update our dict
-            funcs.update(self.load_functions(mod, module_name))
+            funcs.update(ret[1])
+        self.write_virtual_cache()
 
         # Handle provider overrides
         if provider_overrides and self.opts.get('providers', False):
@@ -810,25 +902,110 @@ class Loader(object):
                 mod.__salt__.update(funcs)
         return funcs
 
-    def load_modules(self):
+    def prep_module(self, mod, pack=None, virtual_enable=True,
+                    whitelist=None):
+        '''
+        Pack an imported module and run its ``__virtual__`` function.
+
+        Returns a tuple of the name the module is loaded as and a dict of its
+        functions, or None if the module is not to be loaded.
+        '''
+        # If this is a proxy minion then MOST modules cannot work.  Therefore, require that
+        # any module that does work with salt-proxy-minion define __proxyenabled__ as a list
+        # containing the names of the proxy types that the module supports.
+        if not hasattr(mod, 'render') and 'proxy' in self.opts:
+            if not hasattr(mod, '__proxyenabled__'):
+                # This is a proxy minion but this module doesn't support proxy
+                # minions at all
+                return None
+            if not self.opts['proxy']['proxytype'] in mod.__proxyenabled__ or \
+                    '*' in mod.__proxyenabled__:
+                # This is a proxy minion, this module supports proxy
+                # minions, but not this particular minion
+                log.debug(mod)
+                return None
+
+        if hasattr(mod, '__opts__'):
+            mod.__opts__.update(self.opts)
+        else:
+            mod.__opts__ = self.opts
+
+        mod.__grains__ = self.grains
+        mod.__pillar__ = self.pillar
+
+        if pack:
+            if isinstance(pack, list):
+                for chunk in pack:
+                    if not isinstance(chunk, dict):
+                        continue
+                    try:
+                        setattr(mod, chunk['name'], chunk['value'])
+                    except KeyError:
+                        pass
+            else:
+                setattr(mod, pack['name'], pack['value'])
+
+        # Call a module's initialization method if it exists
+        if hasattr(mod, '__init__'):
+            if callable(mod.__init__):
+                try:
+                    mod.__init__(self.opts)
+                except TypeError:
+                    pass
+
+        # Trim the full pathname to just the module
+        # this will be the short name that other salt modules and state
+        # will refer to it as.
+        module_name = mod.__name__.rsplit('.', 1)[-1]
+
+        if virtual_enable:
+            # if virtual modules are enabled, we need to look for the
+            # __virtual__() function inside that module and run it.
+            (virtual_ret, virtual_name) = self.process_virtual(mod,
+                                                               module_name)
+
+            # if process_virtual returned a non-True value then we are
+            # supposed to not process this module
+            if virtual_ret is not True:
+                return None
+
+            # update our module name to reflect the virtual name
+            module_name = virtual_name
+
+        if whitelist:
+            # If a whitelist is defined then only load the module if it is
+            # in the whitelist
+            if module_name not in whitelist:
+                return None
+
+        return module_name, self.load_functions(mod, module_name)
+
+    def load_modules(self, skip_unavailable=False):
         '''
         Loads all of the modules from module_dirs and returns a list of them
+
+        If skip_unavailable is True the modules the virtual cache knows not
+        to load are not imported.
         '''
         self.modules = []
+        names = self.module_files()
+        for name in names:
+            if skip_unavailable and self.known_unavailable(names[name]):
+                continue
+            mod = self.load_module(name, names[name])
+            if mod is not None:
+                self.modules.append(mod)
 
+    def module_files(self):
+        '''
+        Return a dict mapping the names of the modules found in module_dirs to
+        the path of their file, without importing them
+        '''
         log.trace('loading {0} in {1}'.format(self.tag, self.module_dirs))
         names = {}
         disable = set(self.opts.get('disable_{0}s'.format(self.tag), []))
 
-        cython_enabled = False
-        if self.opts.get('cython_enable', True) is True:
-            try:
-                import pyximport
-                pyximport.install()
-                cython_enabled = True
-            except ImportError:
-                log.info('Cython is enabled in the options but not present '
-                         'in the system path. Skipping Cython modules.')
+        cython_enabled = self._cython_enabled()
         for mod_dir in self.module_dirs:
             if not os.path.isabs(mod_dir):
                 log.trace(
@@ -873,72 +1050,145 @@ class Loader(object):
                             fn_
                         )
                     )
-        for name in names:
+        return names
+
+    def module_index(self, names):
+        '''
+        Return a dict mapping the names modules are loaded as to the names of
+        the module files (as returned by :py:meth:`module_files`) which may
+        provide them, without importing them.
+
+        A module is loaded as its ``__virtualname__`` if it sets one, which
+        is read from the source of the module. Modules whose source can not
+        be read, or which set ``__virtualname__`` to anything but a string
+        literal, are listed under ``None``. The virtual names read are cached
+        in the cachedir, keyed on the path and mtime of the module files.
+        '''
+        cache = {}
+        cache_path = None
+        if 'cachedir' in self.opts:
+            cache_path = os.path.join(self.opts['cachedir'],
+                                      'loader',
+                                      '{0}_index.p'.format(self.tag))
             try:
-                if names[name].endswith('.pyx'):
-                    # If there's a name which ends in .pyx it means the above
-                    # cython_enabled is True. Continue...
-                    mod = pyximport.load_module(
-                        '{0}.{1}.{2}.{3}'.format(
-                            self.loaded_base_name,
-                            self.mod_type_check(names[name]),
-                            self.tag,
-                            name
-                        ), names[name], tempfile.gettempdir()
-                    )
-                else:
-                    fn_, path, desc = imp.find_module(name, self.module_dirs)
-                    mod = imp.load_module(
-                        '{0}.{1}.{2}.{3}'.format(
-                            self.loaded_base_name,
-                            self.mod_type_check(path),
-                            self.tag,
-                            name
-                        ), fn_, path, desc
-                    )
-                    # reload all submodules if necessary
-                    submodules = [
-                        getattr(mod, sname) for sname in dir(mod) if
-                        isinstance(getattr(mod, sname), mod.__class__)
-                    ]
-
-                    # reload only custom "sub"modules i.e is a submodule in
-                    # parent module that are still available on disk (i.e. not
-                    # removed during sync_modules)
-                    for submodule in submodules:
-                        try:
-                            smname = '{0}.{1}.{2}'.format(
-                                self.loaded_base_name,
-                                self.tag,
-                                name
-                            )
-                            smfile = '{0}.py'.format(
-                                os.path.splitext(submodule.__file__)[0]
-                            )
-                            if submodule.__name__.startswith(smname) and \
-                                    os.path.isfile(smfile):
-                                reload(submodule)
-                        except AttributeError:
-                            continue
+                with salt.utils.fopen(cache_path, 'rb') as fp_:
+                    cache = salt.payload.Serial(self.opts).load(fp_)
+            except Exception:
+                cache = {}
+        new_cache = {}
+        index = {}
+        for name, mod_path in names.iteritems():
+            source = _source_path(mod_path)
+            try:
+                mtime = os.path.getmtime(source)
+            except OSError:
+                mtime = None
+            entry = cache.get(source)
+            if entry is None or entry[0] != mtime:
+                entry = [mtime, _read_virtualname(source)]
+            new_cache[source] = entry
+            if entry[1] is False:
+                # No __virtualname__, the module is loaded as its file name
+                index.setdefault(name, []).append(name)
+            else:
+                index.setdefault(entry[1], []).append(name)
+        if cache_path is not None and new_cache != cache:
+            try:
+                if not os.path.isdir(os.path.dirname(cache_path)):
+                    os.makedirs(os.path.dirname(cache_path))
+                with salt.utils.atomicfile.atomic_open(cache_path,
+                                                       'w+b') as fp_:
+                    salt.payload.Serial(self.opts).dump(new_cache, fp_)
+            except (IOError, OSError) as exc:
+                log.debug('Unable to write the {0} module index: {1}'.format(
+                    self.tag, exc))
+        return index
+
+    def _cython_enabled(self):
+        '''
+        Return True if cython modules can be loaded
+        '''
+        if self.opts.get('cython_enable', True) is True:
+            try:
+                import pyximport
+                pyximport.install()
+                return True
             except ImportError:
-                log.debug(
-                    'Failed to import {0} {1}, this is most likely NOT a '
-                    'problem:\n'.format(
-                        self.tag, name
-                    ),
-                    exc_info=True
+                log.info('Cython is enabled in the options but not present '
+                         'in the system path. Skipping Cython modules.')
+        return False
+
+    def load_module(self, name, mod_path):
+        '''
+        Import the module ``name`` found at ``mod_path`` by
+        :py:meth:`module_files`, returns None if it fails to import
+        '''
+        try:
+            if mod_path.endswith('.pyx'):
+                # If there's a name which ends in .pyx it means the above
+                # cython_enabled is True. Continue...
+                import pyximport
+                mod = pyximport.load_module(
+                    '{0}.{1}.{2}.{3}'.format(
+                        self.loaded_base_name,
+                        self.mod_type_check(mod_path),
+                        self.tag,
+                        name
+                    ), mod_path, tempfile.gettempdir()
                 )
-                continue
-            except Exception:
-                log.error(
-                    'Failed to import {0} {1}, this is due most likely to a '
-                    'syntax error. Traceback raised:\n'.format(
-                        self.tag, name
-                    ),
-                    exc_info=True
+            else:
+                fn_, path, desc = imp.find_module(name, self.module_dirs)
+                mod = imp.load_module(
+                    '{0}.{1}.{2}.{3}'.format(
+                        self.loaded_base_name,
+                        self.mod_type_check(path),
+                        self.tag,
+                        name
+                    ), fn_, path, desc
                 )
-                continue
-            self.modules.append(mod)
+                # reload all submodules if necessary
+                submodules = [
+                    getattr(mod, sname) for sname in dir(mod) if
+                    isinstance(getattr(mod, sname), mod.__class__)
+                ]
+
+                # reload only custom "sub"modules i.e is a submodule in
+                # parent module that are still available on disk (i.e. not
+                # removed during sync_modules)
+                for submodule in submodules:
+                    try:
+                        smname = '{0}.{1}.{2}'.format(
+                            self.loaded_base_name,
+                            self.tag,
+                            name
+                        )
+                        smfile = '{0}.py'.format(
+                            os.path.splitext(submodule.__file__)[0]
+                        )
+                        if submodule.__name__.startswith(smname) and \
+                                os.path.isfile(smfile):
+                            reload(submodule)
+                    except AttributeError:
+                        continue
+        except ImportError:
+            log.debug(
+                'Failed to import {0} {1}, this is most likely NOT a '
+                'problem:\n'.format(
+                    self.tag, name
+                ),
+                exc_info=True
+            )
+            return None
+        except Exception:
+            log.error(
+                'Failed to import {0} {1}, this is due most likely to a '
+                'syntax error. Traceback raised:\n'.format(
+                    self.tag, name
+                ),
+                exc_info=True
+            )
+            return None
+        return mod
 
     def load_functions(self, mod, module_name):
         '''
@@ -998,6 +1248,51 @@ class Loader(object):
                 self._apply_outputter(func, mod)
         return funcs
 
+    def known_unavailable(self, mod_path):
+        '''
+        Return True if the virtual cache knows the ``__virtual__`` function of
+        the module file at ``mod_path`` prevents it from loading, so it does
+        not need to be imported
+        '''
+        if self.virtual_cache is None:
+            return False
+        virtual = self.virtual_cache.get(_source_path(mod_path),
+                                         self.grains,
+                                         self.opts)
+        return virtual is not _MISS and not virtual
+
+    def write_virtual_cache(self):
+        '''
+        Write the virtual cache out, if it is enabled
+        '''
+        if self.virtual_cache is not None:
+            self.virtual_cache.write()
+
+    def _call_virtual(self, mod):
+        '''
+        Run the module's ``__virtual__`` function, or return its result from
+        the virtual cache if the cache knows the module does not load.
+
+        The function of a module which loads always runs, some of them set up
+        the module, e.g. with ``_namespaced_function`` or module globals.
+        '''
+        if self.virtual_cache is None or not hasattr(mod, '__file__'):
+            return mod.__virtual__()
+        source = _source_path(mod.__file__)
+        virtual = self.virtual_cache.get(source, mod.__grains__, mod.__opts__)
+        if virtual is not _MISS and not virtual:
+            return virtual
+        # Record the grains and opts the __virtual__ function looks at
+        orig = (mod.__grains__, mod.__opts__)
+        grains = mod.__grains__ = RecordingDict(mod.__grains__)
+        opts = mod.__opts__ = RecordingDict(mod.__opts__)
+        try:
+            virtual = mod.__virtual__()
+        finally:
+            mod.__grains__, mod.__opts__ = orig
+        self.virtual_cache.set(source, virtual, grains, opts)
+        return virtual
+
     def process_virtual(self, mod, module_name):
         '''
         Given a loaded module and its default name determine its virtual name
@@ -1028,13 +1323,13 @@ class Loader(object):
             if hasattr(mod, '__virtual__') and callable(mod.__virtual__):
                 if self.opts.get('virtual_timer', False):
                     start = time.time()
-                    virtual = mod.__virtual__()
+                    virtual = self._call_virtual(mod)
                     end = time.time() - start
                     msg = 'Virtual function took {0} seconds for {1}'.format(
                             end, module_name)
                     log.warning(msg)
                 else:
-                    virtual = mod.__virtual__()
+                    virtual = self._call_virtual(mod)
                 if not virtual:
                     # if __virtual__() evaluates to False then the module
                     # wasn't meant for this platform or it's not supposed to
@@ -1251,17 +1546,22 @@ class Loader(object):
 
 class LazyLoader(MutableMapping):
     '''
-    Lazily load things modules. If anyone asks for len or attempts to iterate this
-    will load them all.
-
-    TODO: negative caching? If you ask for 'foo.bar' and it doesn't exist it will
-    look EVERY time unless someone calls load_all()
+    Lazily load modules. A module is only imported, and its ``__virtual__``
+    function run, when one of its functions is first looked up. The module
+    files which can provide a function are found through the index built by
+    :py:meth:`Loader.module_index`, so looking up ``pkg.install`` only
+    imports the modules which set ``__virtualname__ = 'pkg'`` until one of
+    them loads.
+
+    If anyone asks for len or attempts to iterate this will load them all.
     '''
     def __init__(self,
                  loader,
                  functions=None,
                  pack=None,
-                 whitelist=None):
+                 whitelist=None,
+                 virtual_enable=True,
+                 provider_overrides=False):
         # create a dict to store module functions in
         self._dict = {}
 
@@ -1272,41 +1572,128 @@ class LazyLoader(MutableMapping):
             self.functions = functions
         self.pack = pack
         self.whitelist = whitelist
+        self.virtual_enable = virtual_enable
+        self.providers = {}
+        if provider_overrides and \
+                isinstance(loader.opts.get('providers'), dict):
+            self.providers = loader.opts['providers']
+
+        # the module files and the names they can be loaded as
+        self.files = loader.module_files()
+        self.index = loader.module_index(self.files)
+        # the module files already imported, whether they loaded or not
+        self.attempted = set()
+        # the names of the modules loaded
+        self.loaded_names = set()
+        self.modules = []
+        self._overrides = {}
 
         # have we already loded everything?
         self.loaded = False
 
-    def _load(self, key):
+    @property
+    def loaded_functions(self):
+        '''
+        The functions loaded so far
+        '''
+        return self._dict
+
+    def _mod_key(self, key):
         '''
-        Load a single item if you have it
+        Return the name of the module providing the given key
         '''
         # if the key doesn't have a '.' then it isn't valid for this mod dict
         if '.' not in key:
-            raise KeyError
-        mod_key = key.split('.', 1)[0]
+            raise KeyError(key)
+        return key.split('.', 1)[0]
+
+    def _add_funcs(self, module_name, funcs):
+        '''
+        Add the functions of a freshly loaded module
+        '''
+        self._dict.update(funcs)
+        # Enforce dependencies of module functions
+        Depends.enforce_dependencies(self._dict)
+
+    def _load_file(self, name):
+        '''
+        Import a module file and add its functions if it loads
+        '''
+        self.attempted.add(name)
+        if self.virtual_enable and \
+                self.loader.known_unavailable(self.files[name]):
+            return
+        mod = self.loader.load_module(name, self.files[name])
+        if mod is None:
+            return
+        self.modules.append(mod)
+        if not in_pack(self.pack, '__salt__'):
+            # Modules look up functions of other modules through the loader,
+            # this includes the __virtual__ function
+            mod.__salt__ = self.functions or self
+        ret = self.loader.prep_module(mod,
+                                      self.pack,
+                                      self.virtual_enable,
+                                      self.whitelist)
+        if ret is None:
+            return
+        module_name, funcs = ret
+        if module_name in self.loaded_names:
+            # Another module file already provides this module
+            return
+        self.loaded_names.add(module_name)
+        self._add_funcs(module_name, funcs)
+        if module_name in self.providers:
+            self._provider_override(module_name)
+
+    def _provider_override(self, module_name):
+        '''
+        Replace the functions of a module with the ones of the provider
+        configured for it in the providers option
+        '''
+        if module_name not in self._overrides:
+            self._overrides[module_name] = {}
+            newfuncs = raw_mod(self.loader.opts,
+                               self.providers[module_name],
+                               self)
+            for newfunc in newfuncs or {}:
+                f_key = '{0}{1}'.format(
+                    module_name, newfunc[newfunc.rindex('.'):]
+                )
+                self._overrides[module_name][f_key] = newfuncs[newfunc]
+        self._add_funcs(module_name, self._overrides[module_name])
+
+    def _load(self, key):
+        '''
+        Load the module providing the key, raises KeyError if no module does
+        '''
+        mod_key = self._mod_key(key)
         if self.whitelist:
             # if the modulename isn't in the whitelist, don't bother
             if mod_key not in self.whitelist:
-                raise KeyError
-        mod_funcs = self.loader.gen_module(mod_key,
-                                           self.functions,
-                                           pack=self.pack,
-                                           )
-        # if you loaded nothing, then we don't have it
-        if mod_funcs is None:
-            # if we couldn't find it, then it could be a virtual or we don't have it
-            # until we have a better way, we have to load them all to know
-            # TODO: maybe do a load until, with some glob match first?
-            self.load_all()
-            return self._dict[key]
-        self._dict.update(mod_funcs)
+                raise KeyError(key)
+        for name in self.index.get(mod_key, []) + self.index.get(None, []):
+            if key in self._dict:
+                break
+            if name not in self.attempted:
+                self._load_file(name)
+        if mod_key in self.providers and mod_key not in self._overrides:
+            self._provider_override(mod_key)
+        self.loader.write_virtual_cache()
+        if key not in self._dict:
+            raise KeyError(key)
 
     def load_all(self):
         '''
         Load all of them
         '''
-        self._dict.update(self.loader.gen_functions(pack=self.pack,
-                                                    whitelist=self.whitelist))
+        for name in self.files:
+            if name not in self.attempted:
+                self._load_file(name)
+        for module_name in self.providers:
+            if module_name not in self._overrides:
+                self._provider_override(module_name)
+        self.loader.write_virtual_cache()
         self.loaded = True
 
     def __setitem__(self, key, val):
@@ -1336,6 +1723,10 @@ class LazyLoader(MutableMapping):
             self.load_all()
         return iter(self._dict)
 
+    def __nonzero__(self):
+        # Do not load everything to tell if there is anything to load
+        return bool(self._dict) or bool(self.files)
+
 
 class LazyFilterLoader(LazyLoader):
     '''
@@ -1355,31 +1746,11 @@ class LazyFilterLoader(LazyLoader):
                             pack=pack,
                             whitelist=whitelist)
 
-    def _load(self, key):
-        if self.whitelist:
-            # if the modulename isn't in the whitelist, don't bother
-            if key not in self.whitelist:
-                raise KeyError
-        mod_funcs = self.loader.gen_module(key,
-                                           self.functions,
-                                           pack=self.pack,
-                                           )
-        # if you loaded nothing, then we don't have it
-        if mod_funcs is None:
-            # if we couldn't find it, then it could be a virtual or we don't have it
-            # until we have a better way, we have to load them all to know
-            # TODO: maybe do a load until, with some glob match first?
-            self.load_all()
-            return self._dict[key]
+    def _mod_key(self, key):
+        return key
 
-        # if we got one, now lets check if we have the function name we want
-        for mod_key, mod_fun in mod_funcs.iteritems():
-            # if the name (after '.') is "name", then rename to mod_name: fun
-            if mod_key[mod_key.index('.') + 1:] == self.name:
-                self._dict[mod_key[:mod_key.index('.')]] = mod_fun
-
-    def load_all(self):
-        filtered_funcs = self.loader.filter_func(self.name,
-                                                 pack=self.pack,
-                                                 whitelist=self.whitelist)
-        self._dict.update(filtered_funcs)
+    def _add_funcs(self, module_name, funcs):
+        # if the name (after '.') is "name", then rename to mod_name: fun
+        fun = '{0}.{1}'.format(module_name, self.name)
+        if fun in funcs:
+            self._dict[module_name] = funcs[fun]
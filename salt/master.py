@@ -16,6 +16,8 @@ import hashlib
 import resource
 import multiprocessing
 import sys
+import threading
+from multiprocessing.pool import ThreadPool
 
 # Import third party libs
 import zmq
@@ -29,6 +31,7 @@ import salt.exitcodes
 import salt.payload
 import salt.pillar
 import salt.state
+import salt.template
 import salt.runner
 import salt.auth
 import salt.wheel
@@ -42,6 +45,7 @@ import salt.utils.event
 import salt.utils.verify
 import salt.utils.minions
 import salt.utils.gzip_util
+import salt.utils.job_cache
 from salt.utils.debug import enable_sigusr1_handler, enable_sigusr2_handler, inspect_stack
 from salt.exceptions import MasterExit
 from salt.utils.event import tagify
@@ -63,6 +67,9 @@ except ImportError:
 
 log = logging.getLogger(__name__)
 
+# Job cache returners which write a salt.payload.Raw return as it is
+RAW_RETURNERS = frozenset(['local_cache', 'sqlite_cache'])
+
 
 def clean_proc(proc, wait_for_kill=10):
     '''
@@ -294,6 +301,8 @@ class Master(SMaster):
         log.info(
             'salt-master is starting as user {0!r}'.format(salt.utils.get_user())
         )
+        # The cached pillars were compiled with the options of the last run
+        salt.pillar.clear_pillar_cache(self.opts)
 
         enable_sigusr1_handler()
         enable_sigusr2_handler()
@@ -448,6 +457,64 @@ class Publisher(multiprocessing.Process):
                 context.term()
 
 
+class AESKey(object):
+    '''
+    The AES session key shared by the master processes. The key is kept in
+    shared memory next to a generation counter which is bumped whenever the
+    key is replaced, so a worker only has to compare the counter to the
+    generation of its crypticle before every request.
+    '''
+    def __init__(self, aes):
+        self._lock = multiprocessing.Lock()
+        self._key = multiprocessing.RawArray('c', 128)
+        self._generation = multiprocessing.RawValue('L', 0)
+        self.mtime = 0
+        self.set(aes)
+
+    @property
+    def generation(self):
+        '''
+        The generation of the current key
+        '''
+        return self._generation.value
+
+    def get(self):
+        '''
+        Return the current key and its generation
+        '''
+        with self._lock:
+            return self._key.value, self._generation.value
+
+    def set(self, aes):
+        '''
+        Replace the key, every worker picks it up before its next request
+        '''
+        with self._lock:
+            self._key.value = aes
+            self._generation.value += 1
+
+    def load_dropfile(self, cachedir):
+        '''
+        Replace the key with the one in the ``.dfn`` file written by
+        salt.crypt.dropfile, returns True if the key was replaced
+        '''
+        dfn = os.path.join(cachedir, '.dfn')
+        try:
+            stats = os.stat(dfn)
+        except os.error:
+            return False
+        if stats.st_mode != 0100400 or stats.st_mtime <= self.mtime:
+            # Invalid or already loaded dfn
+            return False
+        with salt.utils.fopen(dfn) as fp_:
+            aes = fp_.read()
+        if len(aes) != 76:
+            return False
+        self.set(aes)
+        self.mtime = stats.st_mtime
+        return True
+
+
 class ReqServer(object):
     '''
     Starts up the master request server, minions send results to this
@@ -477,6 +544,20 @@ class ReqServer(object):
         # Prepare the AES key
         self.key = key
         self.crypticle = crypticle
+        self.aes_key = AESKey(self.opts['aes'])
+
+    def __watch_aes(self):
+        '''
+        Hand the AES keys dropped by key rotation to the workers
+        '''
+        while True:
+            try:
+                if self.aes_key.load_dropfile(self.opts['cachedir']):
+                    log.info('The AES session key was rotated')
+            except Exception:
+                log.error('Failed to load the rotated AES session key',
+                          exc_info=True)
+            time.sleep(1)
 
     def __bind(self):
         '''
@@ -497,6 +578,7 @@ class ReqServer(object):
                                            self.master_key,
                                            self.key,
                                            self.crypticle,
+                                           self.aes_key,
                                            )
                                    )
 
@@ -504,6 +586,10 @@ class ReqServer(object):
             log.info('Starting Salt worker process {0}'.format(ind))
             proc.start()
 
+        watcher = threading.Thread(target=self.__watch_aes)
+        watcher.daemon = True
+        watcher.start()
+
         self.workers.bind(self.w_uri)
 
         try:
@@ -587,29 +673,41 @@ class MWorker(multiprocessing.Process):
     The worker multiprocess instance to manage the backend operations for the
     salt master.
     '''
+    # The AES commands which mostly wait on I/O, these run on the thread pool
+    # when worker_io_threads is set
+    io_funcs = frozenset(['_pillar',
+                          '_return',
+                          '_syndic_return',
+                          '_serve_file',
+                          '_file_recv'])
+
     def __init__(self,
                  opts,
                  mkey,
                  key,
-                 crypticle):
+                 crypticle,
+                 aes_key=None):
         multiprocessing.Process.__init__(self)
         self.opts = opts
         self.serial = salt.payload.Serial(opts)
         self.crypticle = crypticle
         self.mkey = mkey
         self.key = key
-        self.k_mtime = 0
+        self.aes_key = aes_key
+        self.k_gen = aes_key.generation if aes_key is not None else 0
 
     def __bind(self):
         '''
         Bind to the local port
         '''
         context = zmq.Context(1)
-        socket = context.socket(zmq.REP)
         w_uri = 'ipc://{0}'.format(
             os.path.join(self.opts['sock_dir'], 'workers.ipc')
             )
         log.info('Worker binding to socket {0}'.format(w_uri))
+        if self.opts.get('worker_io_threads', 0) > 0:
+            return self.__bind_multiplexed(context, w_uri)
+        socket = context.socket(zmq.REP)
         try:
             socket.connect(w_uri)
             while True:
@@ -638,8 +736,112 @@ class MWorker(multiprocessing.Process):
 
         # Changes here create a zeromq condition, check with thatch45 before
         # making any zeromq changes
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, MasterExit):
             socket.close()
+            if self.aes_funcs.return_writer is not None:
+                self.aes_funcs.return_writer.flush()
+
+    def __bind_multiplexed(self, context, w_uri):
+        '''
+        Serve several requests at once. A DEALER socket sees the envelope of
+        every request, so replies can be sent in any order. The commands in
+        ``io_funcs`` run on a pool of ``worker_io_threads`` threads which hand
+        their replies back over an inproc socket, everything else is handled
+        in this thread.
+        '''
+        threads = self.opts['worker_io_threads']
+        socket = context.socket(zmq.DEALER)
+        socket.connect(w_uri)
+        r_uri = 'inproc://replies'
+        replies = context.socket(zmq.PULL)
+        replies.bind(r_uri)
+        # Only used from the thread which runs the pool callbacks
+        reply_push = context.socket(zmq.PUSH)
+        reply_push.connect(r_uri)
+        self.io_pool = ThreadPool(threads)
+        # Stop taking new requests once every thread is busy and as many
+        # requests are waiting for a thread
+        max_pending = threads * 2
+        pending = 0
+        poller = zmq.Poller()
+        poller.register(replies, zmq.POLLIN)
+        try:
+            while True:
+                try:
+                    # zmq.Poller.register with no flags drops the socket
+                    poller.register(
+                        socket, zmq.POLLIN if pending < max_pending else 0)
+                    events = dict(poller.poll())
+                    if events.get(replies) == zmq.POLLIN:
+                        socket.send_multipart(replies.recv_multipart())
+                        pending -= 1
+                    if events.get(socket) == zmq.POLLIN:
+                        frames = socket.recv_multipart()
+                        if self._handle_frames(frames, reply_push.send_multipart):
+                            pending += 1
+                        else:
+                            socket.send_multipart(frames)
+                except KeyboardInterrupt:
+                    raise
+                except Exception as exc:
+                    if isinstance(exc, zmq.ZMQError) and exc.errno == errno.EINTR:
+                        continue
+                    log.critical('Unexpected Error in Mworker',
+                                 exc_info=True)
+        except (KeyboardInterrupt, MasterExit):
+            self.io_pool.close()
+            self.io_pool.join()
+            for sock in (socket, replies, reply_push):
+                sock.close()
+            if self.aes_funcs.return_writer is not None:
+                self.aes_funcs.return_writer.flush()
+
+    def _handle_frames(self, frames, reply):
+        '''
+        Handle a request received on the DEALER socket. The last frame is
+        replaced with the reply, unless the request is handed to the thread
+        pool, in which case ``reply`` is called with the frames of the reply
+        once it is done and True is returned.
+        '''
+        self._update_aes()
+        try:
+            payload = self.serial.loads(frames[-1])
+        except Exception:
+            log.error('Received a malformed payload', exc_info=True)
+            frames[-1] = self.serial.dumps('')
+            return False
+        if isinstance(payload, dict) and payload.get('enc') == 'aes':
+            data, ret = self._aes_load(payload.get('load'))
+            crypticle = self.crypticle.for_reply(payload.get('load'))
+            if data is not None and data['cmd'] in self.io_funcs:
+                self.io_pool.apply_async(
+                    self._run_io_func, (frames, data, crypticle),
+                    callback=reply)
+                return True
+            if data is not None:
+                ret = self.aes_funcs.run_func(data['cmd'], data, crypticle)
+        else:
+            ret = self._handle_payload(payload)
+        frames[-1] = self.serial.dumps(ret)
+        return False
+
+    def _run_io_func(self, frames, data, crypticle=None):
+        '''
+        Run an AES command on the thread pool and return the frames of its
+        reply
+        '''
+        try:
+            ret = self.aes_funcs.run_func(data['cmd'], data, crypticle)
+        except Exception:
+            log.critical('Unexpected Error in Mworker', exc_info=True)
+            ret = ''
+        try:
+            frames[-1] = self.serial.dumps(ret)
+        except Exception:
+            log.error('Failed to serialize the return of {0}'.format(
+                data['cmd']), exc_info=True)
+            frames[-1] = self.serial.dumps('')
+        return frames
 
     def _handle_payload(self, payload):
         '''
@@ -676,49 +878,59 @@ class MWorker(multiprocessing.Process):
         '''
         Handle a command sent via an AES key
         '''
+        data, ret = self._aes_load(load)
+        if data is None:
+            return ret
+        return self.aes_funcs.run_func(data['cmd'], data,
+                                       self.crypticle.for_reply(load))
+
+    def _aes_load(self, load):
+        '''
+        Decrypt the load of an AES command, returns the load and None, or None
+        and the reply for loads which are not to be run
+        '''
         try:
             data = self.crypticle.loads(load)
         except Exception:
-            return ''
+            return None, ''
         if 'cmd' not in data:
             log.error('Received malformed command {0}'.format(data))
-            return {}
+            return None, {}
         log.info('AES payload received with command {0}'.format(data['cmd']))
         if data['cmd'].startswith('__'):
-            return False
-        return self.aes_funcs.run_func(data['cmd'], data)
+            return None, False
+        return data, None
 
     def _update_aes(self):
         '''
         Check to see if a fresh AES key is available and update the components
-        of the worker
+        of the worker, this only reads the shared generation counter unless
+        the key was rotated
         '''
-        dfn = os.path.join(self.opts['cachedir'], '.dfn')
-        try:
-            stats = os.stat(dfn)
-        except os.error:
+        if self.aes_key is None or self.aes_key.generation == self.k_gen:
             return
-        if stats.st_mode != 0100400:
-            # Invalid dfn, return
-            return
-        if stats.st_mtime > self.k_mtime:
-            # new key, refresh crypticle
-            with salt.utils.fopen(dfn) as fp_:
-                aes = fp_.read()
-            if len(aes) != 76:
-                return
-            self.crypticle = salt.crypt.Crypticle(self.opts, aes)
-            self.clear_funcs.crypticle = self.crypticle
-            self.clear_funcs.opts['aes'] = aes
-            self.aes_funcs.crypticle = self.crypticle
-            self.aes_funcs.opts['aes'] = aes
-            self.k_mtime = stats.st_mtime
+        aes, self.k_gen = self.aes_key.get()
+        self.crypticle = salt.crypt.Crypticle(self.opts, aes)
+        self.clear_funcs.crypticle = self.crypticle
+        self.clear_funcs.opts['aes'] = aes
+        self.aes_funcs.crypticle = self.crypticle
+        self.aes_funcs.opts['aes'] = aes
+
+    def _handle_sigterm(self, signum, frame):
+        '''
+        Unwind the worker on SIGTERM, so it writes out the returns it queued
+        for the job cache
+        '''
+        # The master repeats the signal until the worker is gone
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        raise MasterExit
 
     def run(self):
         '''
         Start a Master Worker
         '''
         salt.utils.appendproctitle(self.__class__.__name__)
+        signal.signal(signal.SIGTERM, self._handle_sigterm)
         self.clear_funcs = ClearFuncs(
             self.opts,
             self.key,
@@ -749,6 +961,23 @@ class AESFuncs(object):
             rend=False)
         self.__setup_fileserver()
         self.masterapi = salt.daemons.masterapi.RemoteFuncs(opts)
+        # Commands can run on the worker's thread pool, see MWorker.io_funcs.
+        # The event socket can not be used by two threads at once, and the
+        # grains of the master minion are swapped while a pillar compiles
+        self._event_lock = threading.Lock()
+        self._pillar_lock = threading.Lock()
+        self.pillar = None
+        self.pillar_cache = None
+        if self.opts.get('pillar_cache', False):
+            self.pillar_cache = salt.pillar.PillarCache(self.opts)
+        # The version of the master options the lean pillars refer to, and
+        # the options
+        self.master_opts_doc = None
+        self.return_writer = None
+        if self.opts['job_cache_write_behind']:
+            self.return_writer = salt.utils.job_cache.ReturnWriter(
+                self.opts,
+                self.mminion.returners)
 
     def __setup_fileserver(self):
         '''
@@ -1013,6 +1242,85 @@ class AESFuncs(object):
             fp_.write(load['data'])
         return True
 
+    def __pillar_compiler(self, load):
+        '''
+        Return the Pillar of the worker set up for the minion of the load, it
+        is only built for the first pillar request so its loaders and file
+        client are reused
+        '''
+        saltenv = load.get('saltenv', load.get('env'))
+        if self.pillar is None:
+            self.pillar = salt.pillar.Pillar(
+                self.opts,
+                load['grains'],
+                load['id'],
+                saltenv,
+                load.get('ext'),
+                self.mminion.functions)
+        else:
+            self.pillar.set_minion(
+                load['grains'],
+                load['id'],
+                saltenv,
+                load.get('ext'))
+        return self.pillar
+
+    def __compile_pillar(self, load, pillar_dirs):
+        '''
+        Compile the pillar of the minion of the load, keeping it in the pillar
+        cache
+        '''
+        pillar = self.__pillar_compiler(load)
+        mods = set()
+        for func in self.mminion.functions.values():
+            mods.add(func.__module__)
+        for mod in mods:
+            sys.modules[mod].__grains__ = load['grains']
+        try:
+            with salt.template.track_files() as files:
+                data = pillar.compile_pillar(pillar_dirs=pillar_dirs)
+        finally:
+            for mod in mods:
+                sys.modules[mod].__grains__ = self.opts['grains']
+        if pillar.ext_pillar_times:
+            # How long every external pillar took
+            with self._event_lock:
+                self.event.fire_event(
+                    {'id': load['id'], 'ext_pillar': pillar.ext_pillar_times},
+                    tagify([load['id'], 'ext_pillar'], 'pillar'))
+        if self.opts.get('pillar_opts_lean', False) \
+                and isinstance(data.get('master'), dict):
+            version, doc = self.__shared_master_opts()
+            data['master'] = salt.pillar.master_opts_ref(
+                data['master'], version, doc)
+        if self.pillar_cache is not None:
+            self.pillar_cache.store(load, data, files)
+        return data
+
+    def __shared_master_opts(self):
+        '''
+        Return the version of the master options the lean pillars refer to,
+        and the options
+        '''
+        if self.master_opts_doc is None:
+            self.master_opts_doc = salt.pillar.master_opts_doc(self.opts)
+        return self.master_opts_doc
+
+    def _master_opts_doc(self, load):
+        '''
+        Return the master options the lean pillars refer to, every minion
+        gets them in its pillar with pillar_opts
+        '''
+        if 'id' not in load:
+            return {}
+        if not salt.utils.verify.valid_id(self.opts, load['id']):
+            return {}
+        if not self.opts.get('pillar_opts', True) \
+                or not self.opts.get('pillar_opts_lean', False):
+            return {}
+        version, doc = self.__shared_master_opts()
+        return {'version': version, 'opts': doc}
+
     def _pillar(self, load):
         '''
         Return the pillar data for the minion
@@ -1022,21 +1330,17 @@ class AESFuncs(object):
         if not salt.utils.verify.valid_id(self.opts, load['id']):
             return False
         load['grains']['id'] = load['id']
-        mods = set()
-        for func in self.mminion.functions.values():
-            mods.add(func.__module__)
-        for mod in mods:
-            sys.modules[mod].__grains__ = load['grains']
-
         pillar_dirs = {}
-        pillar = salt.pillar.Pillar(
-            self.opts,
-            load['grains'],
-            load['id'],
-            load.get('saltenv', load.get('env')),
-            load.get('ext'),
-            self.mminion.functions)
-        data = pillar.compile_pillar(pillar_dirs=pillar_dirs)
+        data = None
+        if self.pillar_cache is not None:
+            # Handed out while another pillar compiles
+            data = self.pillar_cache.get(load)
+        if data is None:
+            # One compile at a time, the Pillar of the worker, the globals of
+            # the modules it loaded and the grains of the master minion
+            # functions are set up for a single minion
+            with self._pillar_lock:
+                data = self.__compile_pillar(load, pillar_dirs)
         if self.opts.get('minion_data_cache', False):
             cdir = os.path.join(self.opts['cachedir'], 'minions', load['id'])
             if not os.path.isdir(cdir):
@@ -1048,8 +1352,14 @@ class AESFuncs(object):
                         {'grains': load['grains'],
                          'pillar': data})
                     )
-        for mod in mods:
-            sys.modules[mod].__grains__ = self.opts['grains']
+            salt.utils.minions.minion_data_changed(self.opts, load['id'])
+        master = data.get('master')
+        if isinstance(master, dict) and '_version' in master \
+                and not load.get('master_opts_ref'):
+            # The minion does not know about the shared master options
+            data = dict(data)
+            data['master'] = salt.pillar.expand_master_opts(
+                master, self.__shared_master_opts()[1])
         return data
 
     def _minion_event(self, load):
@@ -1083,16 +1393,25 @@ class AESFuncs(object):
             saveload_fstr = '{0}.save_load'.format(self.opts['master_job_cache'])
             self.mminion.returners[saveload_fstr](load['jid'], load)
         log.info('Got return from {id} for job {jid}'.format(**load))
-        self.event.fire_event(load, load['jid'])  # old dup event
-        self.event.fire_event(
-            load, tagify([load['jid'], 'ret', load['id']], 'job'))
-        self.event.fire_ret_load(load)
+        # Serialize the return once, for the events and the job cache
+        raw_load = dict(load)
+        raw_load['return'] = salt.payload.Raw(self.serial.dumps(load['return']))
+        with self._event_lock:
+            self.event.fire_event(raw_load, load['jid'])  # old dup event
+            self.event.fire_event(
+                raw_load, tagify([load['jid'], 'ret', load['id']], 'job'))
+            self.event.fire_ret_load(load)
 
         # if you have a job_cache, or an ext_job_cache, don't write to the regular master cache
         if not self.opts['job_cache'] or self.opts.get('ext_job_cache'):
             return
 
+        if self.opts['master_job_cache'] in RAW_RETURNERS:
+            load = raw_load
         # otherwise, write to the master cache
+        if self.return_writer is not None:
+            self.return_writer.put(load)
+            return
         fstr = '{0}.returner'.format(self.opts['master_job_cache'])
         self.mminion.returners[fstr](load)
 
@@ -1146,7 +1465,7 @@ class AESFuncs(object):
         with salt.utils.fopen(jid_fn, 'r') as fp_:
             if not load['id'] == fp_.read():
                 return {}
-        # Grab the latest and return
+        # Grab the latest and return, the job cache has the queued returns
         return self.local.get_cache_returns(load['jid'])
 
     def minion_pub(self, clear_load):
@@ -1205,13 +1524,17 @@ class AESFuncs(object):
         else:
             return self.masterapi.revoke_auth(load)
 
-    def run_func(self, func, load):
+    def run_func(self, func, load, crypticle=None):
         '''
-        Wrapper for running functions executed with AES encryption
+        Wrapper for running functions executed with AES encryption, the
+        return is encrypted with ``crypticle``, the AES crypticle of the
+        master by default
         '''
+        if crypticle is None:
+            crypticle = self.crypticle
         # Don't honor private functions
         if func.startswith('__'):
-            return self.crypticle.dumps({})
+            return crypticle.dumps({})
         # Run the func
         if hasattr(self, func):
             try:
@@ -1235,7 +1558,7 @@ class AESFuncs(object):
                     func
                 )
             )
-            return self.crypticle.dumps(False)
+            return crypticle.dumps(False)
         # Don't encrypt the return value for the _return func
         # (we don't care about the return value, so why encrypt it?)
         if func == '_return':
@@ -1243,7 +1566,7 @@ class AESFuncs(object):
         if func == '_pillar' and 'id' in load:
             if load.get('ver') != '2' and self.opts['pillar_version'] == 1:
                 # Authorized to return old pillar proto
-                return self.crypticle.dumps(ret)
+                return crypticle.dumps(ret)
             # encrypt with a specific AES key
             pubfn = os.path.join(self.opts['pki_dir'],
                                  'minions',
@@ -1251,11 +1574,12 @@ class AESFuncs(object):
             key = salt.crypt.Crypticle.generate_key_string()
             pcrypt = salt.crypt.Crypticle(
                 self.opts,
-                key)
+                key,
+                cipher=crypticle.cipher)
             try:
                 pub = RSA.load_pub_key(pubfn)
             except RSA.RSAError:
-                return self.crypticle.dumps({})
+                return crypticle.dumps({})
 
             pret = {}
             pret['key'] = pub.public_encrypt(key, 4)
@@ -1264,7 +1588,7 @@ class AESFuncs(object):
             )
             return pret
         # AES Encrypt the return
-        return self.crypticle.dumps(ret)
+        return crypticle.dumps(ret)
 
 
 class ClearFuncs(object):
@@ -1299,6 +1623,49 @@ class ClearFuncs(object):
         self.wheel_ = salt.wheel.Wheel(opts)
         self.masterapi = salt.daemons.masterapi.LocalFuncs(opts, key)
         self.auto_key = salt.daemons.masterapi.AutoKey(opts)
+        # Keep the keys of the minions in memory for _auth
+        self.key_cache = salt.daemons.masterapi.MinionKeyCache(opts)
+
+    def __track_cbc_minion(self, id_, cbc):
+        '''
+        Note whether a minion can only read publications encrypted with
+        AES-CBC, the workers share the notes in the cachedir
+        '''
+        if self.crypticle.cipher != 'aes-gcm':
+            return
+        cbc_dir = os.path.join(self.opts['cachedir'], 'aes_cbc_minions')
+        path = os.path.join(cbc_dir, id_)
+        try:
+            if not cbc:
+                if os.path.exists(path):
+                    os.remove(path)
+                return
+            if not os.path.isdir(cbc_dir):
+                os.makedirs(cbc_dir)
+            with salt.utils.fopen(path, 'w+'):
+                pass
+        except (IOError, OSError) as exc:
+            if cbc or os.path.exists(path):
+                log.error('Unable to note the cipher of minion {0}: {1}'
+                          .format(id_, exc))
+
+    def _publish_crypticle(self):
+        '''
+        Return the Crypticle to encrypt the publications with, aes-gcm is
+        only used while every accepted minion can read it
+        '''
+        if self.crypticle.cipher != 'aes-gcm':
+            return self.crypticle
+        try:
+            cbc_minions = os.listdir(
+                os.path.join(self.opts['cachedir'], 'aes_cbc_minions'))
+        except OSError:
+            return self.crypticle
+        accepted = os.path.join(self.opts['pki_dir'], 'minions')
+        for id_ in cbc_minions:
+            if os.path.isfile(os.path.join(accepted, id_)):
+                return self.crypticle.with_cipher('aes-cbc-hmac')
+        return self.crypticle
 
     def _auth(self, load):
         '''
@@ -1345,10 +1712,7 @@ class ClearFuncs(object):
                     return {'enc': 'clear',
                             'load': {'ret': 'full'}}
 
-        # Check if key is configured to be auto-rejected/signed
-        auto_reject = self.auto_key.check_autoreject(load['id'])
-        auto_sign = self.auto_key.check_autosign(load['id'])
-
+        self.key_cache.refresh()
         pubfn = os.path.join(self.opts['pki_dir'],
                              'minions',
                              load['id'])
@@ -1365,7 +1729,7 @@ class ClearFuncs(object):
             # open mode is turned on, nuts to checks and overwrite whatever
             # is there
             pass
-        elif os.path.isfile(pubfn_rejected):
+        elif self.key_cache.exists(pubfn_rejected):
             # The key has been rejected, don't place it in pending
             log.info('Public key rejected for {id}'.format(**load))
             eload = {'result': False,
@@ -1375,9 +1739,9 @@ class ClearFuncs(object):
             return {'enc': 'clear',
                     'load': {'ret': False}}
 
-        elif os.path.isfile(pubfn):
+        elif self.key_cache.exists(pubfn):
             # The key has been accepted, check it
-            if salt.utils.fopen(pubfn, 'r').read() != load['pub']:
+            if self.key_cache.read(pubfn) != load['pub']:
                 log.error(
                     'Authentication attempt from {id} failed, the public '
                     'keys did not match. This may be an attempt to compromise '
@@ -1393,8 +1757,11 @@ class ClearFuncs(object):
                 return {'enc': 'clear',
                         'load': {'ret': False}}
 
-        elif not os.path.isfile(pubfn_pend):
+        elif not self.key_cache.exists(pubfn_pend):
             # The key has not been accepted, this is a new minion
+            # Check if key is configured to be auto-rejected/signed
+            auto_reject = self.auto_key.check_autoreject(load['id'])
+            auto_sign = self.auto_key.check_autosign(load['id'])
             if os.path.isdir(pubfn_pend):
                 # The key path is a directory, error out
                 log.info(
@@ -1437,8 +1804,10 @@ class ClearFuncs(object):
                 self.event.fire_event(eload, tagify(prefix='auth'))
                 return ret
 
-        elif os.path.isfile(pubfn_pend):
+        elif self.key_cache.exists(pubfn_pend):
             # This key is in the pending dir and is awaiting acceptance
+            auto_reject = self.auto_key.check_autoreject(load['id'])
+            auto_sign = self.auto_key.check_autosign(load['id'])
             if auto_reject:
                 # We don't care if the keys match, this minion is being
                 # auto-rejected. Move the key file from the pending dir to the
@@ -1463,7 +1832,7 @@ class ClearFuncs(object):
                 # Check if the keys are the same and error out if this is the
                 # case. Otherwise log the fact that the minion is still
                 # pending.
-                if salt.utils.fopen(pubfn_pend, 'r').read() != load['pub']:
+                if self.key_cache.read(pubfn_pend) != load['pub']:
                     log.error(
                         'Authentication attempt from {id} failed, the public '
                         'key in pending did not match. This may be an '
@@ -1497,7 +1866,7 @@ class ClearFuncs(object):
                 # auto-signed. Check to see if it is the same key, and if
                 # so, pass on doing anything here, and let it get automatically
                 # accepted below.
-                if salt.utils.fopen(pubfn_pend, 'r').read() != load['pub']:
+                if self.key_cache.read(pubfn_pend) != load['pub']:
                     log.error(
                         'Authentication attempt from {id} failed, the public '
                         'keys in pending did not match. This may be an '
@@ -1530,15 +1899,16 @@ class ClearFuncs(object):
         # only write to disk if you are adding the file, and in open mode,
         # which implies we accept any key from a minion (key needs to be
         # written every time because what's on disk is used for encrypting)
-        if not os.path.isfile(pubfn) or self.opts['open_mode']:
+        if not self.key_cache.exists(pubfn) or self.opts['open_mode']:
             with salt.utils.fopen(pubfn, 'w+') as fp_:
                 fp_.write(load['pub'])
+            self.key_cache.refresh()
         pub = None
 
         # The key payload may sometimes be corrupt when using auto-accept
         # and an empty request comes in
         try:
-            pub = RSA.load_pub_key(pubfn)
+            pub = self.key_cache.rsa(pubfn)
         except RSA.RSAError as err:
             log.error('Corrupt public key "{0}": {1}'.format(pubfn, err))
             return {'enc': 'clear',
@@ -1594,6 +1964,18 @@ class ClearFuncs(object):
         # Be aggressive about the signature
         digest = hashlib.sha256(aes).hexdigest()
         ret['sig'] = self.master_key.key.private_encrypt(digest, 5)
+        # The master falls back to aes-cbc-hmac without the cryptography
+        # library, its minions have to as well
+        if self.crypticle.cipher == 'aes-gcm':
+            if 'aes-gcm' in load.get('ciphers', ()):
+                ret['cipher'] = 'aes-gcm'
+            else:
+                log.warning(
+                    'Minion {0} can not use the aes-gcm cipher, the '
+                    'publications of the master are encrypted with '
+                    'aes-cbc-hmac while its key is accepted'.format(load['id'])
+                )
+            self.__track_cbc_minion(load['id'], 'cipher' not in ret)
         eload = {'result': True,
                  'act': 'accept',
                  'id': load['id'],
@@ -2145,6 +2527,9 @@ class ClearFuncs(object):
             'arg': clear_load['arg'],
             'minions': minions,
             }
+        if 'timeout' in clear_load:
+            # How long the client waits for the returns
+            new_job_load['timeout'] = clear_load['timeout']
 
         # Announce the job on the event bus
         self.event.fire_event(new_job_load, 'new_job')  # old dup event
@@ -2229,7 +2614,7 @@ class ClearFuncs(object):
             )
         log.debug('Published command details {0}'.format(load))
 
-        payload['load'] = self.crypticle.dumps(load)
+        payload['load'] = self._publish_crypticle().dumps(load)
         if self.opts['sign_pub_messages']:
             master_pem_path = os.path.join(self.opts['pki_dir'], 'master.pem')
             log.debug("Signing data packet")
@@ -1367,7 +1367,8 @@ class Minion(MinionBase):
             self.publish_port = self.opts.get('syndic_master_publish_port')
         else:
             self.publish_port = creds['publish_port']
-        self.crypticle = salt.crypt.Crypticle(self.opts, self.aes)
+        self.crypticle = salt.crypt.Crypticle(self.opts, self.aes,
+                                              cipher=creds['cipher'])
 
     def module_refresh(self, force_refresh=False):
         '''
@@ -1379,13 +1380,15 @@ class Minion(MinionBase):
 
     def pillar_refresh(self, force_refresh=False):
         '''
-        Refresh the pillar
+        Refresh the pillar, the master compiles it again instead of using its
+        pillar cache
         '''
         self.opts['pillar'] = salt.pillar.get_pillar(
             self.opts,
             self.opts['grains'],
             self.opts['id'],
             self.opts['environment'],
+            refresh=True,
         ).compile_pillar()
         self.module_refresh(force_refresh)
 
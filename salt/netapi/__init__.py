@@ -56,7 +56,7 @@ class NetapiClient(object):
         :return: job ID
         '''
         local = salt.client.get_local_client(mopts=self.opts)
-        return local.run_job(*args, **kwargs)
+        return local.run_job(*args, listen=False, **kwargs)
 
     def local(self, *args, **kwargs):
         '''
@@ -1264,6 +1264,11 @@ class Events(object):
     prefixes will need to be removed manually before attempting to
     unserialize the JSON.
 
+    When the master keeps an :conf_master:`event_journal` every record also
+    has an ``id:``, the sequence number of the event. A client reconnecting
+    with the :mailheader:`Last-Event-ID` header, as ``EventSource()`` does,
+    first gets the events it missed in the meantime.
+
     curl's ``-N`` flag turns off input buffering which is required to
     process the stream incrementally.
 
@@ -1309,7 +1314,23 @@ class Events(object):
         cherrypy.response.headers['Cache-Control'] = 'no-cache'
         cherrypy.response.headers['Connection'] = 'keep-alive'
 
-        def listen():
+        # A reconnecting client gets the events it missed from the journal
+        last_seq = None
+        last_event_id = cherrypy.request.headers.get('Last-Event-ID', '')
+        if self.opts.get('event_journal', False) and last_event_id.isdigit():
+            last_seq = int(last_event_id)
+
+        def format_event(data):
+            '''
+            Format a Salt event as lines of the event stream
+            '''
+            seq = getattr(data, 'seq', None)
+            if seq is not None:
+                yield u'id: {0}\n'.format(seq)
+            yield u'tag: {0}\n'.format(data.get('tag', ''))
+            yield u'data: {0}\n\n'.format(json.dumps(dict(data)))
+
+        def listen(last_seq):
             '''
             An iterator to yield Salt events
             '''
@@ -1322,12 +1343,23 @@ class Events(object):
 
             yield u'retry: {0}\n'.format(400)
 
+            if last_seq is not None:
+                journal = salt.utils.event.EventJournal(self.opts)
+                for data in journal.read(since=last_seq):
+                    last_seq = data.seq
+                    for line in format_event(data):
+                        yield line
+
             while True:
                 data = stream.next()
-                yield u'tag: {0}\n'.format(data.get('tag', ''))
-                yield u'data: {0}\n\n'.format(json.dumps(data))
+                seq = getattr(data, 'seq', None)
+                if last_seq is not None and seq is not None and seq <= last_seq:
+                    # Already sent from the journal
+                    continue
+                for line in format_event(data):
+                    yield line
 
-        return listen()
+        return listen(last_seq)
 
 
 class WebsocketEndpoint(object):
@@ -1497,7 +1529,7 @@ class WebsocketEndpoint(object):
                             SaltInfo.process(data, salt_token, self.opts)
                         else:
                             handler.send('data: {0}\n\n'.format(
-                                json.dumps(data)), False)
+                                json.dumps(dict(data))), False)
                     except UnicodeDecodeError:
                         logger.error(
                                 "Error: Salt event has non UTF-8 data:\n{0}"
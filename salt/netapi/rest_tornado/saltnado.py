@@ -730,7 +730,7 @@ class EventsSaltAPIHandler(SaltAPIHandler):
             try:
                 event = yield self.application.event_listener.get_event(self)
                 self.write(u'tag: {0}\n'.format(event.get('tag', '')))
-                self.write(u'data: {0}\n\n'.format(json.dumps(event)))
+                self.write(u'data: {0}\n\n'.format(json.dumps(dict(event))))
                 self.flush()
             except TimeoutException:
                 break
@@ -8,6 +8,8 @@ in here
 # Import python libs
 #import sys  # Use of sys is commented out below
 import logging
+import threading
+from collections import Mapping
 
 # Import salt libs
 import salt.log
@@ -47,10 +49,9 @@ except ImportError:
 
 def package(payload):
     '''
-    This method for now just wraps msgpack.dumps, but it is here so that
-    we can make the serialization a custom option in the future with ease.
+    Serialize a payload with msgpack
     '''
-    return msgpack.dumps(payload)
+    return get_serializer('msgpack').dumps(payload)
 
 
 def unpackage(package_):
@@ -73,10 +74,148 @@ def format_payload(enc, **kwargs):
     return package(payload)
 
 
+class Raw(str):
+    '''
+    A message, or the value of a message, which is already serialized.
+
+    :py:meth:`Serial.dumps` passes a whole message on as it is instead of
+    serializing it again, :py:meth:`Serial.dumps_raw` the values of a dict
+    message.
+    '''
+    __slots__ = ()
+
+
+def _pack_default(obj):
+    '''
+    Pack the mappings which are not dicts, like received events, as dicts
+    '''
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError('can\'t serialize {0!r}'.format(obj))
+
+
+class _Packers(threading.local):
+    '''
+    The Packer of every thread
+    '''
+    def __init__(self):
+        self.packer = msgpack.Packer(default=_pack_default)
+
+
+class MsgpackSerializer(object):
+    '''
+    Serialize with msgpack, packing with a preconfigured Packer which is
+    reused for every message packed by the thread
+    '''
+    def __init__(self):
+        self._packers = _Packers()
+
+    def _reset(self):
+        '''
+        Replace the Packer of the thread, a Packer which failed to pack a
+        message keeps the bytes it packed before the failure in its buffer
+        and would prepend them to the next message
+        '''
+        self._packers.packer = msgpack.Packer(default=_pack_default)
+
+    def dumps(self, msg):
+        try:
+            return self._packers.packer.pack(msg)
+        except Exception:
+            self._reset()
+            raise
+
+    def dumps_raw(self, msg):
+        '''
+        Serialize a dict message with :py:class:`Raw` values
+        '''
+        packer = self._packers.packer
+        try:
+            ret = [packer.pack_map_header(len(msg))]
+            for key, value in msg.iteritems():
+                ret.append(packer.pack(key))
+                ret.append(
+                    value if isinstance(value, Raw) else packer.pack(value))
+        except Exception:
+            self._reset()
+            raise
+        return ''.join(ret)
+
+    def loads(self, msg):
+        # A one off unpackb is faster than feeding a reused Unpacker
+        return msgpack.loads(msg, use_list=True)
+
+    def iter_load(self, fn_, read_size):
+        '''
+        Yield the messages written one after the other to a file object
+        '''
+        for msg in msgpack.Unpacker(fn_, read_size=read_size, use_list=True):
+            yield msg
+
+
+class _MsgpackPureSerializer(MsgpackSerializer):
+    '''
+    Serialize with a msgpack module which has no Packer
+    '''
+    def __init__(self):
+        pass
+
+    def dumps(self, msg):
+        return msgpack.dumps(msg)
+
+    def dumps_raw(self, msg):
+        return self.dumps(dict(
+            (key, msgpack.loads(value, use_list=True)
+                if isinstance(value, Raw) else value)
+            for key, value in msg.iteritems()))
+
+
+# The serializers available to the serial option, by name
+SERIALIZERS = {'msgpack': _MsgpackPureSerializer}
+if 'msgpack' in globals() and hasattr(msgpack, 'Packer'):
+    SERIALIZERS['msgpack'] = MsgpackSerializer
+
+_SERIALIZER_INSTANCES = {}
+
+
+def get_serializer(name):
+    '''
+    Return the shared instance of a serializer in :py:data:`SERIALIZERS`,
+    the msgpack serializer when there is no serializer of that name
+    '''
+    try:
+        return _SERIALIZER_INSTANCES[name]
+    except KeyError:
+        pass
+    if name not in SERIALIZERS:
+        log.error('Unknown serializer {0!r}, using msgpack'.format(name))
+        return get_serializer('msgpack')
+    return _SERIALIZER_INSTANCES.setdefault(name, SERIALIZERS[name]())
+
+
+def _odict_encoder(obj):
+    '''
+    Convert the OrderedDicts in a message to dicts, for msgpack < 0.2.0
+    '''
+    if isinstance(obj, dict):
+        for key, value in obj.copy().iteritems():
+            obj[key] = _odict_encoder(value)
+        return dict(obj)
+    elif isinstance(obj, (list, tuple)):
+        obj = list(obj)
+        for idx, entry in enumerate(obj):
+            obj[idx] = _odict_encoder(entry)
+        return obj
+    return obj
+
+
 class Serial(object):
     '''
     Create a serialization object, this object manages all message
     serialization in Salt
+
+    The ``serial`` option names the serializer in :py:data:`SERIALIZERS`
+    used, ``msgpack`` by default.
     '''
     def __init__(self, opts):
         if isinstance(opts, dict):
@@ -85,18 +224,21 @@ class Serial(object):
             self.serial = opts
         else:
             self.serial = 'msgpack'
+        self.serializer = get_serializer(self.serial)
 
     def loads(self, msg):
         '''
         Run the correct loads serialization format
         '''
         try:
-            return msgpack.loads(msg, use_list=True)
+            return self.serializer.loads(msg)
         except Exception as exc:
-            log.critical('Could not deserialize msgpack message: {0}'
-                         'In an attempt to keep Salt running, returning an empty dict.'
-                         'This often happens when trying to read a file not in binary mode.'
-                         'Please open an issue and include the following error: {1}'.format(msg, exc))
+            log.critical('Could not deserialize {0} message of {1} bytes '
+                         'starting with {2!r}. '
+                         'In an attempt to keep Salt running, returning an empty dict. '
+                         'This often happens when trying to read a file not in binary mode. '
+                         'Please open an issue and include the following error: {3}'
+                         .format(self.serial, len(msg), msg[:64], exc))
             return {}
 
     def load(self, fn_):
@@ -107,36 +249,37 @@ class Serial(object):
         fn_.close()
         return self.loads(data)
 
+    def iter_load(self, fn_, read_size=65536):
+        '''
+        Yield the messages dumped one after the other into a file object,
+        reading ``read_size`` bytes at a time instead of the whole file
+        '''
+        return self.serializer.iter_load(fn_, read_size)
+
     def dumps(self, msg):
         '''
         Run the correct dumps serialization format
         '''
+        if type(msg) is Raw:
+            return str(msg)
+        if msgpack.version >= (0, 2, 0):
+            # Should support OrderedDict serialization
+            return self.serializer.dumps(msg)
         try:
             return msgpack.dumps(msg)
         except TypeError:
-            if msgpack.version >= (0, 2, 0):
-                # Should support OrderedDict serialization, so, let's
-                # raise the exception
-                raise
-
             # msgpack is < 0.2.0, let's make its life easier
             # Since OrderedDict is identified as a dictionary, we can't
             # make use of msgpack custom types, we will need to convert by
             # hand.
-            # This means iterating through all elements of a dictionary or
-            # list/tuple
-            def odict_encoder(obj):
-                if isinstance(obj, dict):
-                    for key, value in obj.copy().iteritems():
-                        obj[key] = odict_encoder(value)
-                    return dict(obj)
-                elif isinstance(obj, (list, tuple)):
-                    obj = list(obj)
-                    for idx, entry in enumerate(obj):
-                        obj[idx] = odict_encoder(entry)
-                    return obj
-                return obj
-            return msgpack.dumps(odict_encoder(msg))
+            return msgpack.dumps(_odict_encoder(msg))
+
+    def dumps_raw(self, msg):
+        '''
+        Serialize a dict message, passing its :py:class:`Raw` values on as
+        they are
+        '''
+        return self.serializer.dumps_raw(msg)
 
     def dump(self, msg, fn_):
         '''
@@ -5,18 +5,30 @@ Render the pillar data
 
 # Import python libs
 import os
+import sys
+import shutil
+import time
+import hashlib
 import collections
 import logging
-from copy import copy
+import multiprocessing
+import threading
+from copy import copy, deepcopy
+from multiprocessing.pool import ThreadPool
 
 # Import salt libs
 import salt.loader
 import salt.fileclient
+import salt.fileserver
 import salt.minion
 import salt.crypt
 import salt.transport
+import salt.payload
+import salt.utils
+import salt.utils.atomicfile
 from salt._compat import string_types
-from salt.template import compile_template
+from salt.template import compile_template, RenderCache
+from salt.utils.cache import freeze
 from salt.utils.dictupdate import update
 from salt.utils.serializers.yamlex import merge_recursive
 from salt.utils.odict import OrderedDict
@@ -25,6 +37,16 @@ from salt.version import __version__
 
 log = logging.getLogger(__name__)
 
+# The shared master options the lean pillars refer to, by version
+_MASTER_OPTS = {}
+
+# The thread pool the external pillars run on, by process id
+_EXT_PILLAR_POOL = {}
+_EXT_PILLAR_POOL_LOCK = threading.Lock()
+
+# The directory of the cachedir the PillarCache keeps the pillars in
+PILLAR_CACHE_DIR = 'pillar_cache'
+
 
 def merge_recurse(obj_a, obj_b):
     copied = copy(obj_a)
@@ -35,9 +57,85 @@ def merge_aggregate(obj_a, obj_b):
     return merge_recursive(obj_a, obj_b, level=1)
 
 
-def get_pillar(opts, grains, id_, saltenv=None, ext=None, env=None):
+def _ext_pillar_pool(threads):
+    '''
+    Return the thread pool of this process the external pillars run on, a
+    forked process starts a new one
+    '''
+    pid = os.getpid()
+    with _EXT_PILLAR_POOL_LOCK:
+        if pid not in _EXT_PILLAR_POOL:
+            _EXT_PILLAR_POOL.clear()
+            _EXT_PILLAR_POOL[pid] = ThreadPool(threads)
+        return _EXT_PILLAR_POOL[pid]
+
+
+def _discard_ext_pillar_pool(pool):
+    '''
+    Stop handing out a thread pool which has threads stuck in an external
+    pillar, its threads exit once they are done
+    '''
+    with _EXT_PILLAR_POOL_LOCK:
+        if _EXT_PILLAR_POOL.get(os.getpid()) is pool:
+            del _EXT_PILLAR_POOL[os.getpid()]
+            pool.close()
+
+
+def clear_pillar_cache(opts):
+    '''
+    Drop the pillars kept by the PillarCache, the master does when it starts
+    as its options or the external pillar modules may have changed since
+    they were compiled
+    '''
+    cache_dir = os.path.join(opts['cachedir'], PILLAR_CACHE_DIR)
+    if os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def master_opts_doc(opts):
     '''
-    Return the correct pillar driver based on the file_client option
+    Return the master options put in the pillars with pillar_opts, as shared
+    by the lean pillars which only refer to them, and their version
+    '''
+    mopts = dict(opts)
+    mopts.pop('grains', None)
+    mopts.pop('aes', None)
+    mopts['saltversion'] = __version__
+    return hashlib.sha1(repr(freeze(mopts))).hexdigest(), mopts
+
+
+def master_opts_ref(mopts, version, doc):
+    '''
+    Return the reference to the shared master options which stands in for
+    the master options of a pillar, with the options which differ for the
+    minion
+    '''
+    if any(key not in mopts for key in doc):
+        return mopts
+    ref = {'_version': version}
+    for key, val in mopts.iteritems():
+        if key not in doc or doc[key] != val:
+            ref[key] = val
+    return ref
+
+
+def expand_master_opts(ref, doc):
+    '''
+    Return the master options of a pillar from their reference and the
+    shared master options
+    '''
+    mopts = dict(doc)
+    mopts.update(ref)
+    mopts.pop('_version')
+    return mopts
+
+
+def get_pillar(opts, grains, id_, saltenv=None, ext=None, env=None,
+               refresh=False):
+    '''
+    Return the correct pillar driver based on the file_client option, with
+    refresh set the master compiles the pillar again instead of using its
+    pillar cache
     '''
     if env is not None:
         salt.utils.warn_until(
@@ -48,20 +146,20 @@ def get_pillar(opts, grains, id_, saltenv=None, ext=None, env=None):
         # Backwards compatibility
         saltenv = env
 
-    return {
-            'remote': RemotePillar,
-            'local': Pillar
-            }.get(opts['file_client'], Pillar)(opts, grains, id_, saltenv, ext)
+    if opts['file_client'] == 'remote':
+        return RemotePillar(opts, grains, id_, saltenv, ext, refresh=refresh)
+    return Pillar(opts, grains, id_, saltenv, ext)
 
 
 class RemotePillar(object):
     '''
     Get the pillar from the master
     '''
-    def __init__(self, opts, grains, id_, saltenv, ext=None):
+    def __init__(self, opts, grains, id_, saltenv, ext=None, refresh=False):
         self.opts = opts
         self.opts['environment'] = saltenv
         self.ext = ext
+        self.refresh = refresh
         self.grains = grains
         self.id_ = id_
         self.serial = salt.payload.Serial(self.opts)
@@ -79,6 +177,10 @@ class RemotePillar(object):
                 'cmd': '_pillar'}
         if self.ext:
             load['ext'] = self.ext
+        if self.refresh:
+            load['refresh'] = True
+        # The master options can be sent as a reference
+        load['master_opts_ref'] = True
         # ret = self.sreq.send(load, tries=3, timeout=7200)
         ret_pillar = self.sreq.crypted_transfer_decode_dictentry(load, dictkey='pillar', tries=3, timeout=7200)
 
@@ -93,8 +195,70 @@ class RemotePillar(object):
                 '{1}'.format(type(ret_pillar).__name__, ret_pillar)
             )
             return {}
+        master = ret_pillar.get('master')
+        if isinstance(master, dict) and '_version' in master:
+            ret_pillar['master'] = self.master_opts(master)
         return ret_pillar
 
+    def master_opts(self, ref):
+        '''
+        Return the master options of a lean pillar, the shared master
+        options are fetched from the master once per version and cached in
+        the cachedir
+        '''
+        version = ref['_version']
+        if version not in _MASTER_OPTS:
+            self.__read_master_opts()
+        if version not in _MASTER_OPTS:
+            ret = self.sreq.send({'cmd': '_master_opts_doc',
+                                  'id': self.id_,
+                                  'version': version})
+            if not isinstance(ret, dict) or 'opts' not in ret:
+                log.error('Unable to get the master options from the master')
+                mopts = dict(ref)
+                mopts.pop('_version')
+                return mopts
+            if ret['version'] != version:
+                log.debug('The master options changed since the pillar was '
+                          'compiled')
+            self.__write_master_opts(ret)
+            version = ret['version']
+        return expand_master_opts(ref, _MASTER_OPTS[version])
+
+    def __read_master_opts(self):
+        '''
+        Load the shared master options cached in the cachedir
+        '''
+        path = os.path.join(self.opts['cachedir'], 'master_opts.p')
+        if not os.path.isfile(path):
+            return
+        try:
+            with salt.utils.fopen(path, 'rb') as fp_:
+                cached = self.serial.load(fp_)
+            _MASTER_OPTS.clear()
+            _MASTER_OPTS[cached['version']] = cached['opts']
+        except Exception as exc:
+            log.debug('Unable to read the cached master options: '
+                      '{0}'.format(exc))
+
+    def __write_master_opts(self, ret):
+        '''
+        Keep the shared master options in memory and in the cachedir
+        '''
+        _MASTER_OPTS.clear()
+        _MASTER_OPTS[ret['version']] = ret['opts']
+        path = os.path.join(self.opts['cachedir'], 'master_opts.p')
+        cumask = os.umask(077)
+        try:
+            with salt.utils.fopen(path, 'w+b') as fp_:
+                self.serial.dump({'version': ret['version'],
+                                  'opts': ret['opts']}, fp_)
+        except (IOError, OSError):
+            log.error('Unable to write the master options cache file '
+                      '{0}'.format(path))
+        finally:
+            os.umask(cumask)
+
 
 class Pillar(object):
     '''
@@ -103,8 +267,12 @@ class Pillar(object):
     def __init__(self, opts, grains, id_, saltenv, ext=None, functions=None):
         # Store the file_roots path so we can restore later. Issue 5449
         self.actual_file_roots = opts['file_roots']
+        self.master_opts = opts
         # use the local file client
         self.opts = self.__gen_opts(opts, grains, id_, saltenv, ext)
+        # The loaded modules keep a reference to the grains, set_minion
+        # updates them in place
+        self.grains = self.opts['grains'] = dict(self.opts['grains'])
         self.client = salt.fileclient.get_file_client(self.opts)
 
         if opts.get('file_client', '') == 'local':
@@ -121,6 +289,9 @@ class Pillar(object):
 
         self.matcher = salt.minion.Matcher(self.opts, self.functions)
         self.rend = salt.loader.render(self.opts, self.functions)
+        self.render_cache = None
+        if opts.get('render_cache', False):
+            self.render_cache = RenderCache(self.opts)
         # Fix self.opts['file_roots'] so that ext_pillars know the real
         # location of file_roots. Issue 5951
         ext_pillar_opts = dict(self.opts)
@@ -130,6 +301,34 @@ class Pillar(object):
             self.merge_strategy = opts['pillar_source_merging_strategy']
 
         self.ext_pillars = salt.loader.pillars(ext_pillar_opts, self.functions)
+        # The name, run time and result of the external pillars of the last
+        # compile, in the configured order
+        self.ext_pillar_times = []
+        # The options of the loaded renderers and ext_pillars
+        self.mod_opts = []
+        for func in self.rend.values() + self.ext_pillars.values():
+            mod_opts = getattr(sys.modules.get(func.__module__), '__opts__',
+                               None)
+            if mod_opts is None:
+                continue
+            if not any(mod_opts is known for known in self.mod_opts):
+                self.mod_opts.append(mod_opts)
+
+    def set_minion(self, grains, id_, saltenv, ext=None):
+        '''
+        Compile the pillar of another minion with this object. The file
+        client, the matcher and the loaded renderers and ext_pillars are kept,
+        only the grains, id and environment of the minion are swapped in.
+        '''
+        opts = self.__gen_opts(self.master_opts, grains, id_, saltenv, ext)
+        self.grains.clear()
+        self.grains.update(opts['grains'])
+        opts['grains'] = self.grains
+        self.opts.clear()
+        self.opts.update(opts)
+        for mod_opts in self.mod_opts:
+            mod_opts['id'] = id_
+            mod_opts['environment'] = self.opts['environment']
 
     def __valid_ext(self, ext):
         '''
@@ -172,10 +371,8 @@ class Pillar(object):
         else:
             opts['state_top'] = os.path.join('salt://', opts['state_top'])
         if self.__valid_ext(ext):
-            if 'ext_pillar' in opts:
-                opts['ext_pillar'].append(ext)
-            else:
-                opts['ext_pillar'] = [ext]
+            # Do not append to the list of the master options
+            opts['ext_pillar'] = opts.get('ext_pillar', []) + [ext]
         return opts
 
     def _get_envs(self):
@@ -206,7 +403,8 @@ class Pillar(object):
                                 ),
                             self.rend,
                             self.opts['renderer'],
-                            self.opts['environment']
+                            self.opts['environment'],
+                            render_cache=self.render_cache
                             )
                         ]
             else:
@@ -219,7 +417,8 @@ class Pillar(object):
                                     ),
                                 self.rend,
                                 self.opts['renderer'],
-                                saltenv=saltenv
+                                saltenv=saltenv,
+                                render_cache=self.render_cache
                                 )
                             )
         except Exception as exc:
@@ -254,7 +453,8 @@ class Pillar(object):
                                         ).get('dest', False),
                                     self.rend,
                                     self.opts['renderer'],
-                                    saltenv=saltenv
+                                    saltenv=saltenv,
+                                    render_cache=self.render_cache
                                     )
                                 )
                     except Exception as exc:
@@ -378,7 +578,8 @@ class Pillar(object):
         state = None
         try:
             state = compile_template(
-                fn_, self.rend, self.opts['renderer'], saltenv, sls, **defaults)
+                fn_, self.rend, self.opts['renderer'], saltenv, sls,
+                render_cache=self.render_cache, **defaults)
         except Exception as exc:
             msg = 'Rendering SLS {0!r} failed, render error:\n{1}'.format(
                 sls, exc
@@ -487,16 +688,136 @@ class Pillar(object):
                                             val)
         return ext
 
+    def _run_ext_pillar(self, pillar, key, val, pillar_dirs):
+        '''
+        Run an external pillar, return its data, how it went and how long it
+        took
+        '''
+        start = time.time()
+        ext = None
+        result = 'ok'
+        try:
+            try:
+                ext = self._external_pillar_data(pillar,
+                                                 val,
+                                                 pillar_dirs,
+                                                 key)
+            except TypeError as exc:
+                if exc.message.startswith('ext_pillar() takes exactly '):
+                    log.warning('Deprecation warning: ext_pillar "{0}"'
+                                ' needs to accept minion_id as first'
+                                ' argument'.format(key))
+                else:
+                    raise
+
+                ext = self._external_pillar_data(pillar,
+                                                 val,
+                                                 pillar_dirs,
+                                                 key)
+        except Exception as exc:
+            log.exception(
+                    'Failed to load ext_pillar {0}: {1}'.format(
+                        key,
+                        exc
+                        )
+                    )
+            result = 'error'
+        return ext, result, time.time() - start
+
+    def _ext_pillar_timeout(self, key):
+        '''
+        Return how many seconds to wait for an external pillar run on the
+        thread pool, None to wait until it returns
+        '''
+        timeouts = self.opts.get('ext_pillar_timeouts') or {}
+        timeout = timeouts.get(key, self.opts.get('ext_pillar_timeout', 60))
+        if not timeout or timeout < 0:
+            return None
+        return timeout
+
+    def _ext_pillar_concurrent(self, pillar, sources, pillar_dirs, threads):
+        '''
+        Run the external pillars on the thread pool, every one of them gets
+        its own copy of the pillar rendered from the SLS files. Return the
+        results in the order of the sources.
+
+        The timeout of an external pillar counts from when it starts running,
+        one which waited that long for a thread is left out as well. Once an
+        external pillar times out its thread is considered stuck, the pool is
+        replaced and the sources still waiting for a thread move to the new
+        one.
+        '''
+        pool = _ext_pillar_pool(threads)
+        lock = threading.Lock()
+        started = {}
+        attempts = [0] * len(sources)
+        submitted = [None] * len(sources)
+        pending = [None] * len(sources)
+
+        def run(num, attempt, key, val, data):
+            with lock:
+                if num in started or attempts[num] != attempt:
+                    # Moved to another pool
+                    return None
+                started[num] = time.time()
+            return self._run_ext_pillar(data, key, val, pillar_dirs)
+
+        def submit(num):
+            key, val = sources[num]
+            attempts[num] += 1
+            submitted[num] = time.time()
+            pending[num] = pool.apply_async(
+                run, (num, attempts[num], key, val, deepcopy(pillar)))
+
+        for num in range(len(sources)):
+            submit(num)
+        results = []
+        for num, (key, _) in enumerate(sources):
+            timeout = self._ext_pillar_timeout(key)
+            if timeout is None:
+                results.append(pending[num].get())
+                continue
+            while True:
+                deadline = started.get(num, submitted[num]) + timeout
+                try:
+                    results.append(
+                        pending[num].get(max(deadline - time.time(), 0)))
+                    break
+                except multiprocessing.TimeoutError:
+                    if started.get(num, submitted[num]) + timeout > deadline:
+                        # Started in the meantime
+                        continue
+                log.error(
+                    'ext_pillar {0} did not return within {1} seconds, it is '
+                    'left out of the pillar of {2}'.format(
+                        key, timeout, self.opts['id']))
+                results.append(
+                    (None, 'timeout',
+                     time.time() - started.get(num, submitted[num])))
+                with lock:
+                    if num not in started:
+                        # Do not run it once it gets a thread
+                        attempts[num] += 1
+                        break
+                    _discard_ext_pillar_pool(pool)
+                    pool = _ext_pillar_pool(threads)
+                    for later in range(num + 1, len(sources)):
+                        if later not in started:
+                            submit(later)
+                break
+        return results
+
     def ext_pillar(self, pillar, pillar_dirs):
         '''
         Render the external pillar data
         '''
+        self.ext_pillar_times = []
         if 'ext_pillar' not in self.opts:
             return pillar
         if not isinstance(self.opts['ext_pillar'], list):
             log.critical('The "ext_pillar" option is malformed')
             return pillar
-        ext = None
+        sources = []
         for run in self.opts['ext_pillar']:
             if not isinstance(run, dict):
                 log.critical('The "ext_pillar" option is malformed')
@@ -507,34 +828,28 @@ class Pillar(object):
                            'unavailable').format(key)
                     log.critical(err)
                     continue
-                try:
-                    try:
-                        ext = self._external_pillar_data(pillar,
-                                                         val,
-                                                         pillar_dirs,
-                                                         key)
-                    except TypeError as exc:
-                        if exc.message.startswith('ext_pillar() takes exactly '):
-                            log.warning('Deprecation warning: ext_pillar "{0}"'
-                                        ' needs to accept minion_id as first'
-                                        ' argument'.format(key))
-                        else:
-                            raise
-
-                        ext = self._external_pillar_data(pillar,
-                                                         val,
-                                                         pillar_dirs,
-                                                         key)
-                except Exception as exc:
-                    log.exception(
-                            'Failed to load ext_pillar {0}: {1}'.format(
-                                key,
-                                exc
-                                )
-                            )
+                sources.append((key, val))
+        threads = self.opts.get('ext_pillar_threads', 0)
+        if threads > 0 and sources:
+            results = self._ext_pillar_concurrent(
+                pillar, sources, pillar_dirs, threads)
+        else:
+            results = None
+        # The data is merged in the configured order
+        for num, (key, val) in enumerate(sources):
+            if results is None:
+                # Run one after the other, an external pillar sees the data
+                # of the ones before it
+                ext, result, seconds = self._run_ext_pillar(
+                    pillar, key, val, pillar_dirs)
+            else:
+                ext, result, seconds = results[num]
+            log.debug('ext_pillar {0} took {1:.3f} seconds: {2}'.format(
+                key, seconds, result))
+            self.ext_pillar_times.append(
+                {'name': key, 'time': seconds, 'result': result})
             if ext:
                 pillar = self.merge_sources(pillar, ext)
-                ext = None
         return pillar
 
     def merge_sources(self, obj_a, obj_b):
@@ -584,3 +899,213 @@ class Pillar(object):
                 log.critical('Pillar render error: {0}'.format(error))
             pillar['_errors'] = errors
         return pillar
+
+
+class PillarCache(object):
+    '''
+    Keep the pillar compiled for every minion, and hand it out again until
+    something it was compiled from changes:
+
+    - one of the files read to compile it changes, or a file is added to or
+      removed from the pillar_roots
+    - the grains sent by the minion change
+    - it is older than ``pillar_cache_ttl``, or than the
+      ``ext_pillar_cache_ttl`` of one of the external pillars of the minion
+    - the minion asks for a refresh, which ``saltutil.refresh_pillar`` does
+
+    The pillars are kept in the ``pillar_cache`` directory of the cachedir,
+    so every master worker hands out the pillars the others compiled. They
+    are dropped when the master starts, see :py:func:`clear_pillar_cache`.
+    '''
+    def __init__(self, opts):
+        self.ttl = opts.get('pillar_cache_ttl', 3600)
+        self.ext_ttls = opts.get('ext_pillar_cache_ttl') or {}
+        self.ext_pillar = opts.get('ext_pillar') or []
+        self.cache_dir = os.path.join(opts['cachedir'], PILLAR_CACHE_DIR)
+        self.serial = salt.payload.Serial(opts)
+        self.watcher = salt.fileserver.MtimeMapWatcher(opts['pillar_roots'])
+        self.roots = self._roots_hash()
+        # The entries last read or written by this worker, and the stat of
+        # their files then
+        self.cache = {}
+        self.stats = {}
+        self.hits = 0
+        self.misses = 0
+        # Used by the IO threads of a master worker
+        self.lock = threading.Lock()
+
+    def _key(self, load):
+        '''
+        Return the key of the pillar of the minion of a load
+        '''
+        return (load['id'],
+                load.get('saltenv', load.get('env')),
+                freeze(load.get('ext')))
+
+    def _path(self, key):
+        '''
+        Return the path of the file the pillar with the given key is kept in
+        '''
+        name = hashlib.sha1(repr(key)).hexdigest()
+        return os.path.join(self.cache_dir, '{0}.p'.format(name))
+
+    def _grains_hash(self, grains):
+        '''
+        Return the hash of the grains of a minion
+        '''
+        return hashlib.sha1(repr(freeze(grains))).hexdigest()
+
+    def _roots_hash(self):
+        '''
+        Return the hash of the names of the files in the pillar_roots
+        '''
+        return hashlib.sha1(
+            repr(sorted(self.watcher.mtime_map))).hexdigest()
+
+    def _mtime(self, path):
+        '''
+        Return the mtime of a file read to compile a pillar, None if it is
+        gone
+        '''
+        if path in self.watcher.mtime_map:
+            return self.watcher.mtime_map[path]
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def _ttl(self, ext):
+        '''
+        Return how long the pillar of a minion with the given on demand
+        external pillar is kept
+        '''
+        ttl = self.ttl
+        sources = list(self.ext_pillar)
+        if ext:
+            sources.append(ext)
+        for source in sources:
+            if not isinstance(source, dict):
+                continue
+            for name in source:
+                if name in self.ext_ttls:
+                    ttl = min(ttl, self.ext_ttls[name])
+        return ttl
+
+    def _stat(self, path):
+        '''
+        Return what tells if the file of an entry was written again, None if
+        there is no file
+        '''
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime, stat.st_size, stat.st_ino)
+
+    def _read(self, key):
+        '''
+        Return the entry with the given key, read again only if another
+        worker wrote it since it was last read
+        '''
+        path = self._path(key)
+        stat = self._stat(path)
+        if stat is None:
+            self.cache.pop(key, None)
+            return None
+        if self.stats.get(key) == stat:
+            return self.cache[key]
+        try:
+            with salt.utils.fopen(path, 'rb') as fp_:
+                entry = self.serial.load(fp_)
+        except Exception as exc:
+            log.debug('Unable to read the cached pillar {0}: {1}'.format(
+                path, exc))
+            return None
+        self.cache[key] = entry
+        self.stats[key] = stat
+        return entry
+
+    def _remove(self, key):
+        '''
+        Drop the entry with the given key
+        '''
+        self.cache.pop(key, None)
+        self.stats.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def refresh(self):
+        '''
+        Look for the files which changed in the pillar_roots
+        '''
+        if self.watcher.update():
+            self.roots = self._roots_hash()
+
+    def _valid(self, entry, grains):
+        '''
+        Return True if nothing the pillar of an entry was compiled from
+        changed
+        '''
+        if entry['expire'] < time.time() \
+                or entry['grains'] != grains \
+                or entry['roots'] != self.roots:
+            return False
+        for path, mtime in entry['files'].iteritems():
+            if self._mtime(path) != mtime:
+                return False
+        return True
+
+    def get(self, load):
+        '''
+        Return the cached pillar of the minion of a load, None if it has to
+        be compiled
+        '''
+        key = self._key(load)
+        grains = self._grains_hash(load['grains'])
+        with self.lock:
+            self.refresh()
+            entry = None
+            if not load.get('refresh'):
+                entry = self._read(key)
+            if entry is None or not self._valid(entry, grains):
+                self._remove(key)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry['data']
+
+    def store(self, load, data, files):
+        '''
+        Keep the pillar compiled for the minion of a load, with the files
+        read to compile it
+        '''
+        if not isinstance(data, dict) or '_errors' in data:
+            return
+        ttl = self._ttl(load.get('ext'))
+        if ttl <= 0:
+            return
+        key = self._key(load)
+        path = self._path(key)
+        with self.lock:
+            # The mtimes seen before the pillar was compiled are kept, a
+            # file changed while it was compiled invalidates it
+            entry = {'data': data,
+                     'grains': self._grains_hash(load['grains']),
+                     'roots': self.roots,
+                     'files': dict((path_, self._mtime(path_))
+                                   for path_ in files),
+                     'expire': time.time() + ttl}
+            try:
+                if not os.path.isdir(self.cache_dir):
+                    os.makedirs(self.cache_dir, 0700)
+                with salt.utils.atomicfile.atomic_open(path, 'w+b') as fp_:
+                    self.serial.dump(entry, fp_)
+            except Exception as exc:
+                log.debug('Unable to write the cached pillar {0}: {1}'.format(
+                    path, exc))
+                self._remove(key)
+                return
+            self.cache[key] = entry
+            self.stats[key] = self._stat(path)
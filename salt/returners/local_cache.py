@@ -15,6 +15,7 @@ import hashlib
 # Import salt libs
 import salt.payload
 import salt.utils
+import salt.utils.job_cache
 
 log = logging.getLogger(__name__)
 
@@ -245,6 +246,11 @@ def get_jid(jid):
                             salt.utils.fopen(outp, 'rb'))
                 except Exception:
                     pass
+    if not os.path.exists(os.path.join(jid_dir, 'nocache')):
+        # The returns the master workers queued and did not write yet
+        for minion, data in salt.utils.job_cache.pending_returns(
+                __opts__, jid).iteritems():
+            ret.setdefault(minion, data)
     return ret
 
 
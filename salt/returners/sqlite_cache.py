@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+'''
+Return data to an indexed sqlite job cache on the master
+
+This returner is a drop in alternative to the ``local_cache`` returner for the
+master job cache. Instead of one directory per job and one file per minion
+return, jobs and returns are stored in a few sqlite databases (shards) in the
+master cachedir. Jobs can be looked up by jid, by minion and by time range
+through indexes, and old jobs are expired with a single range delete instead
+of walking the job cache directory.
+
+To use it set the following in the master config:
+
+.. code-block:: yaml
+
+    master_job_cache: sqlite_cache
+
+Optional settings, along with their defaults:
+
+.. code-block:: yaml
+
+    # Number of database files the jobs are spread across, more shards
+    # means less lock contention between the master worker processes
+    sqlite_cache.shards: 4
+    # Seconds to wait for a lock held by another master process
+    sqlite_cache.timeout: 30.0
+
+Changing ``sqlite_cache.shards`` on a master with existing jobs will make the
+existing jobs unreachable by jid until they expire.
+'''
+
+# Import python libs
+import datetime
+import hashlib
+import logging
+import os
+import threading
+
+# Better safe than sorry here. Even though sqlite3 is included in python
+try:
+    import sqlite3
+    HAS_SQLITE3 = True
+except ImportError:
+    HAS_SQLITE3 = False
+
+# Import salt libs
+import salt.payload
+import salt.utils
+import salt.utils.job_cache
+import salt.utils.minions
+
+log = logging.getLogger(__name__)
+
+# Define the module's virtual name
+__virtualname__ = 'sqlite_cache'
+
+# Open connections, keyed by pid, thread and database path since sqlite
+# connections can not be shared between processes or threads
+_CONNS = {}
+
+_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS jids (
+         jid TEXT PRIMARY KEY,
+         nocache INTEGER NOT NULL DEFAULT 0,
+         load BLOB,
+         minions BLOB
+       )''',
+    '''CREATE TABLE IF NOT EXISTS returns (
+         jid TEXT NOT NULL,
+         id TEXT NOT NULL,
+         ret BLOB,
+         out BLOB,
+         PRIMARY KEY (jid, id)
+       )''',
+    'CREATE INDEX IF NOT EXISTS returns_id ON returns (id, jid)',
+)
+
+
+def __virtual__():
+    if not HAS_SQLITE3:
+        return False
+    return __virtualname__
+
+
+def _shards():
+    '''
+    Return the number of database shards
+    '''
+    return max(int(__opts__.get('sqlite_cache.shards', 4)), 1)
+
+
+def _db_path(shard):
+    '''
+    Return the path to the database file of the given shard
+    '''
+    return os.path.join(__opts__['cachedir'],
+                        'jobs_sqlite',
+                        '{0}.db'.format(shard))
+
+
+def _shard(jid):
+    '''
+    Return the shard the given job id is stored in
+    '''
+    jhash = hashlib.md5(str(jid)).hexdigest()
+    return int(jhash[:8], 16) % _shards()
+
+
+def _get_conn(shard):
+    '''
+    Return a connection to the database of the given shard, creating the
+    database if needed
+    '''
+    path = _db_path(shard)
+    key = (os.getpid(), threading.current_thread().ident, path)
+    if key in _CONNS:
+        return _CONNS[key]
+    dirname = os.path.dirname(path)
+    if not os.path.isdir(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            # Another process created it
+            pass
+    conn = sqlite3.connect(
+        path,
+        timeout=float(__opts__.get('sqlite_cache.timeout', 30.0))
+    )
+    conn.text_factory = str
+    # Write ahead logging lets readers run while a worker is writing, and
+    # only needs an fsync on checkpoints
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    with conn:
+        for statement in _SCHEMA:
+            conn.execute(statement)
+    _CONNS[key] = conn
+    return conn
+
+
+def _all_conns():
+    '''
+    Yield a connection to every shard
+    '''
+    for shard in range(_shards()):
+        yield _get_conn(shard)
+
+
+def _dumps(data):
+    serial = salt.payload.Serial(__opts__)
+    return sqlite3.Binary(serial.dumps(data))
+
+
+def _loads(data):
+    if data is None:
+        return None
+    serial = salt.payload.Serial(__opts__)
+    return serial.loads(str(data))
+
+
+def _jid_bound(bound):
+    '''
+    Turn a datetime into the smallest job id generated at that time, job ids
+    are passed through
+    '''
+    if isinstance(bound, datetime.datetime):
+        return '{0:%Y%m%d%H%M%S%f}'.format(bound)
+    return str(bound)
+
+
+def _format_job_instance(job):
+    return {'Function': job.get('fun', 'unknown-function'),
+            'Arguments': list(job.get('arg', [])),
+            # unlikely but safeguard from invalid returns
+            'Target': job.get('tgt', 'unknown-target'),
+            'Target-type': job.get('tgt_type', []),
+            'User': job.get('user', 'root')}
+
+
+def _format_jid_instance(jid, job):
+    ret = _format_job_instance(job)
+    ret.update({'StartTime': salt.utils.jid_to_time(jid)})
+    return ret
+
+
+def prep_jid(nocache=False):
+    '''
+    Return a job id and reserve it in the job cache
+    '''
+    while True:
+        jid = salt.utils.gen_jid()
+        conn = _get_conn(_shard(jid))
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT INTO jids (jid, nocache) VALUES (?, ?)',
+                    (jid, int(bool(nocache)))
+                )
+        except sqlite3.IntegrityError:
+            # Someone else is using this jid, get a new one
+            continue
+        return jid
+
+
+def _insert_returns(conn, loads):
+    '''
+    Insert the given returns, which all belong to the shard of ``conn``, in
+    the current transaction
+    '''
+    for load in loads:
+        row = conn.execute(
+            'SELECT nocache FROM jids WHERE jid = ?', (load['jid'],)
+        ).fetchone()
+        if row is None:
+            log.error(
+                'An inconsistency occurred, a job was received with a job id '
+                'that is not present in the local cache: {jid}'.format(**load)
+            )
+            continue
+        if row[0]:
+            continue
+        try:
+            conn.execute(
+                'INSERT INTO returns (jid, id, ret, out) VALUES (?, ?, ?, ?)',
+                (load['jid'],
+                 load['id'],
+                 _dumps(load['return']),
+                 _dumps(load['out']) if 'out' in load else None)
+            )
+        except sqlite3.IntegrityError:
+            # Minion has already returned this jid and it should be dropped
+            log.error(
+                'An extra return was detected from minion {0}, please verify '
+                'the minion, this could be a replay attack'.format(
+                    load['id']
+                )
+            )
+
+
+def returner(load):
+    '''
+    Return data to the job cache
+    '''
+    returner_batch([load])
+
+
+def returner_batch(loads):
+    '''
+    Return the data of many minion returns to the job cache, using a single
+    transaction per shard
+    '''
+    shards = {}
+    for load in loads:
+        # if a minion is returning a standalone job, get a jobid
+        if load['jid'] == 'req':
+            load['jid'] = prep_jid(nocache=load.get('nocache', False))
+        shards.setdefault(_shard(load['jid']), []).append(load)
+    for shard, shard_loads in shards.iteritems():
+        conn = _get_conn(shard)
+        with conn:
+            _insert_returns(conn, shard_loads)
+
+
+def save_load(jid, clear_load):
+    '''
+    Save the load to the specified jid
+    '''
+    minions = None
+    # if you have a tgt, save that for the UI etc
+    if 'tgt' in clear_load:
+        ckminions = salt.utils.minions.CkMinions(__opts__)
+        # Retrieve the minions list
+        minions = _dumps(
+            ckminions.check_minions(
+                clear_load['tgt'],
+                clear_load.get('tgt_type', 'glob')
+            )
+        )
+    conn = _get_conn(_shard(jid))
+    with conn:
+        conn.execute(
+            'INSERT OR IGNORE INTO jids (jid) VALUES (?)', (jid,)
+        )
+        conn.execute(
+            'UPDATE jids SET load = ?, minions = ? WHERE jid = ?',
+            (_dumps(clear_load), minions, jid)
+        )
+
+
+def get_load(jid):
+    '''
+    Return the load data that marks a specified jid
+    '''
+    jid = str(jid)
+    row = _get_conn(_shard(jid)).execute(
+        'SELECT load, minions FROM jids WHERE jid = ?', (jid,)
+    ).fetchone()
+    if row is None or row[0] is None:
+        return {}
+    ret = _loads(row[0])
+    if row[1] is not None:
+        ret['Minions'] = _loads(row[1])
+    return ret
+
+
+def get_jid(jid):
+    '''
+    Return the information returned when the specified job id was executed
+    '''
+    jid = str(jid)
+    ret = {}
+    rows = _get_conn(_shard(jid)).execute(
+        'SELECT id, ret, out FROM returns WHERE jid = ?', (jid,)
+    )
+    for minion, ret_data, out in rows:
+        ret[minion] = {'return': _loads(ret_data)}
+        if out is not None:
+            ret[minion]['out'] = _loads(out)
+    row = _get_conn(_shard(jid)).execute(
+        'SELECT nocache FROM jids WHERE jid = ?', (jid,)
+    ).fetchone()
+    if row is not None and not row[0]:
+        # The returns the master workers queued and did not write yet
+        for minion, data in salt.utils.job_cache.pending_returns(
+                __opts__, jid).iteritems():
+            ret.setdefault(minion, data)
+    return ret
+
+
+def get_jids(start=None, end=None):
+    '''
+    Return a list of all job ids, optionally limited to the jobs started in
+    the given time range. ``start`` and ``end`` can be datetime objects or job
+    ids, ``end`` is exclusive.
+    '''
+    query = 'SELECT jid, load FROM jids WHERE load IS NOT NULL'
+    args = []
+    if start is not None:
+        query += ' AND jid >= ?'
+        args.append(_jid_bound(start))
+    if end is not None:
+        query += ' AND jid < ?'
+        args.append(_jid_bound(end))
+    ret = {}
+    for conn in _all_conns():
+        for jid, load in conn.execute(query, args):
+            ret[jid] = _format_jid_instance(jid, _loads(load))
+    return ret
+
+
+def get_minion_jids(minion_id):
+    '''
+    Return a sorted list of the job ids the given minion has returned for
+    '''
+    ret = []
+    for conn in _all_conns():
+        ret.extend(
+            row[0] for row in conn.execute(
+                'SELECT jid FROM returns WHERE id = ?', (minion_id,)
+            )
+        )
+    return sorted(ret)
+
+
+def clean_old_jobs():
+    '''
+    Clean out the old jobs from the job cache
+    '''
+    if __opts__['keep_jobs'] == 0:
+        return
+    cutoff = _jid_bound(
+        datetime.datetime.now() -
+        datetime.timedelta(hours=__opts__['keep_jobs'])
+    )
+    for conn in _all_conns():
+        with conn:
+            # Job ids start with their creation time, so the primary keys
+            # give us the expired jobs directly
+            conn.execute('DELETE FROM returns WHERE jid < ?', (cutoff,))
+            conn.execute('DELETE FROM jids WHERE jid < ?', (cutoff,))
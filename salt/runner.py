@@ -175,6 +175,8 @@ class RunnerClient(mixins.SyncClientMixin, mixins.AsyncClientMixin, object):
                 self.opts['transport'])
         job = self.master_call(**low)
         ret_tag = tagify('ret', base=job['tag'])
+        sevent.subscribe(ret_tag)
+        sevent.unsubscribe('')
 
         timelimit = time.time() + (timeout or 300)
         while True:
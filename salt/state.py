@@ -32,12 +32,14 @@ import salt.utils.event
 import salt.syspaths as syspaths
 from salt.utils import context, immutabletypes
 from salt._compat import string_types
-from salt.template import compile_template, compile_template_str
+from salt.template import compile_template, compile_template_str, RenderCache
 from salt.exceptions import SaltRenderError, SaltReqTimeoutError, SaltException
 from salt.utils.odict import OrderedDict, DefaultOrderedDict
 
 log = logging.getLogger(__name__)
 
+# The render cache shared by the highstates run in this process
+_RENDER_CACHE = []
 
 STATE_INTERNAL_KEYWORDS = frozenset([
     # These are keywords passed to state module functions which are to be used
@@ -2043,6 +2045,18 @@ class State(object):
         return self.call_high(high)
 
 
+def _render_cache(opts):
+    '''
+    Return the render cache shared by the highstates run in this process,
+    None if the render_cache option is not set
+    '''
+    if not opts.get('render_cache', False):
+        return None
+    if not _RENDER_CACHE:
+        _RENDER_CACHE.append(RenderCache(opts))
+    return _RENDER_CACHE[0]
+
+
 class BaseHighState(object):
     '''
     The BaseHighState is an abstract base class that is the foundation of
@@ -2057,6 +2071,7 @@ class BaseHighState(object):
         self.avail = self.__gather_avail()
         self.serial = salt.payload.Serial(self.opts)
         self.building_highstate = {}
+        self.render_cache = _render_cache(self.opts)
 
     def __gather_avail(self):
         '''
@@ -2132,7 +2147,8 @@ class BaseHighState(object):
                             ),
                         self.state.rend,
                         self.state.opts['renderer'],
-                        env=self.opts['environment']
+                        env=self.opts['environment'],
+                        render_cache=self.render_cache
                         )
                     ]
         else:
@@ -2145,7 +2161,8 @@ class BaseHighState(object):
                                 ),
                             self.state.rend,
                             self.state.opts['renderer'],
-                            saltenv=saltenv
+                            saltenv=saltenv,
+                            render_cache=self.render_cache
                             )
                         )
 
@@ -2176,7 +2193,8 @@ class BaseHighState(object):
                                         ).get('dest', False),
                                     self.state.rend,
                                     self.state.opts['renderer'],
-                                    saltenv=saltenv
+                                    saltenv=saltenv,
+                                    render_cache=self.render_cache
                                     )
                                 )
                         done[saltenv].append(sls)
@@ -2349,7 +2367,7 @@ class BaseHighState(object):
         try:
             state = compile_template(
                 fn_, self.state.rend, self.state.opts['renderer'], saltenv,
-                sls, rendered_sls=mods
+                sls, rendered_sls=mods, render_cache=self.render_cache
             )
         except SaltRenderError as exc:
             msg = 'Rendering SLS \'{0}:{1}\' failed: {2}'.format(
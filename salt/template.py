@@ -6,17 +6,41 @@ Manage basic template commands
 # Import python libs
 import time
 import os
+import sys
+import copy
 import codecs
+import contextlib
+import hashlib
 import logging
+import threading
 from cStringIO import StringIO as cStringIO
 from StringIO import StringIO as pyStringIO
 
 # Import salt libs
 import salt.utils
+from salt.utils.cache import RecordingDict, RecordingMapping, freeze
+from salt.utils.odict import OrderedDict
 from salt._compat import string_types
 
 log = logging.getLogger(__name__)
 
+# The renderers whose output only depends on their input, the grains,
+# pillar and options they read, the salt functions they call and the
+# files they include
+CACHE_RENDERERS = frozenset(['jinja', 'yaml', 'json', 'yamlex'])
+
+# Renders which record what they look at swap the globals of the renderer
+# modules, only one of them runs at a time
+_RENDER_LOCK = threading.RLock()
+
+# The sets the files read by the renders being recorded are added to
+_FILE_TRACKERS = []
+
+# The sets the volatile inputs used by the renders being recorded are added to
+_VOLATILE_TRACKERS = []
+
+_MISSING = object()
+
 
 def string_io(data=None):  # cStringIO can't handle unicode
     try:
@@ -36,10 +60,12 @@ def compile_template(template,
                      default,
                      saltenv='base',
                      sls='',
+                     render_cache=None,
                      **kwargs):
     '''
     Take the path to a template and return the high data structure
-    derived from the template.
+    derived from the template. A :py:class:`RenderCache` can be passed to
+    reuse earlier renders of the same source.
     '''
 
     # We "map" env to the same as saltenv until Boron is out in order to follow the same deprecation path
@@ -67,10 +93,23 @@ def compile_template(template,
     with codecs.open(template, encoding=SLS_ENCODING) as ifile:
         # data input to the first render function in the pipe
         input_data = ifile.read()
+        track_file(template)
         if not input_data.strip():
             # Template is nothing but whitespace
             return {}
 
+    if render_cache is not None:
+        return render_cache.render(template, input_data, renderers,
+                                   render_pipe, saltenv, sls, kwargs)
+    return _render_pipe(template, input_data, renderers, render_pipe,
+                        saltenv, sls, kwargs)
+
+
+def _render_pipe(template, input_data, renderers, render_pipe, saltenv, sls,
+                 kwargs):
+    '''
+    Run the source of a template through the render pipe
+    '''
     input_data = string_io(input_data)
     for render, argline in render_pipe:
         try:
@@ -98,6 +137,309 @@ def compile_template(template,
     return ret
 
 
+def track_file(path):
+    '''
+    Record that a file was read by the render of a template, called by the
+    renderers for the files included by a template
+    '''
+    for files in _FILE_TRACKERS:
+        files.add(path)
+
+
+@contextlib.contextmanager
+def track_files():
+    '''
+    Collect the paths of the templates, and of the files they include, read
+    by the renders run in the block
+    '''
+    files = set()
+    _FILE_TRACKERS.append(files)
+    try:
+        yield files
+    finally:
+        _FILE_TRACKERS.remove(files)
+
+
+def track_volatile(name):
+    '''
+    Record that the render of a template used an input whose value is not
+    recorded, like the current time or a random number, called by the
+    renderers for the filters and globals which return those
+    '''
+    for names in _VOLATILE_TRACKERS:
+        names.add(name)
+
+
+@contextlib.contextmanager
+def track_volatiles():
+    '''
+    Collect the names of the volatile inputs used by the renders run in the
+    block
+    '''
+    names = set()
+    _VOLATILE_TRACKERS.append(names)
+    try:
+        yield names
+    finally:
+        _VOLATILE_TRACKERS.remove(names)
+
+
+def _dict_values(keys, data):
+    '''
+    Return the values of the keys of a dict recorded by a RenderCache
+    '''
+    if keys is None:
+        return None
+    if keys is True:
+        return freeze(data)
+    return tuple(freeze(data[key]) if key in data else _MISSING
+                 for key in keys)
+
+
+def _file_stamp(path):
+    '''
+    Return what identifies the version of a file included by a template
+    '''
+    try:
+        stats = os.stat(path)
+    except os.error:
+        return _MISSING
+    return stats.st_mtime, stats.st_size
+
+
+class _CallRecorder(object):
+    '''
+    Stand in for the salt functions of a renderer, recording the calls of the
+    functions whose results may be cached and noting any other call
+    '''
+    def __init__(self, functions, allowed):
+        self.functions = functions
+        self.allowed = allowed
+        self.calls = {}
+        self.cacheable = True
+
+    def __getitem__(self, name):
+        func = self.functions[name]
+
+        def record(*args, **kwargs):
+            # The functions get the dicts, not the views templates have
+            args = tuple(arg.record if isinstance(arg, RecordingMapping)
+                         else arg for arg in args)
+            for key, val in kwargs.items():
+                if isinstance(val, RecordingMapping):
+                    kwargs[key] = val.record
+            if name not in self.allowed:
+                self.cacheable = False
+                return func(*args, **kwargs)
+            call_args = copy.deepcopy((args, kwargs))
+            ret = func(*args, **kwargs)
+            try:
+                key = (name, freeze(args), freeze(kwargs))
+            except Exception:
+                self.cacheable = False
+            else:
+                self.calls[key] = (call_args, freeze(ret))
+            return ret
+        return record
+
+    def get(self, name, default=None):
+        if name not in self.functions:
+            return default
+        return self[name]
+
+    def __contains__(self, name):
+        return name in self.functions
+
+    def __iter__(self):
+        return iter(self.functions)
+
+    def __len__(self):
+        return len(self.functions)
+
+    def keys(self):
+        return list(self.functions)
+
+
+class RenderCache(object):
+    '''
+    Keep the data rendered from templates, and hand it out again for a
+    template of the same source while the grains, pillar and options the
+    render looked at, the salt functions it called and the files it included
+    are the same.
+
+    Only the renders of templates piped through :py:data:`CACHE_RENDERERS`
+    are kept. A render which called a salt function missing from the
+    ``render_cache_functions`` option is not kept, nor is a render which
+    used a volatile input, see :py:func:`track_volatile`. The functions that are
+    listed are called again to check a cached render, so they have to be
+    cheap and free of side effects.
+    '''
+    # How many sets of inputs are remembered for the renders of a source
+    MAX_SHAPES = 8
+
+    def __init__(self, opts):
+        self.size = opts.get('render_cache_size', 1000)
+        self.functions = frozenset(opts.get('render_cache_functions', ()))
+        # Included files are only checked on disk, they are not fetched
+        self.local = opts.get('file_client', 'remote') == 'local'
+        # The sets of inputs the renders of a source looked at
+        self.shapes = {}
+        # The rendered data, by source, set of inputs and their values
+        self.data = OrderedDict()
+        self.call_args = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, template, input_data, render_pipe, saltenv, sls, kwargs):
+        '''
+        Return the key of the source of a render, None if it is not to be
+        cached
+        '''
+        if not saltenv:
+            # Jinja includes files from outside of the file roots
+            return None
+        pipe = []
+        for render, argline in render_pipe:
+            name = render.__module__.rsplit('.', 1)[-1]
+            if name not in CACHE_RENDERERS:
+                return None
+            pipe.append((name, argline))
+        try:
+            frozen = freeze(kwargs)
+        except Exception:
+            return None
+        digest = hashlib.sha1(input_data.encode(SLS_ENCODING)).hexdigest()
+        return (digest, template, tuple(pipe), saltenv, sls, frozen)
+
+    def _values(self, shape, context):
+        '''
+        Return the current values of the inputs of a shape, None if they can
+        not be found
+        '''
+        grains, pillar, opts, calls, files = shape
+        values = [_dict_values(grains, context['__grains__']),
+                  _dict_values(pillar, context['__pillar__']),
+                  _dict_values(opts, context['__opts__'])]
+        for call in calls:
+            name = call[0]
+            (args, kwargs) = copy.deepcopy(self.call_args[call])
+            try:
+                values.append(
+                    freeze(context['__salt__'][name](*args, **kwargs)))
+            except Exception:
+                return None
+        for path in files:
+            values.append(_file_stamp(path))
+        return tuple(values)
+
+    def render(self, template, input_data, renderers, render_pipe, saltenv,
+               sls, kwargs):
+        '''
+        Return the data rendered from a template, see compile_template
+        '''
+        key = self._key(template, input_data, render_pipe, saltenv, sls,
+                        kwargs)
+        if key is None:
+            return _render_pipe(template, input_data, renderers, render_pipe,
+                                saltenv, sls, kwargs)
+        mods = []
+        for render, _ in render_pipe:
+            mod = sys.modules[render.__module__]
+            if mod not in mods:
+                mods.append(mod)
+        context = {}
+        for name in ('__grains__', '__pillar__', '__opts__', '__salt__'):
+            for mod in mods:
+                if getattr(mod, name, None) is not None:
+                    context[name] = getattr(mod, name)
+                    break
+            else:
+                context[name] = {}
+        with _RENDER_LOCK:
+            for shape in self.shapes.get(key, ()):
+                values = self._values(shape, context)
+                if values is None:
+                    continue
+                data = self.data.pop((key, shape, values), _MISSING)
+                if data is _MISSING:
+                    continue
+                self.data[(key, shape, values)] = data
+                self.hits += 1
+                for path in shape[4]:
+                    track_file(path)
+                return copy.deepcopy(data)
+            self.misses += 1
+            return self._record(key, mods, context, template, input_data,
+                                renderers, render_pipe, saltenv, sls, kwargs)
+
+    def _record(self, key, mods, context, template, input_data, renderers,
+                render_pipe, saltenv, sls, kwargs):
+        '''
+        Render a template, recording what the render looked at, and keep the
+        data rendered
+        '''
+        recorders = {}
+        for name in ('__grains__', '__pillar__', '__opts__'):
+            recorders[name] = RecordingDict(context[name])
+        calls = _CallRecorder(context['__salt__'], self.functions)
+        recorders['__salt__'] = calls
+        saved = []
+        cacheable = True
+        for mod in mods:
+            for name, recorder in recorders.items():
+                orig = getattr(mod, name, None)
+                if orig is None:
+                    continue
+                if orig is not context[name]:
+                    # Not the globals of a single loader
+                    cacheable = False
+                    continue
+                saved.append((mod, name, orig))
+                setattr(mod, name, recorder)
+        try:
+            with track_files() as files, track_volatiles() as volatiles:
+                ret = _render_pipe(template, input_data, renderers,
+                                   render_pipe, saltenv, sls, kwargs)
+        finally:
+            for mod, name, orig in reversed(saved):
+                setattr(mod, name, orig)
+        if not cacheable or not calls.cacheable or volatiles \
+                or not isinstance(ret, (dict, list)) \
+                or (files and not self.local):
+            return ret
+        dict_keys = []
+        for name in ('__grains__', '__pillar__', '__opts__'):
+            recorder = recorders[name]
+            if recorder.used_all:
+                dict_keys.append(True)
+            else:
+                dict_keys.append(tuple(sorted(recorder.used)))
+        shape = tuple(dict_keys) + (tuple(sorted(calls.calls)),
+                                    tuple(sorted(files)))
+        values = [_dict_values(dict_keys[0], context['__grains__']),
+                  _dict_values(dict_keys[1], context['__pillar__']),
+                  _dict_values(dict_keys[2], context['__opts__'])]
+        for call in shape[3]:
+            self.call_args[call] = calls.calls[call][0]
+            values.append(calls.calls[call][1])
+        for path in shape[4]:
+            values.append(_file_stamp(path))
+        shapes = self.shapes.setdefault(key, [])
+        if shape in shapes:
+            shapes.remove(shape)
+        shapes.insert(0, shape)
+        del shapes[self.MAX_SHAPES:]
+        self.data[(key, shape, tuple(values))] = copy.deepcopy(ret)
+        while len(self.data) > self.size:
+            self.data.popitem(last=False)
+        if len(self.shapes) > self.size:
+            live = set(data_key[0] for data_key in self.data)
+            for shape_key in list(self.shapes):
+                if shape_key not in live:
+                    del self.shapes[shape_key]
+        return ret
+
+
 def compile_template_str(template, renderers, default):
     '''
     Take template as a string and return the high data structure
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
+import copy
 import time
+from collections import MutableMapping
 
 
 class CacheDict(dict):
@@ -38,3 +40,175 @@ class CacheDict(dict):
     def __contains__(self, key):
         self._enforce_ttl_key(key)
         return dict.__contains__(self, key)
+
+
+class RecordingDict(dict):
+    '''
+    A copy of a dict which records the keys looked up in it, writes go
+    through to the original dict
+    '''
+    def __init__(self, orig):
+        dict.__init__(self, orig)
+        self.orig = orig
+        self.used = set()
+        self.used_all = False
+
+    def __getitem__(self, key):
+        self.used.add(key)
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        self.used.add(key)
+        return dict.get(self, key, default)
+
+    def __contains__(self, key):
+        self.used.add(key)
+        return dict.__contains__(self, key)
+
+    has_key = __contains__
+
+    def __setitem__(self, key, val):
+        dict.__setitem__(self, key, val)
+        self.orig[key] = val
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        other = dict(*args, **kwargs)
+        dict.update(self, other)
+        self.orig.update(other)
+
+    def __reduce__(self):
+        # copy and pickle hand out a plain dict
+        self.used_all = True
+        return (dict, (dict(self),))
+
+    def __reduce_ex__(self, protocol):
+        return self.__reduce__()
+
+    def __deepcopy__(self, memo):
+        self.used_all = True
+        return copy.deepcopy(dict(self), memo)
+
+    def _all(name):  # pylint: disable=E0213
+        def wrapper(self, *args, **kwargs):
+            self.used_all = True
+            return getattr(dict, name)(self, *args, **kwargs)
+        return wrapper
+
+    __iter__ = _all('__iter__')
+    __len__ = _all('__len__')
+    keys = _all('keys')
+    values = _all('values')
+    items = _all('items')
+    iterkeys = _all('iterkeys')
+    itervalues = _all('itervalues')
+    iteritems = _all('iteritems')
+    copy = __copy__ = _all('copy')
+    __repr__ = _all('__repr__')
+    __eq__ = _all('__eq__')
+    __ne__ = _all('__ne__')
+    del _all
+
+    def deps(self):
+        '''
+        Return the keys looked up, with their values
+        '''
+        if self.used_all:
+            return {'all': True, 'values': dict(self), 'missing': []}
+        values = {}
+        missing = []
+        for key in self.used:
+            if dict.__contains__(self, key):
+                values[key] = dict.__getitem__(self, key)
+            else:
+                missing.append(key)
+        return {'all': False, 'values': values, 'missing': missing}
+
+
+class RecordingMapping(MutableMapping):
+    '''
+    The view of a :py:class:`RecordingDict` handed to templates.
+
+    The C code which copies a dict, ``dict(data)``, ``{}.update(data)`` or
+    ``func(**data)``, reads a dict subclass without calling any of its
+    methods, so those copies can not be recorded. This view is not a dict, C
+    code goes through its ``keys`` and the copy records every key.
+    '''
+    def __init__(self, record):
+        self.record = record
+
+    def __getitem__(self, key):
+        return self.record[key]
+
+    def get(self, key, default=None):
+        return self.record.get(key, default)
+
+    def __contains__(self, key):
+        return key in self.record
+
+    has_key = __contains__
+
+    def __setitem__(self, key, val):
+        self.record[key] = val
+
+    def __delitem__(self, key):
+        del self.record[key]
+
+    def __iter__(self):
+        return iter(self.record)
+
+    def __len__(self):
+        return len(self.record)
+
+    def keys(self):
+        return self.record.keys()
+
+    def items(self):
+        return self.record.items()
+
+    def values(self):
+        return self.record.values()
+
+    def iteritems(self):
+        return self.record.iteritems()
+
+    def copy(self):
+        return self.record.copy()
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.record, memo)
+
+    def __repr__(self):
+        return repr(self.record)
+
+    def __eq__(self, other):
+        if isinstance(other, RecordingMapping):
+            other = other.record
+        return self.record == other
+
+    def __ne__(self, other):
+        return not self == other
+
+
+def freeze(obj):
+    '''
+    Return a hashable value which compares equal for equal data
+    '''
+    if isinstance(obj, dict):
+        return (dict, tuple(sorted((key, freeze(val))
+                                   for key, val in obj.iteritems())))
+    if isinstance(obj, (list, tuple)):
+        return (list, tuple(freeze(val) for val in obj))
+    if isinstance(obj, (set, frozenset)):
+        return frozenset(freeze(val) for val in obj)
+    try:
+        hash(obj)
+    except TypeError:
+        return repr(obj)
+    return obj
@@ -37,6 +37,18 @@ When the tag is exactly 20 characters no padded is done.
 
 The get_event method intelligently figures out if the tag is longer than 20 characters.
 
+The master event publisher sends every event on to its subscribers as two
+zeromq frames, the tag and the serialized data. Listeners subscribe to the tag
+prefixes they are interested in, see :py:meth:`SaltEvent.subscribe`, so the
+events they would throw away are filtered out by zeromq before they are ever
+received or deserialized.
+
+Events fired on the master event bus are sent as three frames, the tag, a small
+header and the serialized data. The header holds the job id, minion id,
+function and success of the event along with the size of the data, see
+:py:class:`LazyEvent`. The data of a received event is only deserialized once
+it is used.
+
 
 The convention for namespacing is to use dot characters "." as the name space delimiter.
 The name space "salt" is reserved by SaltStack for internal events.
@@ -49,12 +61,16 @@ Namespaced tag
 
 # Import python libs
 import os
+import copy
 import fnmatch
 import glob
 import hashlib
 import errno
 import logging
+import struct
 import time
+import Queue
+import threading
 import datetime
 import multiprocessing
 from multiprocessing import Process
@@ -87,6 +103,8 @@ SUB_EVENT = set([
 TAGEND = '\n\n'  # long tag delimiter
 TAGPARTER = '/'  # name spaced tag delimiter
 SALT = 'salt'  # base prefix for all salt/ events
+# Keys of the event data copied into the header of master events
+HEADER_KEYS = ('jid', 'id', 'fun', 'success')
 # dict map of namespaced base tag prefixes for salt events
 TAGS = {
     'auth': 'auth',  # prefix for all salt/auth events
@@ -99,6 +117,7 @@ TAGS = {
     'cloud': 'cloud',  # prefix for all salt/cloud events
     'fileserver': 'fileserver',  # prefix for all salt/fileserver events
     'queue': 'queue',  # prefix for all salt/queue events
+    'pillar': 'pillar',  # prefix for all salt/pillar events
 }
 
 
@@ -138,11 +157,112 @@ def tagify(suffix='', prefix='', base=SALT):
     return TAGPARTER.join([part for part in parts if part])
 
 
+class LazyEvent(MutableMapping):
+    '''
+    A received event, a mapping with the ``tag`` and the ``data`` of the event.
+
+    The data is deserialized the first time it is used, the tag and the
+    ``header`` can be read without touching it. The header is a dict with the
+    ``size`` of the serialized data and the ``jid``, ``id``, ``fun`` and
+    ``success`` of the data when it has them. ``seq`` is the sequence number
+    of the event in the event journal, or None.
+
+    The event is not a dict, which would be copied by ``dict(event)`` or
+    ``**event`` without the data. Copies and pickles of the event are plain
+    dicts, the salt serializers pack it as a dict, ``json.dumps`` needs
+    ``dict(event)``.
+    '''
+    def __init__(self, tag, mdata, serial, mheader=None, seq=None):
+        self._dict = {'tag': tag}
+        self._mdata = mdata
+        self._mheader = mheader
+        self._header = None
+        self._serial = serial
+        # The sequence number of the event in the event journal
+        self.seq = seq
+
+    @property
+    def header(self):
+        '''
+        The header of the event
+        '''
+        if self._header is None:
+            if self._mheader:
+                self._header = self._serial.loads(self._mheader)
+            else:
+                # The event was sent without a header, build it from the data
+                size = len(self._mdata) if self._mdata is not None else 0
+                self._header = SaltEvent.make_header(self['data'], size)
+        return self._header
+
+    def _load(self):
+        '''
+        Deserialize the event data
+        '''
+        if self._mdata is not None:
+            self._dict['data'] = self._serial.loads(self._mdata)
+            self._mdata = None
+
+    def __getitem__(self, key):
+        if key == 'data':
+            self._load()
+        return self._dict[key]
+
+    def __setitem__(self, key, value):
+        if key == 'data':
+            self._mdata = None
+        self._dict[key] = value
+
+    def __delitem__(self, key):
+        if key == 'data' and self._mdata is not None:
+            self._mdata = None
+            return
+        del self._dict[key]
+
+    def __contains__(self, key):
+        if key == 'data' and self._mdata is not None:
+            return True
+        return key in self._dict
+
+    def __iter__(self):
+        keys = list(self._dict)
+        if self._mdata is not None:
+            keys.append('data')
+        return iter(keys)
+
+    def __len__(self):
+        return len(self._dict) + (self._mdata is not None)
+
+    def __repr__(self):
+        self._load()
+        return repr(self._dict)
+
+    def copy(self):
+        '''
+        Return the event as a dict
+        '''
+        return dict(self)
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(dict(self), memo)
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+    def __reduce_ex__(self, protocol):
+        return self.__reduce__()
+
+    has_key = __contains__
+
+
 class SaltEvent(object):
     '''
     The base class used to manage salt events
     '''
     def __init__(self, node, sock_dir=None, opts=None):
+        self.node = node
         self.serial = salt.payload.Serial({'serial': 'msgpack'})
         self.context = zmq.Context()
         self.poller = zmq.Poller()
@@ -155,6 +275,7 @@ class SaltEvent(object):
             sock_dir = opts.get('sock_dir', None)
         self.puburi, self.pulluri = self.__load_uri(sock_dir, node)
         self.pending_events = []
+        self.subscriptions = set()
 
     def __load_uri(self, sock_dir, node):
         '''
@@ -206,15 +327,32 @@ class SaltEvent(object):
     def subscribe(self, tag=None):
         '''
         Subscribe to events matching the passed tag.
+
+        Only events with a tag starting with one of the subscribed tags are
+        received, the others are dropped by the publisher. Once connected
+        every event is received, to only receive the events of the subscribed
+        tags unsubscribe from the empty tag:
+
+        .. code-block:: python
+
+            event.subscribe('salt/job/20141018123456789012')
+            event.unsubscribe('')
         '''
         if not self.cpub:
             self.connect_pub()
+        if tag is None or tag in self.subscriptions:
+            return
+        self.sub.setsockopt(zmq.SUBSCRIBE, str(tag))
+        self.subscriptions.add(tag)
 
     def unsubscribe(self, tag=None):
         '''
         Un-subscribe to events matching the passed tag.
         '''
-        return
+        if tag is None or tag not in self.subscriptions:
+            return
+        self.sub.setsockopt(zmq.UNSUBSCRIBE, str(tag))
+        self.subscriptions.discard(tag)
 
     def connect_pub(self):
         '''
@@ -224,6 +362,7 @@ class SaltEvent(object):
         self.sub.connect(self.puburi)
         self.poller.register(self.sub, zmq.POLLIN)
         self.sub.setsockopt(zmq.SUBSCRIBE, '')
+        self.subscriptions = set([''])
         self.cpub = True
 
     def connect_pull(self, timeout=1000):
@@ -245,19 +384,70 @@ class SaltEvent(object):
         self.cpush = True
 
     @classmethod
-    def unpack(cls, raw, serial=None):
-        if serial is None:
-            serial = salt.payload.Serial({'serial': 'msgpack'})
-
+    def split(cls, raw):
+        '''
+        Split a raw event into its tag and its serialized data
+        '''
         if ord(raw[20]) >= 0x80:  # old style
             mtag = raw[0:20].rstrip('|')
             mdata = raw[20:]
         else:  # new style
             mtag, sep, mdata = raw.partition(TAGEND)  # split tag from data
+        return mtag, mdata
 
+    @classmethod
+    def unpack(cls, raw, serial=None):
+        if serial is None:
+            serial = salt.payload.Serial({'serial': 'msgpack'})
+
+        mtag, mdata = cls.split(raw)
         data = serial.loads(mdata)
         return mtag, data
 
+    @staticmethod
+    def make_header(data, size):
+        '''
+        Return the header of an event with the given data, ``size`` is the
+        size of the serialized data
+        '''
+        header = {'size': size}
+        for key in HEADER_KEYS:
+            if key in data:
+                header[key] = data[key]
+        return header
+
+    @classmethod
+    def make_frames(cls, serial, tag, data, max_size=1048576):
+        '''
+        Return the frames of a master event, the tag, the header and the
+        serialized data, trimmed to ``max_size`` bytes
+        '''
+        if type(data.get('return')) is salt.payload.Raw:
+            # A job return which is serialized already
+            serialized_data = serial.dumps_raw(data)
+        else:
+            serialized_data = serial.dumps(data)
+        serialized_data = salt.utils.trim_dict(serialized_data,
+                max_size,
+                is_msgpacked=True
+                )
+        header = serial.dumps(cls.make_header(data, len(serialized_data)))
+        return [str(tag), header, serialized_data]
+
+    def _recv(self, flags=0):
+        '''
+        Receive an event from the publisher, the master event publisher sends
+        the tag, the header and the data as separate frames
+        '''
+        frames = self.sub.recv_multipart(flags)
+        if len(frames) == 4:
+            return LazyEvent(frames[0], frames[2], self.serial, frames[1],
+                             int(frames[3]))
+        if len(frames) == 3:
+            return LazyEvent(frames[0], frames[2], self.serial, frames[1])
+        mtag, mdata = self.split(frames[0])
+        return LazyEvent(mtag, mdata, self.serial)
+
     def _check_pending(self, tag, pending_tags):
         """Check the pending_events list for events that match the tag
 
@@ -304,7 +494,8 @@ class SaltEvent(object):
                 wait = timeout_at - time.time()
                 continue
 
-            log.trace('get_event() received = {0}'.format(ret))
+            # Only the tag, formatting the event would deserialize its data
+            log.trace('get_event() received tag = {0}'.format(ret['tag']))
             return ret
 
         return None
@@ -350,17 +541,13 @@ class SaltEvent(object):
     def get_event_noblock(self):
         '''Get the raw event without blocking or any other niceties
         '''
-        raw = self.sub.recv(zmq.NOBLOCK)
-        mtag, data = self.unpack(raw, self.serial)
-        return {'data': data, 'tag': mtag}
+        return self._recv(zmq.NOBLOCK)
 
     def get_event_block(self):
         '''Get the raw event in a blocking fashion
            Slower, but decreases the possibility of dropped events
         '''
-        raw = self.sub.recv()
-        mtag, data = self.unpack(raw, self.serial)
-        return {'data': data, 'tag': mtag}
+        return self._recv()
 
     def iter_events(self, tag='', full=False):
         '''
@@ -393,19 +580,25 @@ class SaltEvent(object):
 
         data['_stamp'] = datetime.datetime.now().isoformat()
 
-        tagend = ''
-        if len(tag) <= 20:  # old style compatible tag
-            tag = '{0:|<20}'.format(tag)  # pad with pipes '|' to 20 character length
-        else:  # new style longer than 20 chars
-            tagend = TAGEND
-        serialized_data = salt.utils.trim_dict(self.serial.dumps(data),
-                self.opts.get('max_event_size', 1048576),
-                is_msgpacked=True
-                )
-        log.debug('Sending event - data = {0}'.format(data))
-        event = '{0}{1}{2}'.format(tag, tagend, serialized_data)
+        log.debug('Sending event - tag = {0}'.format(tag))
+        if self.node == 'master':
+            # Listeners read the tag and the header without deserializing the
+            # data
+            event = self.make_frames(self.serial, tag, data,
+                                     self.opts.get('max_event_size', 1048576))
+        else:
+            serialized_data = salt.utils.trim_dict(self.serial.dumps(data),
+                    self.opts.get('max_event_size', 1048576),
+                    is_msgpacked=True
+                    )
+            tagend = ''
+            if len(tag) <= 20:  # old style compatible tag
+                tag = '{0:|<20}'.format(tag)  # pad with pipes '|' to 20 character length
+            else:  # new style longer than 20 chars
+                tagend = TAGEND
+            event = ['{0}{1}{2}'.format(tag, tagend, serialized_data)]
         try:
-            self.push.send(event)
+            self.push.send_multipart(event)
         except Exception as ex:
             log.debug(ex)
             raise
@@ -507,6 +700,320 @@ class MinionEvent(SaltEvent):
         super(MinionEvent, self).__init__('minion', sock_dir=opts.get('sock_dir', None), opts=opts)
 
 
+class EventJournal(object):
+    '''
+    An append only journal of the master events, kept in segment files in the
+    ``event_journal`` directory of the cachedir.
+
+    Every event gets the next sequence number. A segment is named after the
+    sequence number of its first event, once it grows past
+    ``event_journal_segment_size`` bytes a new segment is started and the
+    oldest segments are removed, keeping ``event_journal_segments`` of them.
+
+    Only the event publisher writes to the journal, any process which can read
+    the master cachedir can read it.
+    '''
+    # Sequence number and the lengths of the tag, header and data
+    RECORD = struct.Struct('>QIII')
+
+    def __init__(self, opts):
+        self.opts = opts
+        self.serial = salt.payload.Serial({'serial': 'msgpack'})
+        self.path = os.path.join(opts['cachedir'], 'event_journal')
+        self.segment_size = opts.get('event_journal_segment_size', 67108864)
+        self.segments = max(int(opts.get('event_journal_segments', 8)), 1)
+        self.seq = 0
+        self._fp = None
+
+    def _segments(self):
+        '''
+        Return the first sequence numbers of the segments, in order
+        '''
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return []
+        return sorted(int(name[:-8]) for name in names
+                      if name.endswith('.journal') and name[:-8].isdigit())
+
+    def _segment_path(self, first):
+        return os.path.join(self.path, '{0:020d}.journal'.format(first))
+
+    def _records(self, fp_):
+        '''
+        Yield the sequence number, tag, header and data of the records of an
+        open segment, up to the last complete record
+        '''
+        while True:
+            head = fp_.read(self.RECORD.size)
+            if len(head) < self.RECORD.size:
+                return
+            seq, tag_len, header_len, data_len = self.RECORD.unpack(head)
+            body = fp_.read(tag_len + header_len + data_len)
+            if len(body) < tag_len + header_len + data_len:
+                # The record is still being written
+                return
+            yield (seq,
+                   body[:tag_len],
+                   body[tag_len:tag_len + header_len],
+                   body[tag_len + header_len:])
+
+    def open(self):
+        '''
+        Open the journal for writing, continuing the sequence numbers of the
+        last segment
+        '''
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        segments = self._segments()
+        if not segments:
+            self._rotate()
+            return
+        path = self._segment_path(segments[-1])
+        self.seq = segments[-1] - 1
+        end = 0
+        with salt.utils.fopen(path, 'rb') as fp_:
+            for record in self._records(fp_):
+                self.seq = record[0]
+                end = fp_.tell()
+        self._fp = salt.utils.fopen(path, 'ab')
+        # Drop a record which was cut short
+        self._fp.truncate(end)
+
+    def _rotate(self):
+        '''
+        Start a new segment and remove the oldest ones
+        '''
+        if self._fp is not None:
+            self._fp.close()
+        self._fp = salt.utils.fopen(self._segment_path(self.seq + 1), 'ab')
+        for first in self._segments()[:-self.segments]:
+            try:
+                os.remove(self._segment_path(first))
+            except OSError:
+                pass
+
+    def append(self, tag, header, data):
+        '''
+        Append an event to the journal and return its sequence number, the
+        event is written out on :py:meth:`flush`
+        '''
+        if self._fp.tell() >= self.segment_size:
+            self.flush()
+            self._rotate()
+        self.seq += 1
+        self._fp.write(
+            self.RECORD.pack(self.seq, len(tag), len(header), len(data)))
+        self._fp.write(tag)
+        self._fp.write(header)
+        self._fp.write(data)
+        return self.seq
+
+    def flush(self):
+        '''
+        Write the appended events out to the segment
+        '''
+        self._fp.flush()
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def read(self, since=0, tag='', start_time=None):
+        '''
+        Yield the events in the journal after the sequence number ``since``
+        whose tag starts with ``tag``, as :py:class:`LazyEvent` objects.
+
+        Segments last written to before the unix time ``start_time`` are
+        skipped, to find the events of a job without knowing a sequence
+        number.
+        '''
+        segments = self._segments()
+        for ind, first in enumerate(segments):
+            if ind + 1 < len(segments) and segments[ind + 1] <= since + 1:
+                # Every event of the segment is older
+                continue
+            path = self._segment_path(first)
+            try:
+                if start_time is not None and \
+                        os.path.getmtime(path) < start_time:
+                    continue
+                fp_ = salt.utils.fopen(path, 'rb')
+            except (IOError, OSError):
+                # Removed by the event publisher
+                continue
+            with fp_:
+                for seq, mtag, mheader, mdata in self._records(fp_):
+                    if seq <= since or not mtag.startswith(tag):
+                        continue
+                    yield LazyEvent(mtag, mdata, self.serial, mheader, seq)
+
+
+class JobTracker(object):
+    '''
+    Track the minions expected to return for the jobs published by the
+    master, from the events passing through the event publisher.
+
+    A job is complete once every minion it was published to returned.
+    Minions which did not return in time are asked once with
+    ``saltutil.find_job`` whether they are still running the job, the job is
+    given more time while some of them are and is complete with the others as
+    stragglers otherwise. Jobs are given the timeout of the client which
+    published them, or the ``timeout`` of the master.
+    '''
+    def __init__(self, opts):
+        self.opts = opts
+        self.serial = salt.payload.Serial({'serial': 'msgpack'})
+        self.timeout = opts.get('timeout', 5)
+        self.find_timeout = opts.get('gather_job_timeout', 5)
+        self.jobs = {}
+        # Map the jid of the find_job jobs to the jid of the job they find
+        self.finds = {}
+        self._find_queue = Queue.Queue()
+        self._find_thread = None
+
+    def wait(self, now=None):
+        '''
+        Return the milliseconds until :py:meth:`check` has work to do, None
+        when no job is tracked
+        '''
+        if not self.jobs:
+            return None
+        if now is None:
+            now = time.time()
+        deadline = min(job['find_until'] or job['deadline']
+                       for job in self.jobs.itervalues())
+        return max(int((deadline - now) * 1000) + 1, 0)
+
+    def handle(self, tag, header, mdata, now=None):
+        '''
+        Follow a master event and return the frames of the events it causes
+        '''
+        parts = tag.split(TAGPARTER)
+        if len(parts) < 4 or parts[0] != SALT or parts[1] != TAGS['job']:
+            return []
+        jid = parts[2]
+        if parts[3] == 'new':
+            data = self.serial.loads(mdata)
+            if data.get('fun') == 'saltutil.find_job':
+                # Whoever asked, the answers tell whether the job still runs
+                arg = data.get('arg') or ['']
+                if arg[0] in self.jobs:
+                    self.finds[jid] = arg[0]
+                    self.jobs[arg[0]]['finds'].append(jid)
+                return []
+            if now is None:
+                now = time.time()
+            timeout = data.get('timeout') or self.timeout
+            minions = set(data.get('minions') or ())
+            self.jobs[jid] = {'minions': minions,
+                              'missing': set(minions),
+                              'timeout': timeout,
+                              'deadline': now + timeout,
+                              'find_until': None,
+                              'running': set(),
+                              'finds': []}
+            if not minions:
+                return [self._complete(jid)]
+            return []
+        if parts[3] != 'ret' or len(parts) < 5:
+            return []
+        id_ = self.serial.loads(header).get('id') if header else None
+        if id_ is None:
+            id_ = TAGPARTER.join(parts[4:])
+        if jid in self.finds:
+            job = self.jobs.get(self.finds[jid])
+            if job is not None and self.serial.loads(mdata).get('return'):
+                job['running'].add(id_)
+            return []
+        job = self.jobs.get(jid)
+        if job is None:
+            return []
+        job['missing'].discard(id_)
+        if not job['missing']:
+            return [self._complete(jid)]
+        return []
+
+    def check(self, now=None):
+        '''
+        Look for the jobs which ran out of time and return the frames of the
+        events this causes
+        '''
+        if now is None:
+            now = time.time()
+        events = []
+        for jid, job in self.jobs.items():
+            if job['find_until'] is not None:
+                if now < job['find_until']:
+                    continue
+                job['find_until'] = None
+                running = job['running'] & job['missing']
+                if not running:
+                    events.append(self._complete(jid))
+                    continue
+                job['deadline'] = now + job['timeout']
+                events.append(self._event(
+                    tagify([jid, 'running'], 'job'),
+                    {'jid': jid, 'running': sorted(running)}))
+            elif now >= job['deadline']:
+                job['running'] = set()
+                job['find_until'] = now + self.find_timeout
+                self.find_job(jid, job['missing'])
+        return events
+
+    def find_job(self, jid, minions):
+        '''
+        Ask the minions whether they are still running the job, the request
+        is published from a thread so the event publisher does not wait on it
+        '''
+        if self._find_thread is None or not self._find_thread.is_alive():
+            self._find_thread = threading.Thread(target=self._run_finds,
+                                                 name='JobTracker')
+            self._find_thread.daemon = True
+            self._find_thread.start()
+        self._find_queue.put((jid, sorted(minions)))
+
+    def _run_finds(self):
+        import salt.client
+        client = None
+        while True:
+            jid, minions = self._find_queue.get()
+            try:
+                if client is None:
+                    client = salt.client.LocalClient(mopts=self.opts)
+                    # The answers are read by the tracker
+                    client.event.unsubscribe('')
+                client.pub(minions,
+                           'saltutil.find_job',
+                           [jid],
+                           expr_form='list',
+                           timeout=self.find_timeout)
+            except Exception:
+                log.error('Failed to look for job {0} on the minions'
+                          .format(jid), exc_info=True)
+
+    def _complete(self, jid):
+        '''
+        Stop tracking a job and return the frames of its complete event
+        '''
+        job = self.jobs.pop(jid)
+        for find_jid in job['finds']:
+            self.finds.pop(find_jid, None)
+        if job['missing']:
+            log.info('jid {0} minions {1} did not return'.format(
+                jid, sorted(job['missing'])))
+        return self._event(tagify([jid, 'complete'], 'job'),
+                           {'jid': jid,
+                            'minions': sorted(job['minions']),
+                            'stragglers': sorted(job['missing'])})
+
+    def _event(self, tag, data):
+        data['_stamp'] = datetime.datetime.now().isoformat()
+        return SaltEvent.make_frames(self.serial, tag, data,
+                                     self.opts.get('max_event_size', 1048576))
+
+
 class EventPublisher(Process):
     '''
     The interface that takes master events and republishes them out to anyone
@@ -550,18 +1057,62 @@ class EventPublisher(Process):
                         )
         finally:
             os.umask(old_umask)
+        journal = None
+        if self.opts.get('event_journal', False):
+            journal = EventJournal(self.opts)
+            journal.open()
+        tracker = None
+        if self.opts.get('job_tracker', False) and \
+                not self.opts.get('order_masters', False):
+            tracker = JobTracker(self.opts)
         try:
             while True:
                 # Catch and handle EINTR from when this process is sent
                 # SIGUSR1 gracefully so we don't choke and die horribly
                 try:
-                    package = self.epull_sock.recv()
-                    self.epub_sock.send(package)
+                    batch = []
+                    if tracker is None or self.epull_sock.poll(tracker.wait()):
+                        batch.append(self.epull_sock.recv_multipart())
+                    if journal is not None or tracker is not None:
+                        # Handle whatever else is waiting in one go
+                        while batch and len(batch) < 100:
+                            try:
+                                batch.append(
+                                    self.epull_sock.recv_multipart(zmq.NOBLOCK))
+                            except zmq.ZMQError as exc:
+                                if exc.errno in (errno.EAGAIN, errno.EINTR):
+                                    break
+                                raise
+                    for frames in batch:
+                        if len(frames) == 1:
+                            # Fired as a single message, the tag goes in a
+                            # frame of its own for the subscribers to filter on
+                            mtag, mdata = SaltEvent.split(frames[0])
+                            frames[:] = [mtag, '', mdata]
+                    if tracker is not None:
+                        for frames in list(batch):
+                            try:
+                                batch.extend(tracker.handle(*frames))
+                            except Exception:
+                                log.error(
+                                    'The job tracker failed to follow event '
+                                    '{0}'.format(frames[0]), exc_info=True)
+                        batch.extend(tracker.check())
+                    if journal is not None:
+                        for frames in batch:
+                            frames.append(str(journal.append(*frames)))
+                        # Events are in the journal before anyone sees their
+                        # sequence number
+                        journal.flush()
+                    for frames in batch:
+                        self.epub_sock.send_multipart(frames)
                 except zmq.ZMQError as exc:
                     if exc.errno == errno.EINTR:
                         continue
                     raise exc
         except KeyboardInterrupt:
+            if journal is not None:
+                journal.close()
             if self.epub_sock.closed is False:
                 self.epub_sock.setsockopt(zmq.LINGER, linger)
                 self.epub_sock.close()
@@ -21,6 +21,8 @@ import yaml
 # Import salt libs
 import salt
 import salt.fileclient
+import salt.template
+from salt.utils.cache import RecordingDict, RecordingMapping
 from salt.utils.odict import OrderedDict
 from salt._compat import string_types
 
@@ -41,6 +43,23 @@ class OrderedDictDumper(yaml.Dumper):  # pylint: disable=W0232
 yaml.add_representer(OrderedDict,
                      yaml.representer.SafeRepresenter.represent_dict,
                      Dumper=OrderedDictDumper)
+# The grains, pillar and options of a template whose render is recorded by
+# a render cache
+yaml.add_representer(RecordingDict,
+                     yaml.representer.SafeRepresenter.represent_dict,
+                     Dumper=OrderedDictDumper)
+yaml.add_representer(RecordingMapping,
+                     yaml.representer.SafeRepresenter.represent_dict,
+                     Dumper=OrderedDictDumper)
+
+
+def _json_default(obj):
+    '''
+    Serialize the mappings handed to templates which are not dicts
+    '''
+    if isinstance(obj, RecordingMapping):
+        return obj.record
+    raise TypeError('{0!r} is not JSON serializable'.format(obj))
 
 
 class SaltCacheLoader(BaseLoader):
@@ -113,6 +132,7 @@ class SaltCacheLoader(BaseLoader):
                 with salt.utils.fopen(filepath, 'rb') as ifile:
                     contents = ifile.read().decode(self.encoding)
                     mtime = path.getmtime(filepath)
+                    salt.template.track_file(filepath)
 
                     def uptodate():
                         try:
@@ -354,7 +374,7 @@ class SerializerExtension(Extension, object):
         Ensure that printed mappings are YAML friendly.
         '''
         def explore(data):
-            if isinstance(data, (dict, OrderedDict)):
+            if isinstance(data, (dict, OrderedDict, RecordingMapping)):
                 return PrintableDict([(key, explore(value)) for key, value in data.items()])
             elif isinstance(data, (list, tuple, set)):
                 return data.__class__([explore(value) for value in data])
@@ -362,7 +382,8 @@ class SerializerExtension(Extension, object):
         return explore(data)
 
     def format_json(self, value):
-        return Markup(json.dumps(value, sort_keys=True).strip())
+        return Markup(json.dumps(value, sort_keys=True,
+                                 default=_json_default).strip())
 
     def format_yaml(self, value, flow_style=True):
         return Markup(yaml.dump(value, default_flow_style=flow_style,
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+'''
+Helpers for writing minion returns to the master job cache
+'''
+
+# Import python libs
+import os
+import time
+import errno
+import Queue
+import logging
+import threading
+
+# Import salt libs
+import salt.payload
+import salt.utils
+
+log = logging.getLogger(__name__)
+
+# Queued by flush to have the writer write out its batch right away
+_FLUSH = object()
+
+# The directory of the cachedir the queued returns are spooled to
+PENDING_DIR = 'job_cache_pending'
+
+
+def _pid_alive(pid):
+    '''
+    Return True if a process with the given id is running
+    '''
+    try:
+        os.kill(pid, 0)
+    except OSError as exc:
+        return exc.errno == errno.EPERM
+    return True
+
+
+def _iter_spool(serial, path):
+    '''
+    Yield the returns in a spool file, the file may be gone or still be
+    written to
+    '''
+    try:
+        with salt.utils.fopen(path, 'rb') as fp_:
+            for load in serial.iter_load(fp_):
+                if isinstance(load, dict):
+                    yield load
+    except Exception:
+        # Removed once written, or a return is half way written
+        return
+
+
+def pending_returns(opts, jid):
+    '''
+    Return the returns of a job which the master workers queued for the job
+    cache and did not write yet, in the format of the ``get_jid`` function
+    of the job cache returners
+
+    The job cache returners merge them into what their ``get_jid`` returns,
+    so the returns are seen as soon as they are queued.
+    '''
+    ret = {}
+    spool_dir = os.path.join(opts['cachedir'], PENDING_DIR)
+    try:
+        names = sorted(os.listdir(spool_dir))
+    except OSError:
+        return ret
+    serial = salt.payload.Serial(opts)
+    jid = str(jid)
+    for name in names:
+        for load in _iter_spool(serial, os.path.join(spool_dir, name)):
+            if str(load.get('jid')) != jid or 'id' not in load:
+                continue
+            ret[load['id']] = {'return': load.get('return')}
+            if 'out' in load:
+                ret[load['id']]['out'] = load['out']
+    return ret
+
+
+class ReturnWriter(object):
+    '''
+    Write-behind queue for minion returns headed to the master job cache.
+
+    Returns are queued in memory and written by a background thread in
+    batches of up to ``job_cache_batch_size`` returns, at least every
+    ``job_cache_batch_interval`` seconds. If the job cache returner has a
+    ``returner_batch`` function the whole batch is handed to it in one call,
+    otherwise ``returner`` is called for every return.
+
+    Every queued return is also appended to a spool file of the worker in
+    the ``job_cache_pending`` directory of the cachedir, without syncing it.
+    The ``get_jid`` functions of the job cache returners add the returns in
+    the spool files with :py:func:`pending_returns`, so every process sees a
+    return as soon as it is queued. A spool file is removed once its returns
+    are written, and the spool files left by a worker which died are written
+    out by the next writer started. The master workers flush the queue when
+    they are stopped, with SIGTERM or SIGINT.
+
+    The queue holds at most ``job_cache_queue_size`` returns; once it is full
+    :py:meth:`put` blocks until the writer catches up, so a slow job cache
+    slows the workers down instead of using unbounded memory.
+    '''
+    def __init__(self, opts, returners):
+        self.opts = opts
+        self.returners = returners
+        self.fstr = '{0}.returner'.format(opts['master_job_cache'])
+        self.batch_fstr = '{0}.returner_batch'.format(opts['master_job_cache'])
+        self.batch_size = max(int(opts.get('job_cache_batch_size', 100)), 1)
+        self.interval = float(opts.get('job_cache_batch_interval', 1.0))
+        # The queue is bounded by the slots, so the spool file is appended to
+        # in the order of the queue without blocking on a full queue
+        self.queue = Queue.Queue()
+        self._slots = threading.BoundedSemaphore(
+            int(opts.get('job_cache_queue_size', 10000)))
+        self._thread = None
+        self.serial = salt.payload.Serial(opts)
+        self.spool_dir = os.path.join(opts['cachedir'], PENDING_DIR)
+        self._lock = threading.Lock()
+        # Told apart from the files of an earlier process with the same id
+        self._token = '{0:x}'.format(int(time.time() * 1000000))
+        self._spool = None
+        self._spool_num = 0
+        # The spool files which are not appended to anymore, with the number
+        # of returns which were queued once they are written
+        self._spools = []
+        self._queued = 0
+        self._written = 0
+
+    def start(self):
+        '''
+        Start the background writer thread
+        '''
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run,
+                                        name='ReturnWriter')
+        self._thread.daemon = True
+        self._thread.start()
+        self._recover()
+
+    def put(self, load):
+        '''
+        Queue a return for writing, blocking while the queue is full
+        '''
+        self.start()
+        self._slots.acquire()
+        with self._lock:
+            self._append(load)
+            self.queue.put(load)
+
+    def _append(self, load):
+        '''
+        Append a return to the spool file of the worker
+        '''
+        try:
+            if self._spool is None:
+                if not os.path.isdir(self.spool_dir):
+                    os.makedirs(self.spool_dir)
+                self._spool_num += 1
+                path = os.path.join(
+                    self.spool_dir,
+                    '{0}-{1}-{2}.p'.format(
+                        os.getpid(), self._token, self._spool_num))
+                self._spool = salt.utils.fopen(path, 'ab')
+            self._spool.write(self.serial.dumps_raw(load))
+            self._spool.flush()
+        except Exception as exc:
+            # The return is still written, only later seen by other processes
+            log.error('Unable to spool the return of {0} for job {1}: {2}'
+                      .format(load.get('id'), load.get('jid'), exc))
+        self._queued += 1
+
+    def _rotate(self, written):
+        '''
+        Account for written returns, and remove the spool files whose
+        returns are all written
+        '''
+        with self._lock:
+            self._written += written
+            if self._spool is not None:
+                self._spool.close()
+                self._spools.append((self._spool.name, self._queued))
+                self._spool = None
+            while self._spools and self._spools[0][1] <= self._written:
+                path = self._spools.pop(0)[0]
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _recover(self):
+        '''
+        Queue the returns spooled by master workers which died before they
+        wrote them
+        '''
+        try:
+            names = os.listdir(self.spool_dir)
+        except OSError:
+            return
+        own = '{0}-{1}-'.format(os.getpid(), self._token)
+        for name in names:
+            try:
+                pid = int(name.split('-', 1)[0])
+            except ValueError:
+                continue
+            if name.startswith(own) \
+                    or pid != os.getpid() and _pid_alive(pid):
+                continue
+            path = os.path.join(self.spool_dir, name)
+            claimed = os.path.join(
+                self.spool_dir, '.{0}.{1}'.format(name, os.getpid()))
+            try:
+                # Only one of the writers started gets the file
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            loads = list(_iter_spool(self.serial, claimed))
+            log.info('Writing {0} returns left by master worker {1}'.format(
+                len(loads), pid))
+            for load in loads:
+                self.put(load)
+            os.remove(claimed)
+
+    def flush(self):
+        '''
+        Block until every queued return has been written
+        '''
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(_FLUSH)
+            self.queue.join()
+        else:
+            # No writer thread, write out whatever is left ourselves
+            batch = []
+            while True:
+                try:
+                    load = self.queue.get_nowait()
+                except Queue.Empty:
+                    break
+                if load is _FLUSH:
+                    self.queue.task_done()
+                else:
+                    batch.append(load)
+            if batch:
+                self._write(batch)
+
+    def _run(self):
+        '''
+        Collect batches from the queue and write them
+        '''
+        while True:
+            batch = []
+            load = self.queue.get()
+            deadline = time.time() + self.interval
+            while load is not _FLUSH:
+                batch.append(load)
+                timeout = deadline - time.time()
+                if len(batch) >= self.batch_size or timeout <= 0:
+                    break
+                try:
+                    load = self.queue.get(timeout=timeout)
+                except Queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            if load is _FLUSH:
+                self.queue.task_done()
+
+    def _write(self, batch):
+        '''
+        Write a batch of returns to the job cache
+        '''
+        if self.batch_fstr in self.returners:
+            try:
+                self.returners[self.batch_fstr](batch)
+            except Exception:
+                log.critical(
+                    'The job cache returner {0!r} failed to store {1} returns'
+                    .format(self.opts['master_job_cache'], len(batch)),
+                    exc_info=True
+                )
+        else:
+            for load in batch:
+                try:
+                    self.returners[self.fstr](load)
+                except Exception:
+                    log.critical(
+                        'The job cache returner {0!r} failed to store the '
+                        'return of {1} for job {2}'.format(
+                            self.opts['master_job_cache'],
+                            load['id'],
+                            load['jid']
+                        ),
+                        exc_info=True
+                    )
+        self._rotate(len(batch))
+        for _ in batch:
+            self._slots.release()
+            self.queue.task_done()
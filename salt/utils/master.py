@@ -17,6 +17,7 @@ import salt.client
 import salt.pillar
 import salt.utils
 import salt.payload
+import salt.utils.minions
 from salt.exceptions import SaltException
 
 log = logging.getLogger(__name__)
@@ -368,6 +369,9 @@ class MasterPillarUtil(object):
                 elif clear_grains and minion_pillar:
                     with salt.utils.fopen(data_file, 'w+b') as fp_:
                         fp_.write(self.serial.dumps({'pillar': minion_pillar}))
+                if clear_pillar or clear_grains:
+                    salt.utils.minions.minion_data_changed(
+                        self.opts, minion_id)
                 if clear_mine:
                     # Delete the whole mine file
                     os.remove(os.path.join(mine_file))
@@ -6,13 +6,15 @@ expected to return
 
 # Import python libs
 import os
-import glob
 import re
+import time
+import fnmatch
 import logging
 
 # Import salt libs
 import salt.payload
 import salt.utils
+import salt.utils.network
 from salt.exceptions import CommandExecutionError
 
 HAS_RANGE = False
@@ -24,6 +26,22 @@ except ImportError:
 
 log = logging.getLogger(__name__)
 
+# Name of the file in the minion data cache dir which records the ids of
+# minions whose cached data changed, and the size at which it is rotated
+INDEX_JOURNAL = '.index'
+INDEX_JOURNAL_MAX = 1048576
+
+# Seconds after its mtime during which a file may still change without its
+# stat changing, on filesystems with a coarse mtime
+INDEX_RACY_WINDOW = 2
+
+# Process wide minion indexes, see get_minion_index()
+_INDEXES = {}
+
+# Compiled compound targets, see compile_compound()
+_COMPOUND_CACHE = {}
+COMPOUND_CACHE_MAX = 1000
+
 
 def get_minion_data(minion, opts):
     '''
@@ -92,6 +110,271 @@ def nodegroup_comp(group, nodegroups, skip=None):
         return ret[:-3]
 
 
+def compile_compound(expr):
+    '''
+    Parse a compound target into a tree of ``('and', left, right)``,
+    ``('or', left, right)``, ``('not', node)`` and ``('leaf', matcher, expr)``
+    tuples, where ``matcher`` is the single letter matcher type or ``None`` for
+    a glob. Returns ``None`` if the expression is invalid.
+
+    Compiled expressions are cached, so repeated targets are only parsed once.
+    '''
+    if expr in _COMPOUND_CACHE:
+        return _COMPOUND_CACHE[expr]
+    tokens = []
+    for match in expr.split():
+        if match == 'not':
+            if not tokens or tokens[-1] == '(':
+                # seq start with oper, fail
+                tokens = None
+                break
+            if tokens[-1] not in ('and', 'or', 'not'):
+                # "foo not bar" means "foo and not bar"
+                tokens.append('and')
+        tokens.append(match)
+    tree = None
+    if tokens:
+        try:
+            tree, pos = _parse_compound(tokens, 0)
+            if pos != len(tokens):
+                tree = None
+        except (IndexError, ValueError):
+            tree = None
+    if len(_COMPOUND_CACHE) >= COMPOUND_CACHE_MAX:
+        _COMPOUND_CACHE.clear()
+    _COMPOUND_CACHE[expr] = tree
+    return tree
+
+
+def _parse_compound(tokens, pos):
+    '''
+    Parse an ``or`` expression starting at ``pos``, returns the tree and the
+    position of the first unconsumed token
+    '''
+    left, pos = _parse_compound_and(tokens, pos)
+    while pos < len(tokens) and tokens[pos] == 'or':
+        right, pos = _parse_compound_and(tokens, pos + 1)
+        left = ('or', left, right)
+    return left, pos
+
+
+def _parse_compound_and(tokens, pos):
+    '''
+    Parse an ``and`` expression starting at ``pos``
+    '''
+    left, pos = _parse_compound_not(tokens, pos)
+    while pos < len(tokens) and tokens[pos] == 'and':
+        right, pos = _parse_compound_not(tokens, pos + 1)
+        left = ('and', left, right)
+    return left, pos
+
+
+def _parse_compound_not(tokens, pos):
+    '''
+    Parse a negation, a parenthesized expression or a single target
+    '''
+    match = tokens[pos]
+    if match == 'not':
+        node, pos = _parse_compound_not(tokens, pos + 1)
+        return ('not', node), pos
+    if match == '(':
+        node, pos = _parse_compound(tokens, pos + 1)
+        if tokens[pos] != ')':
+            raise ValueError('Unbalanced parenthesis')
+        return node, pos + 1
+    if match in ('and', 'or', ')'):
+        raise ValueError('Unexpected operator {0!r}'.format(match))
+    if '@' in match and match[1] == '@':
+        comps = match.split('@')
+        return ('leaf', comps[0], '@'.join(comps[1:])), pos + 1
+    # The match is not explicitly defined, evaluate as a glob
+    return ('leaf', None, match), pos + 1
+
+
+def _stamp(path):
+    '''
+    Return what tells whether a file or directory changed, None if a change
+    may still go unnoticed because it was modified just now
+    '''
+    stat = os.stat(path)
+    if time.time() - stat.st_mtime < INDEX_RACY_WINDOW:
+        return None
+    return (stat.st_mtime, stat.st_size, stat.st_ino, stat.st_ctime)
+
+
+def _compound_leaves(tree):
+    '''
+    Yield the leaf nodes of a compiled compound target
+    '''
+    if tree[0] == 'leaf':
+        yield tree
+    else:
+        for node in tree[1:]:
+            for leaf in _compound_leaves(node):
+                yield leaf
+
+
+class MinionIndex(object):
+    '''
+    In-memory index of the accepted minion ids and their cached grains and
+    pillar data.
+
+    The index is revalidated with a couple of stat calls per lookup instead of
+    rescanning the pki and cache directories. Accepting or deleting a key
+    changes the mtime of the accepted keys directory, and writers of the
+    minion data cache append the minion id to a small journal file (see
+    :py:func:`minion_data_changed`), so only the changed entries are reloaded.
+    '''
+    def __init__(self, opts, acc='minions'):
+        self.opts = opts
+        self.serial = salt.payload.Serial(opts)
+        self.pki_dir = os.path.join(opts['pki_dir'], acc)
+        self.cdir = os.path.join(opts['cachedir'], 'minions')
+        self.journal = os.path.join(self.cdir, INDEX_JOURNAL)
+        self._ids = set()
+        self._ids_mtime = None
+        self._data = {}
+        self._data_mtime = {}
+        self._journal_pos = None
+
+    def refresh_ids(self):
+        '''
+        Reread the accepted minion ids if the keys directory has changed
+        '''
+        try:
+            mtime = _stamp(self.pki_dir)
+        except OSError:
+            self._ids = set()
+            self._ids_mtime = None
+            return False
+        if mtime is not None and mtime == self._ids_mtime:
+            return False
+        ids = set(os.listdir(self.pki_dir))
+        for id_ in self._ids.difference(ids):
+            self._data.pop(id_, None)
+            self._data_mtime.pop(id_, None)
+        self._ids = ids
+        self._ids_mtime = mtime
+        return True
+
+    def refresh_data(self, ids_changed=False):
+        '''
+        Bring the cached grains and pillar data up to date, only rereading the
+        data files of minions which were recorded as changed
+        '''
+        try:
+            stat = os.stat(self.journal)
+            pos = (stat.st_ino, stat.st_size)
+        except OSError:
+            pos = (None, 0)
+        if self._journal_pos is None or pos[0] != self._journal_pos[0] \
+                or pos[1] < self._journal_pos[1]:
+            # First load or the journal was rotated, check every minion
+            self._journal_pos = pos
+            for id_ in self._ids:
+                self._load_data(id_)
+            return
+        changed = set()
+        if pos[1] > self._journal_pos[1]:
+            try:
+                with salt.utils.fopen(self.journal, 'rb') as fp_:
+                    fp_.seek(self._journal_pos[1])
+                    chunk = fp_.read(pos[1] - self._journal_pos[1])
+            except (IOError, OSError):
+                chunk = ''
+            # Only consume complete lines, a writer may still be appending
+            chunk = chunk[:chunk.rfind('\n') + 1]
+            changed.update(line for line in chunk.splitlines() if line)
+            self._journal_pos = (pos[0], self._journal_pos[1] + len(chunk))
+        # The journal says the data of these minions changed, even if the
+        # data files look the same
+        for id_ in changed.intersection(self._ids):
+            self._load_data(id_, force=True)
+        if ids_changed:
+            for id_ in self._ids.difference(self._data_mtime):
+                self._load_data(id_)
+
+    def _load_data(self, id_, force=False):
+        '''
+        Load the data.p file for a single minion if it changed on disk
+        '''
+        datap = os.path.join(self.cdir, id_, 'data.p')
+        try:
+            mtime = _stamp(datap)
+        except OSError:
+            self._data.pop(id_, None)
+            self._data_mtime[id_] = None
+            return
+        if not force and mtime is not None \
+                and self._data_mtime.get(id_) == mtime and id_ in self._data:
+            return
+        try:
+            with salt.utils.fopen(datap, 'rb') as fp_:
+                self._data[id_] = self.serial.load(fp_)
+        except (IOError, OSError):
+            self._data.pop(id_, None)
+        except Exception as exc:
+            log.error(
+                'Failed to load cached data for minion {0}: {1}'.format(
+                    id_, exc
+                )
+            )
+            self._data.pop(id_, None)
+        self._data_mtime[id_] = mtime
+
+    def ids(self):
+        '''
+        Return the set of accepted minion ids
+        '''
+        self.refresh_ids()
+        return set(self._ids)
+
+    def data(self, key):
+        '''
+        Return a dict mapping the accepted minions which have cached data to
+        the named item of that data, either ``grains`` or ``pillar``
+        '''
+        ids_changed = self.refresh_ids()
+        self.refresh_data(ids_changed)
+        return dict(
+            (id_, data.get(key)) for id_, data in self._data.iteritems()
+        )
+
+
+def get_minion_index(opts, acc='minions'):
+    '''
+    Return the process wide :py:class:`MinionIndex` for the given master
+    configuration
+    '''
+    key = (opts['pki_dir'], opts['cachedir'], acc)
+    if key not in _INDEXES:
+        _INDEXES[key] = MinionIndex(opts, acc)
+    return _INDEXES[key]
+
+
+def minion_data_changed(opts, minion_id):
+    '''
+    Record that the cached grains/pillar data of a minion was written or
+    removed so that minion indexes in every master process pick up the change
+    '''
+    journal = os.path.join(opts['cachedir'], 'minions', INDEX_JOURNAL)
+    try:
+        with salt.utils.fopen(journal, 'a') as fp_:
+            fp_.write('{0}\n'.format(minion_id))
+            size = fp_.tell()
+        if size > INDEX_JOURNAL_MAX:
+            # Replace the journal with a fresh file, readers notice the new
+            # inode and revalidate every minion once
+            tmp = salt.utils.mkstemp(dir=os.path.dirname(journal))
+            os.rename(tmp, journal)
+    except (IOError, OSError) as exc:
+        log.error(
+            'Unable to update the minion index journal {0}: {1}'.format(
+                journal, exc
+            )
+        )
+
+
 class CkMinions(object):
     '''
     Used to check what minions should respond from a target
@@ -103,28 +386,17 @@ class CkMinions(object):
             self.acc = 'minions'
         else:
             self.acc = 'accepted'
+        self.index = get_minion_index(opts, self.acc)
 
     def _check_glob_minions(self, expr):
         '''
         Return the minions found by looking via globs
         '''
-        cwd = os.getcwd()
-        pki_dir = os.path.join(self.opts['pki_dir'], self.acc)
-
-        # If there is no directory return an empty list
-        if os.path.isdir(pki_dir) is False:
-            return []
-
-        os.chdir(pki_dir)
-        ret = set(glob.glob(expr))
-        try:
-            os.chdir(cwd)
-        except OSError as exc:
-            if exc.errno != 13:
-                # If it's not a permission denied, perhaps we're running with
-                # sudo
-                raise
-        return list(ret)
+        ids = self.index.ids()
+        if not expr.startswith('.'):
+            # Mimic glob.glob, which skips hidden files
+            ids = [id_ for id_ in ids if not id_.startswith('.')]
+        return fnmatch.filter(ids, expr)
 
     def _check_list_minions(self, expr):
         '''
@@ -132,139 +404,87 @@ class CkMinions(object):
         '''
         if isinstance(expr, str):
             expr = [m for m in expr.split(',') if m]
-        ret = []
-        for fn_ in os.listdir(os.path.join(self.opts['pki_dir'], self.acc)):
-            if fn_ in expr:
-                if fn_ not in ret:
-                    ret.append(fn_)
-        return ret
+        return list(self.index.ids().intersection(expr))
 
     def _check_pcre_minions(self, expr):
         '''
         Return the minions found by looking via regular expressions
         '''
-        cwd = os.getcwd()
-        os.chdir(os.path.join(self.opts['pki_dir'], self.acc))
         reg = re.compile(expr)
-        ret = [fn_ for fn_ in os.listdir('.') if reg.match(fn_)]
-        os.chdir(cwd)
-        return ret
+        return [fn_ for fn_ in self.index.ids() if reg.match(fn_)]
 
-    def _check_grain_minions(self, expr):
+    def _check_cache_minions(self, expr, key, matcher):
         '''
-        Return the minions found by looking via grains
+        Return the accepted minions, minus the ones with cached ``key`` data
+        for which ``matcher(data, expr)`` is false. Minions without cached
+        data are always kept.
         '''
-        minions = set(
-            os.listdir(os.path.join(self.opts['pki_dir'], self.acc))
-        )
+        minions = self.index.ids()
         if self.opts.get('minion_data_cache', False):
-            cdir = os.path.join(self.opts['cachedir'], 'minions')
-            if not os.path.isdir(cdir):
-                return list(minions)
-            for id_ in os.listdir(cdir):
-                if id_ not in minions:
-                    continue
-                datap = os.path.join(cdir, id_, 'data.p')
-                try:
-                    with salt.utils.fopen(datap, 'rb') as fp_:
-                        grains = self.serial.load(fp_).get('grains')
-                except (IOError, OSError):
-                    continue
-                if not salt.utils.subdict_match(grains, expr):
+            for id_, data in self.index.data(key).iteritems():
+                if id_ in minions and not matcher(data, expr):
                     minions.remove(id_)
         return list(minions)
 
+    def _check_grain_minions(self, expr):
+        '''
+        Return the minions found by looking via grains
+        '''
+        return self._check_cache_minions(
+                expr,
+                'grains',
+                salt.utils.subdict_match)
+
     def _check_grain_pcre_minions(self, expr):
         '''
         Return the minions found by looking via grains with PCRE
         '''
-        minions = set(
-            os.listdir(os.path.join(self.opts['pki_dir'], self.acc))
-        )
-        if self.opts.get('minion_data_cache', False):
-            cdir = os.path.join(self.opts['cachedir'], 'minions')
-            if not os.path.isdir(cdir):
-                return list(minions)
-            for id_ in os.listdir(cdir):
-                if id_ not in minions:
-                    continue
-                datap = os.path.join(cdir, id_, 'data.p')
-                try:
-                    with salt.utils.fopen(datap, 'rb') as fp_:
-                        grains = self.serial.load(fp_).get('grains')
-                except (IOError, OSError):
-                    continue
-                if not salt.utils.subdict_match(grains, expr,
-                                                delim=':', regex_match=True):
-                    minions.remove(id_)
-        return list(minions)
+        return self._check_cache_minions(
+                expr,
+                'grains',
+                lambda data, expr: salt.utils.subdict_match(
+                    data, expr, delim=':', regex_match=True))
 
     def _check_pillar_minions(self, expr):
         '''
         Return the minions found by looking via pillar
         '''
-        minions = set(
-            os.listdir(os.path.join(self.opts['pki_dir'], self.acc))
-        )
-        if self.opts.get('minion_data_cache', False):
-            cdir = os.path.join(self.opts['cachedir'], 'minions')
-            if not os.path.isdir(cdir):
-                return list(minions)
-            for id_ in os.listdir(cdir):
-                if id_ not in minions:
-                    continue
-                datap = os.path.join(cdir, id_, 'data.p')
-                try:
-                    with salt.utils.fopen(datap, 'rb') as fp_:
-                        pillar = self.serial.load(fp_).get('pillar')
-                except (IOError, OSError):
-                    continue
-                if not salt.utils.subdict_match(pillar, expr):
-                    minions.remove(id_)
-        return list(minions)
+        return self._check_cache_minions(
+                expr,
+                'pillar',
+                salt.utils.subdict_match)
 
     def _check_ipcidr_minions(self, expr):
         '''
         Return the minions found by looking via ipcidr
         '''
-        minions = set(
-            os.listdir(os.path.join(self.opts['pki_dir'], self.acc))
-        )
-        if self.opts.get('minion_data_cache', False):
-            cdir = os.path.join(self.opts['cachedir'], 'minions')
-            if not os.path.isdir(cdir):
-                return list(minions)
-            for id_ in os.listdir(cdir):
-                if id_ not in minions:
-                    continue
-                datap = os.path.join(cdir, id_, 'data.p')
-                try:
-                    with salt.utils.fopen(datap, 'rb') as fp_:
-                        grains = self.serial.load(fp_).get('grains')
-                except (IOError, OSError):
-                    continue
-                num_parts = len(expr.split('/'))
-                if num_parts > 2:
-                    # Target is not valid CIDR, no minions match
-                    return []
-                elif num_parts == 2:
-                    # Target is CIDR
-                    if not salt.utils.network.in_subnet(
-                            expr,
-                            addrs=grains.get('ipv4', [])):
-                        minions.remove(id_)
-                else:
-                    # Target is an IPv4 address
-                    import socket
-                    try:
-                        socket.inet_aton(expr)
-                    except socket.error:
-                        # Not a valid IPv4 address, no minions match
-                        return []
-                    else:
-                        if expr not in grains.get('ipv4', []):
-                            minions.remove(id_)
-        return list(minions)
+        num_parts = len(expr.split('/'))
+        if num_parts > 2:
+            # Target is not valid CIDR, no minions match
+            matcher = None
+        elif num_parts == 2:
+            # Target is CIDR
+            def matcher(grains, expr):
+                return salt.utils.network.in_subnet(
+                        expr,
+                        addrs=grains.get('ipv4', []))
+        else:
+            # Target is an IPv4 address
+            import socket
+            try:
+                socket.inet_aton(expr)
+            except socket.error:
+                # Not a valid IPv4 address, no minions match
+                matcher = None
+            else:
+                def matcher(grains, expr):
+                    return expr in grains.get('ipv4', [])
+        if matcher is None:
+            if self.opts.get('minion_data_cache', False) \
+                    and self.index.data('grains'):
+                return []
+            return list(self.index.ids())
+        return self._check_cache_minions(expr, 'grains', matcher)
 
     def _check_range_minions(self, expr):
         '''
@@ -275,132 +495,54 @@ class CkMinions(object):
                 'Range matcher unavailble (unable to import seco.range, '
                 'module most likely not installed)'
             )
-        minions = set(
-            os.listdir(os.path.join(self.opts['pki_dir'], self.acc))
-        )
-        if self.opts.get('minion_data_cache', False):
-            cdir = os.path.join(self.opts['cachedir'], 'minions')
-            if not os.path.isdir(cdir):
-                return list(minions)
-            for id_ in os.listdir(cdir):
-                if id_ not in minions:
-                    continue
-                datap = os.path.join(cdir, id_, 'data.p')
-                try:
-                    with salt.utils.fopen(datap, 'rb') as fp_:
-                        grains = self.serial.load(fp_).get('grains')
-                except (IOError, OSError):
-                    continue
-                range_ = seco.range.Range(self.opts['range_server'])
-                try:
-                    if grains.get('fqdn', '') not in range_.expand(expr):
-                        minions.remove(id_)
-                except seco.range.RangeException as exc:
-                    log.debug(
-                        'Range exception in compound match: {0}'.format(exc)
-                    )
-                    minions.remove(id_)
-        return list(minions)
+        range_ = seco.range.Range(self.opts['range_server'])
+
+        def matcher(grains, expr):
+            try:
+                return grains.get('fqdn', '') in range_.expand(expr)
+            except seco.range.RangeException as exc:
+                log.debug(
+                    'Range exception in compound match: {0}'.format(exc)
+                )
+                return False
+        return self._check_cache_minions(expr, 'grains', matcher)
 
     def _check_compound_minions(self, expr):
         '''
         Return the minions found by looking via compound matcher
         '''
-        minions = set(
-            os.listdir(os.path.join(self.opts['pki_dir'], self.acc))
-        )
-        if self.opts.get('minion_data_cache', False):
-            ref = {'G': self._check_grain_minions,
-                   'P': self._check_grain_pcre_minions,
-                   'I': self._check_pillar_minions,
-                   'L': self._check_list_minions,
-                   'S': self._check_ipcidr_minions,
-                   'E': self._check_pcre_minions,
-                   'R': self._all_minions}
-            results = []
-            unmatched = []
-            opers = ['and', 'or', 'not', '(', ')']
-            tokens = expr.split()
-            for match in tokens:
-                # Try to match tokens from the compound target, first by using
-                # the 'G, X, I, L, S, E' matcher types, then by hostname glob.
-                if '@' in match and match[1] == '@':
-                    comps = match.split('@')
-                    matcher = ref.get(comps[0])
-                    if not matcher:
-                        # If an unknown matcher is called at any time, fail out
-                        return []
-                    if unmatched and unmatched[-1] == '-':
-                        results.append(str(set(matcher('@'.join(comps[1:])))))
-                        results.append(')')
-                        unmatched.pop()
-                    else:
-                        results.append(str(set(matcher('@'.join(comps[1:])))))
-                elif match in opers:
-                    # We didn't match a target, so append a boolean operator or
-                    # subexpression
-                    if results:
-                        if match == 'not':
-                            if results[-1] == '&':
-                                pass
-                            elif results[-1] == '|':
-                                pass
-                            else:
-                                results.append('&')
-                            results.append('(')
-                            results.append(str(set(minions)))
-                            results.append('-')
-                            unmatched.append('-')
-                        elif match == 'and':
-                            results.append('&')
-                        elif match == 'or':
-                            results.append('|')
-                        elif match == '(':
-                            results.append(match)
-                            unmatched.append(match)
-                        elif match == ')':
-                            if not unmatched or unmatched[-1] != '(':
-                                log.error('Invalid compound expr (unexpected '
-                                          'right parenthesis): {0}'
-                                          .format(expr))
-                                return []
-                            results.append(match)
-                            unmatched.pop()
-                            if unmatched and unmatched[-1] == '-':
-                                results.append(')')
-                                unmatched.pop()
-                        else:  # Won't get here, unless oper is added
-                            log.error('Unhandled oper in compound expr: {0}'
-                                      .format(expr))
-                            return []
-                    else:
-                        # seq start with oper, fail
-                        if match == '(':
-                            results.append(match)
-                            unmatched.append(match)
-                        else:
-                            return []
-                else:
-                    # The match is not explicitly defined, evaluate as a glob
-                    if unmatched and unmatched[-1] == '-':
-                        results.append(
-                                str(set(self._check_glob_minions(match))))
-                        results.append(')')
-                        unmatched.pop()
-                    else:
-                        results.append(
-                                str(set(self._check_glob_minions(match))))
-            for token in unmatched:
-                results.append(')')
-            results = ' '.join(results)
-            log.debug('Evaluating final compound matching expr: {0}'
-                      .format(results))
-            try:
-                return list(eval(results))  # pylint: disable=W0123
-            except Exception:
-                log.error('Invalid compound target: {0}'.format(expr))
-                return []
-        return list(minions)
+        minions = self.index.ids()
+        if not self.opts.get('minion_data_cache', False):
+            return list(minions)
+        tree = compile_compound(expr)
+        if tree is None:
+            log.error('Invalid compound target: {0}'.format(expr))
+            return []
+        ref = {'G': self._check_grain_minions,
+               'P': self._check_grain_pcre_minions,
+               'I': self._check_pillar_minions,
+               'L': self._check_list_minions,
+               'S': self._check_ipcidr_minions,
+               'E': self._check_pcre_minions,
+               'R': self._all_minions,
+               None: self._check_glob_minions}
+        leaves = {}
+
+        def _eval(node):
+            if node[0] == 'leaf':
+                if node not in leaves:
+                    leaves[node] = set(ref[node[1]](node[2]))
+                return leaves[node]
+            if node[0] == 'not':
+                return minions.difference(_eval(node[1]))
+            if node[0] == 'and':
+                return _eval(node[1]).intersection(_eval(node[2]))
+            return _eval(node[1]).union(_eval(node[2]))
+
+        if any(node[1] not in ref for node in _compound_leaves(tree)):
+            # If an unknown matcher is called at any time, fail out
+            return []
+        return list(_eval(tree))
 
     def connected_ids(self, subset=None, show_ipv4=False):
         '''
@@ -441,7 +583,7 @@ class CkMinions(object):
         '''
         Return a list of all minions that have auth'd
         '''
-        return os.listdir(os.path.join(self.opts['pki_dir'], self.acc))
+        return list(self.index.ids())
 
     def check_minions(self, expr, expr_form='glob'):
         '''
@@ -7,10 +7,12 @@ from __future__ import absolute_import
 
 # Import python libs
 import codecs
+import functools
 import os
 import imp
 import logging
 import tempfile
+import threading
 import traceback
 import sys
 
@@ -20,6 +22,8 @@ import jinja2.ext
 
 # Import salt libs
 import salt.utils
+import salt.template
+from salt.utils.cache import RecordingDict, RecordingMapping
 from salt.exceptions import (
     SaltRenderError, CommandExecutionError, SaltInvocationError
 )
@@ -39,6 +43,15 @@ TEMPLATE_DIRNAME = os.path.join(saltpath[0], 'templates')
 SLS_ENCODING = 'utf-8'  # this one has no BOM.
 SLS_ENCODER = codecs.getencoder(SLS_ENCODING)
 
+# The jinja code compiled from the sources of the last templates rendered
+JINJA_CODE_CACHE_SIZE = 256
+_JINJA_CODE = OrderedDict()
+_JINJA_CODE_LOCK = threading.Lock()
+
+# The jinja filters and globals returning random values, a render using them
+# can not be cached
+JINJA_VOLATILE = ('random', 'lipsum')
+
 
 def wrap_tmpl_func(render_str):
 
@@ -208,6 +221,47 @@ def _get_jinja_error(trace, context=None):
     return line, out
 
 
+def _jinja_template(jinja_env, tmplstr):
+    '''
+    Return the template of a source, reusing the code compiled for the
+    source when it was last seen with the same whitespace options
+    '''
+    key = (tmplstr,
+           jinja_env.trim_blocks,
+           getattr(jinja_env, 'lstrip_blocks', False))
+    with _JINJA_CODE_LOCK:
+        code = _JINJA_CODE.pop(key, None)
+    if code is None:
+        code = jinja_env.compile(tmplstr)
+    with _JINJA_CODE_LOCK:
+        _JINJA_CODE[key] = code
+        while len(_JINJA_CODE) > JINJA_CODE_CACHE_SIZE:
+            _JINJA_CODE.popitem(last=False)
+    return jinja_env.template_class.from_code(
+        jinja_env, code, jinja_env.make_globals(None))
+
+
+def _jinja_volatile(name, func):
+    '''
+    Wrap a jinja filter or global to tell the render cache it was used
+    '''
+    @functools.wraps(func)
+    def volatile(*args, **kwargs):
+        salt.template.track_volatile(name)
+        return func(*args, **kwargs)
+    return volatile
+
+
+def _jinja_strftime(date=None, format='%Y-%m-%d'):
+    '''
+    The strftime filter, the dates it gets from the current time or from a
+    relative date string like ``tomorrow`` can not be cached
+    '''
+    if date is None or isinstance(date, string_types):
+        salt.template.track_volatile('strftime')
+    return salt.utils.date_format(date, format)
+
+
 def render_jinja_tmpl(tmplstr, context, tmplpath=None):
     opts = context['opts']
     saltenv = context['saltenv']
@@ -261,14 +315,23 @@ def render_jinja_tmpl(tmplstr, context, tmplpath=None):
         jinja_env = jinja2.Environment(undefined=jinja2.StrictUndefined,
                                        **env_args)
 
-    jinja_env.filters['strftime'] = salt.utils.date_format
+    jinja_env.filters['strftime'] = _jinja_strftime
     jinja_env.filters['sequence'] = ensure_sequence_filter
 
     jinja_env.globals['odict'] = OrderedDict
     jinja_env.globals['show_full_context'] = show_full_context
 
+    for name in JINJA_VOLATILE:
+        for funcs in (jinja_env.filters, jinja_env.globals):
+            if name in funcs:
+                funcs[name] = _jinja_volatile(name, funcs[name])
+
     unicode_context = {}
     for key, value in context.iteritems():
+        if isinstance(value, RecordingDict):
+            # Record the copies the template makes, see RecordingMapping
+            unicode_context[key] = RecordingMapping(value)
+            continue
         if not isinstance(value, string_types):
             unicode_context[key] = value
             continue
@@ -281,7 +344,7 @@ def render_jinja_tmpl(tmplstr, context, tmplpath=None):
             unicode_context[key] = unicode(value, 'utf-8')
 
     try:
-        template = jinja_env.from_string(tmplstr)
+        template = _jinja_template(jinja_env, tmplstr)
         template.globals.update(unicode_context)
         output = template.render(**unicode_context)
     except jinja2.exceptions.TemplateSyntaxError as exc:
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+'''
+Measure how fast the ciphers of the AES session encrypt and decrypt messages
+of a few sizes, in MB/s:
+
+    python tests/cryptbench.py -n 50
+'''
+
+# Import python libs
+from __future__ import print_function
+import optparse
+import os
+import timeit
+
+# Import salt libs
+import salt.crypt
+
+SIZES = (1024, 65536, 1048576, 8388608)
+
+
+def parse():
+    '''
+    Parse the cli options
+    '''
+    parser = optparse.OptionParser()
+    parser.add_option(
+        '-n',
+        '--number',
+        dest='number',
+        default=50,
+        type='int',
+        help='How many times every message is encrypted and decrypted')
+    options, _ = parser.parse_args()
+    return options
+
+
+def main():
+    options = parse()
+    key = salt.crypt.Crypticle.generate_key_string()
+    ciphers = ['aes-cbc-hmac']
+    if salt.crypt.HAS_AESGCM:
+        ciphers.append('aes-gcm')
+    else:
+        print('cryptography is not installed, aes-gcm is not measured')
+    print('{0:<14} {1:>10} {2:>12} {3:>12}'.format(
+        'cipher', 'bytes', 'encrypt MB/s', 'decrypt MB/s'))
+    for cipher in ciphers:
+        crypticle = salt.crypt.Crypticle({}, key, cipher=cipher)
+        for size in SIZES:
+            data = os.urandom(size)
+            msg = crypticle.encrypt(data)
+            number = max(options.number * 65536 // size, 1)
+            enc = timeit.timeit(lambda: crypticle.encrypt(data), number=number)
+            dec = timeit.timeit(lambda: crypticle.decrypt(msg), number=number)
+            megs = float(size) * number / 1048576
+            print('{0:<14} {1:>10} {2:>12.1f} {3:>12.1f}'.format(
+                cipher, size, megs / enc, megs / dec))
+
+
+if __name__ == '__main__':
+    main()
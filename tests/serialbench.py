@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+'''
+Compare the ways salt.payload can serialize a highstate return, run with the
+number of states in the return and how many times each way is timed:
+
+    python tests/serialbench.py -s 500 -n 200
+'''
+
+# Import python libs
+from __future__ import print_function
+import optparse
+import tempfile
+import timeit
+
+# Import salt libs
+import salt.payload
+
+# Import third party libs
+import msgpack
+
+
+def parse():
+    '''
+    Parse the cli options
+    '''
+    parser = optparse.OptionParser()
+    parser.add_option(
+        '-s',
+        '--states',
+        dest='states',
+        default=500,
+        type='int',
+        help='The number of states in the highstate return')
+    parser.add_option(
+        '-n',
+        '--number',
+        dest='number',
+        default=200,
+        type='int',
+        help='How many times every way is timed')
+    options, _ = parser.parse_args()
+    return options
+
+
+def highstate_return(states):
+    '''
+    Return the return load of a highstate run of the given number of states
+    '''
+    ret = {}
+    for num in range(states):
+        name = '/etc/app/conf.d/{0}.conf'.format(num)
+        changes = {}
+        if num % 10 == 0:
+            changes = {'diff': '--- \n+++ \n@@ -1 +1 @@\n-old\n+new {0}\n'
+                               .format(num)}
+        ret['file_|-app_conf_{0}_|-{1}_|-managed'.format(num, name)] = {
+            'name': name,
+            'result': True,
+            'changes': changes,
+            'comment': 'File {0} is in the correct state'.format(name),
+            '__run_num__': num,
+            'duration': 12.5,
+            'start_time': '13:45:18.235862',
+            '__sls__': 'app.config',
+        }
+    return {'cmd': '_return',
+            'id': 'web1.example.com',
+            'jid': '20141218134518235862',
+            'fun': 'state.highstate',
+            'fun_args': [],
+            'retcode': 0,
+            'success': True,
+            'return': ret}
+
+
+def main():
+    options = parse()
+    load = highstate_return(options.states)
+    serial = salt.payload.Serial('msgpack')
+    packed = serial.dumps(load)
+    packed_ret = serial.dumps(load['return'])
+    raw_load = dict(load, **{'return': salt.payload.Raw(packed_ret)})
+    unpacker = msgpack.Unpacker(use_list=True)
+    stream = tempfile.TemporaryFile()
+    for _ in range(10):
+        stream.write(packed)
+
+    def unpacker_loads():
+        unpacker.feed(packed)
+        return unpacker.unpack()
+
+    def stream_loads():
+        stream.seek(0)
+        return list(serial.iter_load(stream))
+
+    def whole_loads():
+        stream.seek(0)
+        data = stream.read()
+        return [msgpack.loads(data[ind * len(packed):(ind + 1) * len(packed)])
+                for ind in range(10)]
+
+    cases = [
+        ('msgpack.dumps', lambda: msgpack.dumps(load)),
+        ('Serial.dumps, reused Packer', lambda: serial.dumps(load)),
+        ('dumps of a deserialized return',
+         lambda: serial.dumps(dict(load, **{'return':
+                                             serial.loads(packed_ret)}))),
+        ('dumps of a Raw return', lambda: serial.dumps_raw(raw_load)),
+        ('msgpack.loads', lambda: msgpack.loads(packed, use_list=True)),
+        ('Serial.loads', lambda: serial.loads(packed)),
+        ('reused Unpacker', unpacker_loads),
+        ('10 returns, whole file', whole_loads),
+        ('10 returns, Serial.iter_load', stream_loads),
+    ]
+    print('{0} states, {1} bytes serialized, {2} runs'.format(
+        options.states, len(packed), options.number))
+    for name, func in cases:
+        secs = timeit.timeit(func, number=options.number)
+        print('{0:<35} {1:>10.1f} us'.format(
+            name, secs / options.number * 1000000))
+
+
+if __name__ == '__main__':
+    main()
@@ -55,6 +55,35 @@ class LocalClientTestCase(TestCase,
             cmd_cli_mock.assert_called_with(['minion1', 'minion2'], 'first.func', (), kwarg=None, expr_form='list',
                                                 ret=['first.func', 'second.func'])
 
+    def test_run_job_subscriptions(self):
+        local_client = client.LocalClient(self.get_config_file_path('master'))
+        get_load = '{0}.get_load'.format(local_client.opts['master_job_cache'])
+        pubs = [{'jid': '1234', 'minions': ['m1']},
+                {'jid': '5678', 'minions': ['m1']}]
+        with patch.object(local_client, 'pub', side_effect=pubs), \
+                patch.dict(local_client.returners, {get_load: lambda jid: {'jid': jid}}), \
+                patch.object(local_client.event, 'get_event',
+                             side_effect=[{'id': 'm1', 'return': True},
+                                          {'id': 'm1', 'return': True}]):
+            pub_data = local_client.run_job('m1', 'test.ping')
+            self.assertEqual(local_client.event.subscriptions, set(['1234']))
+            list(local_client.get_iter_returns(pub_data['jid'], pub_data['minions']))
+            self.assertEqual(local_client.event.subscriptions, set(['']))
+
+            # The second job does not keep the first one subscribed
+            pub_data = local_client.run_job('m1', 'test.ping')
+            self.assertEqual(local_client.event.subscriptions, set(['5678']))
+            list(local_client.get_cli_event_returns(pub_data['jid'], pub_data['minions']))
+            self.assertEqual(local_client.event.subscriptions, set(['']))
+
+    def test_cmd_async_subscriptions(self):
+        local_client = client.LocalClient(self.get_config_file_path('master'))
+        with patch.object(local_client, 'pub',
+                          return_value={'jid': '1234', 'minions': ['m1']}):
+            self.assertEqual(local_client.cmd_async('m1', 'test.ping'), '1234')
+            local_client.event.subscribe()
+            self.assertEqual(local_client.event.subscriptions, set(['']))
+
     def test_pub(self):
         # Make sure we cleanly return if the publisher isn't running
         with patch('os.path.exists', return_value=False):
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.crypt_test
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the ciphers of the AES session
+'''
+
+# Import Salt Testing libs
+from salttesting import TestCase, skipIf
+from salttesting.helpers import ensure_in_syspath
+ensure_in_syspath('../')
+
+# Import salt libs
+import salt.crypt
+from salt.exceptions import AuthenticationError
+
+
+class CrypticleTestCase(TestCase):
+
+    def setUp(self):
+        self.opts = {'serial': 'msgpack'}
+        self.key = salt.crypt.Crypticle.generate_key_string()
+        self.data = {'cmd': '_return', 'return': 'x' * 1000}
+
+    def crypticle(self, cipher=None):
+        return salt.crypt.Crypticle(self.opts, self.key, cipher=cipher)
+
+    def test_cbc(self):
+        crypticle = self.crypticle()
+        self.assertEqual(crypticle.cipher, 'aes-cbc-hmac')
+        msg = crypticle.dumps(self.data)
+        self.assertFalse(crypticle.is_aead(msg))
+        self.assertEqual(crypticle.loads(msg), self.data)
+        tampered = msg[:20] + chr(ord(msg[20]) ^ 1) + msg[21:]
+        self.assertRaises(AuthenticationError, crypticle.loads, tampered)
+        self.assertIs(crypticle.for_reply(msg), crypticle)
+
+    def test_unknown_cipher(self):
+        self.assertEqual(self.crypticle('rot13').cipher, 'aes-cbc-hmac')
+        self.opts['aes_cipher'] = 'rot13'
+        self.assertEqual(self.crypticle().cipher, 'aes-cbc-hmac')
+
+    @skipIf(not salt.crypt.HAS_AESGCM, 'cryptography is not installed')
+    def test_gcm(self):
+        self.opts['aes_cipher'] = 'aes-gcm'
+        crypticle = self.crypticle()
+        self.assertEqual(crypticle.cipher, 'aes-gcm')
+        msg = crypticle.dumps(self.data)
+        self.assertTrue(crypticle.is_aead(msg))
+        self.assertEqual(crypticle.loads(msg), self.data)
+        tampered = msg[:20] + chr(ord(msg[20]) ^ 1) + msg[21:]
+        self.assertRaises(AuthenticationError, crypticle.loads, tampered)
+        # Either cipher is read, replies use the cipher of the request
+        cbc = self.crypticle('aes-cbc-hmac')
+        self.assertEqual(cbc.loads(msg), self.data)
+        self.assertEqual(crypticle.loads(cbc.dumps(self.data)), self.data)
+        self.assertIs(cbc.for_reply(msg), cbc.with_cipher('aes-gcm'))
+        self.assertEqual(cbc.for_reply(msg).cipher, 'aes-gcm')
+        self.assertEqual(crypticle.for_reply(cbc.dumps(self.data)).cipher,
+                         'aes-cbc-hmac')
+
+    @skipIf(not salt.crypt.HAS_AESGCM, 'cryptography is not installed')
+    def test_gcm_key(self):
+        crypticle = self.crypticle('aes-gcm')
+        aes_key = crypticle.keys[0]
+        gcm_key = salt.crypt.Crypticle.derive_key(crypticle.keys, 'aes-gcm')
+        self.assertEqual(len(gcm_key), len(aes_key))
+        self.assertNotEqual(gcm_key, aes_key)
+        msg = crypticle.encrypt('data')
+        start = len(crypticle.AEAD_MAGIC)
+        nonce = msg[start:start + crypticle.NONCE_SIZE]
+        self.assertEqual(
+            salt.crypt.AESGCM(gcm_key).decrypt(
+                nonce, msg[start + crypticle.NONCE_SIZE:], None),
+            'data')
+
+    @skipIf(salt.crypt.HAS_AESGCM, 'cryptography is installed')
+    def test_gcm_missing(self):
+        self.assertEqual(self.crypticle('aes-gcm').cipher, 'aes-cbc-hmac')
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(CrypticleTestCase, needs_daemon=False)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.fileclient_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the windowed file fetch of the remote file client
+'''
+
+# Import python libs
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+# Import Salt Testing libs
+from salttesting import TestCase, skipIf
+from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import NO_MOCK, NO_MOCK_REASON, patch
+ensure_in_syspath('../')
+
+# Import salt libs
+import salt.fileclient
+import salt.utils
+import salt.utils.gzip_util
+from salt.exceptions import SaltReqTimeoutError
+
+
+class FakeChannel(object):
+    '''
+    Serve files from memory the way the master file server does
+    '''
+    ttype = 'zeromq'
+    auth = object()
+
+    def __init__(self, files, buffer_size_max):
+        self.files = files
+        self.buffer_size_max = buffer_size_max
+        self.requests = []
+        self.fail_at = None
+        self.lock = threading.Lock()
+
+    def send(self, load):
+        with self.lock:
+            self.requests.append(dict(load))
+        data = self.files.get(load['path'])
+        if load['cmd'] == '_file_hash':
+            if data is None:
+                return {}
+            return {'hsum': hashlib.md5(data).hexdigest(),
+                    'hash_type': 'md5'}
+        if self.fail_at is not None and load['loc'] >= self.fail_at:
+            raise SaltReqTimeoutError('timed out')
+        size = min(load['buffer_size'], self.buffer_size_max)
+        chunk = data[load['loc']:load['loc'] + size]
+        ret = {'data': chunk, 'dest': load['path']}
+        if load.get('gzip') and chunk:
+            ret['data'] = salt.utils.gzip_util.compress(chunk, load['gzip'])
+            ret['gzip'] = load['gzip']
+        return ret
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class WindowedGetFileTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.data = os.urandom(10000)
+        self.channel = FakeChannel({'big.bin': self.data}, 1000)
+        opts = {'cachedir': self.tmpdir,
+                'file_buffer_size': 500,
+                'file_buffer_size_max': 2000,
+                'file_fetch_window': 4,
+                'serial': 'msgpack'}
+        with patch('salt.transport.Channel.factory',
+                   return_value=self.channel):
+            self.client = salt.fileclient.RemoteClient(opts)
+        self.dest = os.path.join(self.tmpdir, 'big.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def read(self, path):
+        with salt.utils.fopen(path, 'rb') as fp_:
+            return fp_.read()
+
+    def chunk_locs(self):
+        return sorted(req['loc'] for req in self.channel.requests
+                      if req['cmd'] == '_serve_file')
+
+    def test_get_file(self):
+        self.assertEqual(
+            self.client.get_file('salt://big.bin', self.dest), self.dest)
+        self.assertEqual(self.read(self.dest), self.data)
+        self.assertFalse(os.path.exists(self.dest + '.part'))
+        # The master serves 1000 byte chunks, every chunk is requested once
+        self.assertEqual(self.chunk_locs()[:10], range(0, 10000, 1000))
+
+    def test_get_file_gzip(self):
+        dest = self.client.get_file('salt://big.bin', gzip=5)
+        self.assertEqual(dest,
+                         os.path.join(self.tmpdir, 'files', 'base', 'big.bin'))
+        self.assertEqual(self.read(dest), self.data)
+
+    def test_missing_file(self):
+        self.assertEqual(self.client.get_file('salt://nope', self.dest), '')
+
+    def test_resume(self):
+        self.channel.fail_at = 4000
+        self.assertEqual(self.client.get_file('salt://big.bin', self.dest), '')
+        self.assertFalse(os.path.exists(self.dest))
+        self.assertEqual(self.read(self.dest + '.part'), self.data[:4000])
+        self.channel.fail_at = None
+        del self.channel.requests[:]
+        self.assertEqual(
+            self.client.get_file('salt://big.bin', self.dest), self.dest)
+        self.assertEqual(self.read(self.dest), self.data)
+        self.assertEqual(self.chunk_locs()[0], 4000)
+
+    def test_changed_file(self):
+        self.channel.fail_at = 4000
+        self.client.get_file('salt://big.bin', self.dest)
+        # The partial download of an older version of the file is dropped
+        self.channel.fail_at = None
+        self.channel.files['big.bin'] = self.data = os.urandom(3000)
+        self.assertEqual(
+            self.client.get_file('salt://big.bin', self.dest), self.dest)
+        self.assertEqual(self.read(self.dest), self.data)
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(WindowedGetFileTestCase, needs_daemon=False)
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.fileserver_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the fileserver mtime map helpers and the roots backend update, hash
+    index and chunk serving
+'''
+
+# Import python libs
+import os
+import shutil
+import tempfile
+
+# Import Salt Testing libs
+from salttesting import TestCase, skipIf
+from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import patch
+ensure_in_syspath('../')
+
+# Import salt libs
+import salt.fileserver
+import salt.utils
+import salt.utils.gzip_util
+from salt.fileserver import roots
+
+
+class MtimeMapWatcherTestCase(TestCase):
+
+    use_inotify = False
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmpdir, 'base')
+        os.makedirs(os.path.join(self.root, 'sub'))
+        self.write('top.sls')
+        self.write('sub/init.sls')
+        self.watcher = salt.fileserver.MtimeMapWatcher(
+            {'base': [self.root]}, use_inotify=self.use_inotify)
+
+    def tearDown(self):
+        self.watcher.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, rel):
+        return os.path.join(self.root, rel)
+
+    def write(self, rel, mtime=None):
+        with salt.utils.fopen(self.path(rel), 'w') as fp_:
+            fp_.write(rel)
+        if mtime is not None:
+            os.utime(self.path(rel), (mtime, mtime))
+
+    def test_initial_map(self):
+        self.assertEqual(
+            sorted(self.watcher.mtime_map),
+            [self.path('sub/init.sls'), self.path('top.sls')]
+        )
+        self.assertEqual(self.watcher.update(), {})
+
+    def test_changes(self):
+        self.write('top.sls', mtime=1000)
+        self.write('new.sls')
+        os.remove(self.path('sub/init.sls'))
+        changes = self.watcher.update()
+        self.assertEqual(changes[self.path('top.sls')], 1000)
+        self.assertIn(self.path('new.sls'), changes)
+        self.assertIsNone(changes[self.path('sub/init.sls')])
+        self.assertEqual(
+            self.watcher.mtime_map,
+            salt.fileserver.generate_mtime_map({'base': [self.root]})
+        )
+        self.assertEqual(self.watcher.update(), {})
+
+    def test_directories(self):
+        os.makedirs(os.path.join(self.tmpdir, 'other'))
+        with salt.utils.fopen(
+                os.path.join(self.tmpdir, 'other', 'a.sls'), 'w'):
+            pass
+        shutil.move(os.path.join(self.tmpdir, 'other'), self.path('other'))
+        shutil.rmtree(self.path('sub'))
+        changes = self.watcher.update()
+        self.assertIn(self.path('other/a.sls'), changes)
+        self.assertIsNone(changes[self.path('sub/init.sls')])
+        self.assertEqual(
+            self.watcher.mtime_map,
+            salt.fileserver.generate_mtime_map({'base': [self.root]})
+        )
+
+
+@skipIf(not salt.fileserver.HAS_PYINOTIFY, 'pyinotify is not installed')
+class InotifyMtimeMapWatcherTestCase(MtimeMapWatcherTestCase):
+
+    use_inotify = True
+
+    def test_uses_inotify(self):
+        self.assertIsNotNone(self.watcher._notifier)
+
+
+class MtimeMapTestCase(TestCase):
+
+    def test_mtime_map_changes(self):
+        self.assertEqual(
+            salt.fileserver.mtime_map_changes(
+                {'a': 1.0, 'b': 2.0, 'c': 3.0},
+                {'a': 1.0, 'b': 2.5, 'd': 4.0}
+            ),
+            {'b': 2.5, 'c': None, 'd': 4.0}
+        )
+        self.assertFalse(salt.fileserver.diff_mtime_map({'a': 1.0},
+                                                        {'a': 1.0}))
+        self.assertTrue(salt.fileserver.diff_mtime_map({'a': 1.0},
+                                                       {'a': 2.0}))
+
+
+class RootsUpdateTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.roots = {'base': [os.path.join(self.tmpdir, 'base')],
+                      'dev': [os.path.join(self.tmpdir, 'dev')]}
+        for path_list in self.roots.values():
+            os.makedirs(path_list[0])
+            with salt.utils.fopen(os.path.join(path_list[0], 'top.sls'), 'w'):
+                pass
+        self.list_cachedir = os.path.join(self.tmpdir, 'file_lists/roots')
+        os.makedirs(self.list_cachedir)
+        roots.__opts__ = {'cachedir': self.tmpdir,
+                          'file_roots': self.roots,
+                          'fileserver_inotify': False}
+        roots._WATCHER = None
+
+    def tearDown(self):
+        if roots._WATCHER is not None:
+            roots._WATCHER.stop()
+        roots._WATCHER = None
+        shutil.rmtree(self.tmpdir)
+
+    def test_update(self):
+        roots.update()
+        mtime_map_path = os.path.join(self.tmpdir, 'roots/mtime_map')
+        self.assertEqual(
+            roots._read_mtime_map(mtime_map_path),
+            salt.fileserver.generate_mtime_map(self.roots)
+        )
+        for saltenv in self.roots:
+            with salt.utils.fopen(
+                    os.path.join(self.list_cachedir, saltenv + '.p'), 'w'):
+                pass
+        # A fresh process sees no changes against the saved map
+        roots._WATCHER = None
+        roots.update()
+        self.assertEqual(sorted(os.listdir(self.list_cachedir)),
+                         ['base.p', 'dev.p'])
+        # Only the file list cache of the changed environment is cleared
+        with salt.utils.fopen(
+                os.path.join(self.roots['dev'][0], 'new.sls'), 'w'):
+            pass
+        roots.update()
+        self.assertEqual(os.listdir(self.list_cachedir), ['base.p'])
+
+
+class RootsHashIndexTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmpdir, 'base')
+        os.makedirs(self.root)
+        self.path = os.path.join(self.root, 'top.sls')
+        self.write('base: {}')
+        roots.__opts__ = {'cachedir': self.tmpdir,
+                          'file_roots': {'base': [self.root]},
+                          'fileserver_inotify': False,
+                          'hash_type': 'md5',
+                          'serial': 'msgpack'}
+        roots._WATCHER = None
+        roots._HASH_INDEX = {'mtime': None, 'files': {}}
+        # Create the index and the mtime map
+        roots.update()
+
+    def tearDown(self):
+        if roots._WATCHER is not None:
+            roots._WATCHER.stop()
+        roots._WATCHER = None
+        roots._HASH_INDEX = {'mtime': None, 'files': {}}
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, data, mtime=None):
+        with salt.utils.fopen(self.path, 'w') as fp_:
+            fp_.write(data)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def file_hash(self):
+        return roots.file_hash({'path': 'top.sls', 'saltenv': 'base'},
+                               {'path': self.path})
+
+    def test_file_hash(self):
+        with patch('salt.utils.get_hash', return_value='abc') as get_hash:
+            ret = self.file_hash()
+            self.assertEqual(ret, {'hash_type': 'md5', 'hsum': 'abc'})
+            self.assertEqual(self.file_hash(), ret)
+            # A new worker picks up the hash once the update loop ran
+            roots._HASH_INDEX = {'mtime': None, 'files': {}}
+            roots.update()
+            self.assertEqual(self.file_hash(), ret)
+            self.assertEqual(get_hash.call_count, 1)
+        self.assertFalse(os.path.exists(roots._hash_index_path('journal')))
+
+    def test_changed_file(self):
+        self.file_hash()
+        roots.update()
+        self.write('base: {"*": [core]}', mtime=1000)
+        # The update loop rehashes files it knows about
+        roots.update()
+        roots._HASH_INDEX = {'mtime': None, 'files': {}}
+        hsum = salt.utils.get_hash(self.path, 'md5')
+        with patch('salt.utils.get_hash') as get_hash:
+            self.assertEqual(self.file_hash()['hsum'], hsum)
+            self.assertFalse(get_hash.called)
+        os.remove(self.path)
+        roots.update()
+        self.assertEqual(roots._read_hash_index(), {})
+
+    def test_hash_type_change(self):
+        self.file_hash()
+        roots.update()
+        roots.__opts__['hash_type'] = 'sha256'
+        roots._HASH_INDEX = {'mtime': None, 'files': {}}
+        self.assertEqual(roots._read_hash_index(), {})
+        self.assertEqual(
+            self.file_hash()['hsum'], salt.utils.get_hash(self.path, 'sha256')
+        )
+
+
+
+class RootsServeFileTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'big.bin')
+        self.data = ''.join(chr(i % 251) for i in range(10000))
+        with salt.utils.fopen(self.path, 'wb') as fp_:
+            fp_.write(self.data)
+        roots.__opts__ = {'file_buffer_size': 1000,
+                          'file_buffer_size_max': 4000,
+                          'fileserver_mmap': False,
+                          'fileserver_chunk_cache_size': 100000}
+
+    def tearDown(self):
+        for entry in roots._MMAPS.values():
+            entry[1].close()
+        roots._MMAPS.clear()
+        roots._GZIP_CHUNKS.clear()
+        roots._GZIP_CHUNKS_SIZE[0] = 0
+        shutil.rmtree(self.tmpdir)
+
+    def serve(self, loc, **kwargs):
+        load = {'path': 'big.bin', 'saltenv': 'base', 'loc': loc}
+        load.update(kwargs)
+        return roots.serve_file(load, {'path': self.path, 'rel': 'big.bin'})
+
+    def test_buffer_size(self):
+        self.assertEqual(self.serve(500)['data'], self.data[500:1500])
+        self.assertEqual(self.serve(500, buffer_size=3000)['data'],
+                         self.data[500:3500])
+        # Clamped to file_buffer_size_max, and never below file_buffer_size
+        self.assertEqual(len(self.serve(0, buffer_size=100000)['data']), 4000)
+        self.assertEqual(len(self.serve(0, buffer_size=10)['data']), 1000)
+        self.assertEqual(self.serve(9500, buffer_size=4000)['data'],
+                         self.data[9500:])
+        self.assertEqual(self.serve(10000)['data'], '')
+
+    def test_mmap(self):
+        roots.__opts__['fileserver_mmap'] = True
+        self.assertEqual(self.serve(500, buffer_size=3000)['data'],
+                         self.data[500:3500])
+        self.assertEqual(self.serve(10000)['data'], '')
+        self.assertEqual(len(roots._MMAPS), 1)
+        # A replaced file is mapped again
+        new = os.path.join(self.tmpdir, 'new.bin')
+        with salt.utils.fopen(new, 'wb') as fp_:
+            fp_.write('new data')
+        os.rename(new, self.path)
+        self.assertEqual(self.serve(0)['data'], 'new data')
+        self.assertEqual(len(roots._MMAPS), 1)
+
+    def test_gzip_chunk_cache(self):
+        ret = self.serve(1000, gzip=5)
+        self.assertEqual(ret['gzip'], 5)
+        self.assertEqual(salt.utils.gzip_util.uncompress(ret['data']),
+                         self.data[1000:2000])
+        with patch('salt.utils.gzip_util.compress') as compress:
+            self.assertEqual(self.serve(1000, gzip=5)['data'], ret['data'])
+            self.assertFalse(compress.called)
+        # Older chunks are evicted once the cache is full
+        roots.__opts__['fileserver_chunk_cache_size'] = \
+            roots._GZIP_CHUNKS_SIZE[0] + 1
+        self.serve(2000, gzip=5)
+        self.assertEqual([key[3] for key in roots._GZIP_CHUNKS], [2000])
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(MtimeMapWatcherTestCase, InotifyMtimeMapWatcherTestCase,
+              MtimeMapTestCase, RootsUpdateTestCase, RootsHashIndexTestCase,
+              RootsServeFileTestCase, needs_daemon=False)
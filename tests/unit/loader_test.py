@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.loader_test
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the lazy module loader and the virtual cache
+'''
+
+# Import python libs
+import os
+import shutil
+import sys
+import tempfile
+
+# Import Salt Testing libs
+from salttesting import TestCase
+from salttesting.helpers import ensure_in_syspath
+ensure_in_syspath('../')
+
+# Import salt libs
+import salt.loader
+import salt.utils
+
+MODULES = {
+    'plain': '''
+def ping():
+    return True
+
+def call_other():
+    return __salt__['pkg.name']()
+''',
+    'apt': '''
+__virtualname__ = 'pkg'
+
+def __virtual__():
+    if __opts__.get('probe'):
+        with open(__opts__['probe'], 'a') as fp_:
+            fp_.write('apt\\n')
+    return __virtualname__ if __grains__['os'] == 'Debian' else False
+
+def name():
+    return 'apt'
+''',
+    'yum': '''
+__virtualname__ = 'pkg'
+
+def __virtual__():
+    if __opts__.get('probe'):
+        with open(__opts__['probe'], 'a') as fp_:
+            fp_.write('yum\\n')
+    return __virtualname__ if __grains__['os'] == 'RedHat' else False
+
+def name():
+    return 'yum'
+''',
+    'dynamic': '''
+__virtualname__ = 'dyn' + 'amic'
+
+def __virtual__():
+    return __virtualname__
+
+def ping():
+    return True
+''',
+    'broken': '''
+raise ImportError('missing dependency')
+''',
+}
+
+
+class LazyLoaderTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.module_dir = os.path.join(self.tmpdir, 'modules')
+        os.makedirs(self.module_dir)
+        for name, source in MODULES.items():
+            with salt.utils.fopen(
+                    os.path.join(self.module_dir, name + '.py'), 'w') as fp_:
+                fp_.write(source)
+        self.opts = {'cachedir': self.tmpdir,
+                     'grains': {'os': 'RedHat'},
+                     'serial': 'msgpack'}
+        self.base_name = 'salt.loaded.lazytest{0}'.format(id(self))
+        for name in ('int', 'int.module', 'ext', 'ext.module'):
+            salt.loader._generate_module('{0}.{1}'.format(self.base_name,
+                                                          name))
+
+    def tearDown(self):
+        for name in sys.modules.keys():
+            if name.startswith(self.base_name):
+                del sys.modules[name]
+        shutil.rmtree(self.tmpdir)
+
+    def lazy(self, **kwargs):
+        loader = salt.loader.Loader([self.module_dir],
+                                    self.opts,
+                                    loaded_base_name=self.base_name)
+        return salt.loader.LazyLoader(loader, **kwargs)
+
+    def imported(self):
+        return sorted(
+            name.rsplit('.', 1)[-1] for name in sys.modules
+            if name.startswith(self.base_name + '.ext.module.')
+        )
+
+    def test_module_index(self):
+        lazy = self.lazy()
+        self.assertEqual(
+            dict((key, sorted(val)) for key, val in lazy.index.items()),
+            {'plain': ['plain'],
+             'pkg': ['apt', 'yum'],
+             'broken': ['broken'],
+             None: ['dynamic']}
+        )
+        self.assertTrue(
+            os.path.isfile(os.path.join(self.tmpdir, 'loader',
+                                        'module_index.p'))
+        )
+        # The cached index gives the same result
+        self.assertEqual(self.lazy().index, lazy.index)
+
+    def test_lazy_load(self):
+        lazy = self.lazy()
+        self.assertTrue(lazy['plain.ping']())
+        self.assertEqual(self.imported(), ['plain'])
+        # Only the modules which may be pkg are imported to find it
+        self.assertEqual(lazy['plain.call_other'](), 'yum')
+        self.assertIn('yum', self.imported())
+        self.assertNotIn('dynamic', self.imported())
+        self.assertIn('pkg.name', lazy)
+        self.assertNotIn('pkg.missing', lazy)
+        self.assertNotIn('broken.foo', lazy)
+        self.assertNotIn('nodot', lazy)
+
+    def test_unknown_virtualname(self):
+        lazy = self.lazy()
+        self.assertTrue(lazy['dynamic.ping']())
+        self.assertEqual(self.imported(), ['dynamic'])
+
+    def test_load_all(self):
+        lazy = self.lazy()
+        self.assertTrue(lazy)
+        self.assertEqual(self.imported(), [])
+        self.assertEqual(
+            sorted(lazy),
+            ['dynamic.ping', 'pkg.name', 'plain.call_other', 'plain.ping']
+        )
+
+    def test_whitelist(self):
+        lazy = self.lazy(whitelist=['plain'])
+        self.assertTrue(lazy['plain.ping']())
+        self.assertNotIn('pkg.name', lazy)
+        self.assertEqual(self.imported(), ['plain'])
+        self.assertEqual(sorted(lazy), ['plain.call_other', 'plain.ping'])
+
+    def test_filter_loader(self):
+        loader = salt.loader.Loader([self.module_dir],
+                                    self.opts,
+                                    loaded_base_name=self.base_name)
+        lazy = salt.loader.LazyFilterLoader(loader, 'name')
+        self.assertEqual(lazy['pkg'](), 'yum')
+        self.assertNotIn('plain', lazy)
+        self.assertEqual(list(lazy), ['pkg'])
+
+
+
+class VirtualCacheTestCase(LazyLoaderTestCase):
+
+    def setUp(self):
+        super(VirtualCacheTestCase, self).setUp()
+        self.probe = os.path.join(self.tmpdir, 'probe')
+        self.opts.update({'virtual_cache': True,
+                          'virtual_cache_expire': 3600,
+                          'probe': self.probe})
+
+    def probed(self):
+        if not os.path.isfile(self.probe):
+            return []
+        with salt.utils.fopen(self.probe) as fp_:
+            ret = sorted(fp_.read().split())
+        os.remove(self.probe)
+        return ret
+
+    def load_pkg(self):
+        lazy = self.lazy()
+        lazy.load_all()
+        self.assertEqual(lazy['pkg.name'](), 'yum')
+        for name in self.imported():
+            del sys.modules['{0}.ext.module.{1}'.format(self.base_name, name)]
+        return lazy
+
+    def test_cached(self):
+        self.load_pkg()
+        self.assertEqual(self.probed(), ['apt', 'yum'])
+        # apt is known not to load and is not imported again, the
+        # __virtual__ function of yum still runs to set the module up
+        lazy = self.load_pkg()
+        self.assertEqual(self.probed(), ['yum'])
+        self.assertEqual(
+            sorted(mod.__name__.rsplit('.', 1)[-1] for mod in lazy.modules),
+            ['dynamic', 'plain', 'yum']
+        )
+
+    def test_grains_change(self):
+        self.load_pkg()
+        self.probed()
+        self.opts['grains']['os'] = 'Debian'
+        lazy = self.lazy()
+        self.assertEqual(lazy['pkg.name'](), 'apt')
+        self.assertIn('apt', self.probed())
+
+    def test_opts_change(self):
+        self.load_pkg()
+        self.probed()
+        # The modules looked at the probe option
+        self.opts['probe'] = self.probe + '2'
+        self.probe += '2'
+        self.load_pkg()
+        self.assertEqual(self.probed(), ['apt', 'yum'])
+
+    def test_expire_and_mtime(self):
+        self.load_pkg()
+        self.probed()
+        self.opts['virtual_cache_expire'] = -1
+        self.load_pkg()
+        self.assertEqual(self.probed(), ['apt', 'yum'])
+        self.opts['virtual_cache_expire'] = 3600
+        path = os.path.join(self.module_dir, 'yum.py')
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        self.load_pkg()
+        self.assertEqual(self.probed(), ['yum'])
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(LazyLoaderTestCase, VirtualCacheTestCase, needs_daemon=False)
@@ -0,0 +1,592 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.master_test
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the multiplexed request handling of the master workers
+'''
+
+# Import python libs
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# Import Salt Testing libs
+from salttesting import TestCase, skipIf
+from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import NO_MOCK, NO_MOCK_REASON, patch
+ensure_in_syspath('../')
+
+# Import 3rd party libs
+import zmq
+from M2Crypto import RSA
+
+# Import salt libs
+import salt.config
+import salt.crypt
+import salt.daemons.masterapi
+import salt.fileserver
+import salt.master
+import salt.payload
+import salt.pillar
+import salt.utils
+import salt.utils.event
+import salt.utils.job_cache
+
+
+class FakeAESFuncs(object):
+    '''
+    Record the commands run and block ``_pillar`` until it is released
+    '''
+    return_writer = None
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.threads = {}
+
+    def run_func(self, func, load, crypticle=None):
+        self.threads[func] = threading.current_thread().name
+        if func == '_pillar':
+            self.release.wait(10)
+        return {'cmd': func, 'id': load.get('id')}
+
+
+class FakeClearFuncs(object):
+
+    def ping(self, load):
+        return 'pong'
+
+
+class MultiplexedMWorkerTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.opts = {'cachedir': self.tmpdir,
+                     'sock_dir': self.tmpdir,
+                     'serial': 'msgpack',
+                     'worker_io_threads': 2}
+        self.serial = salt.payload.Serial(self.opts)
+        self.crypticle = salt.crypt.Crypticle(
+            self.opts, salt.crypt.Crypticle.generate_key_string())
+        self.worker = salt.master.MWorker(self.opts, None, None,
+                                          self.crypticle)
+        self.worker.aes_funcs = FakeAESFuncs()
+        self.worker.clear_funcs = FakeClearFuncs()
+
+    def tearDown(self):
+        self.worker.aes_funcs.release.set()
+        shutil.rmtree(self.tmpdir)
+
+    def aes(self, cmd, id_='minion'):
+        return self.serial.dumps(
+            {'enc': 'aes',
+             'load': self.crypticle.dumps({'cmd': cmd, 'id': id_})})
+
+    def test_handle_frames(self):
+        self.worker.io_pool = salt.master.ThreadPool(1)
+        replies = []
+        done = threading.Event()
+
+        def reply(frames):
+            replies.append(frames)
+            done.set()
+
+        try:
+            frames = ['env', '', self.aes('_mine_get')]
+            self.assertFalse(self.worker._handle_frames(frames, reply))
+            self.assertEqual(
+                self.serial.loads(frames[-1]),
+                {'cmd': '_mine_get', 'id': 'minion'})
+            self.assertEqual(self.worker.aes_funcs.threads['_mine_get'],
+                             threading.current_thread().name)
+
+            frames = ['env', '', self.serial.dumps(
+                {'enc': 'clear', 'load': {'cmd': 'ping'}})]
+            self.assertFalse(self.worker._handle_frames(frames, reply))
+            self.assertEqual(self.serial.loads(frames[-1]), 'pong')
+
+            frames = ['env', '', self.serial.dumps(
+                {'enc': 'aes', 'load': 'garbage'})]
+            self.assertFalse(self.worker._handle_frames(frames, reply))
+            self.assertEqual(self.serial.loads(frames[-1]), '')
+
+            # I/O bound commands are handed to the pool
+            self.worker.aes_funcs.release.set()
+            frames = ['env', '', self.aes('_return')]
+            self.assertTrue(self.worker._handle_frames(frames, reply))
+            done.wait(10)
+            self.assertEqual(replies[0][:2], ['env', ''])
+            self.assertEqual(self.serial.loads(replies[0][-1]),
+                             {'cmd': '_return', 'id': 'minion'})
+            self.assertNotEqual(self.worker.aes_funcs.threads['_return'],
+                                threading.current_thread().name)
+        finally:
+            self.worker.io_pool.close()
+            self.worker.io_pool.join()
+
+    def test_requests_in_flight(self):
+        # Act as the DEALER of the request server the workers connect to,
+        # replies carry the envelope of their request
+        context = zmq.Context()
+        dealer = context.socket(zmq.DEALER)
+        dealer.setsockopt(zmq.LINGER, 0)
+        dealer.bind('ipc://{0}'.format(
+            os.path.join(self.tmpdir, 'workers.ipc')))
+        thread = threading.Thread(target=self.worker._MWorker__bind)
+        thread.daemon = True
+        thread.start()
+        poller = zmq.Poller()
+        poller.register(dealer, zmq.POLLIN)
+
+        def recv():
+            self.assertTrue(poller.poll(10000), 'no reply from the worker')
+            frames = dealer.recv_multipart()
+            return frames[0], self.serial.loads(frames[-1])
+
+        try:
+            dealer.send_multipart(['slow', '', self.aes('_pillar')])
+            dealer.send_multipart(['fast', '', self.aes('_mine')])
+            # The fast request is answered while the pillar still compiles
+            self.assertEqual(recv(), ('fast', {'cmd': '_mine', 'id': 'minion'}))
+            self.worker.aes_funcs.release.set()
+            self.assertEqual(recv(),
+                             ('slow', {'cmd': '_pillar', 'id': 'minion'}))
+        finally:
+            dealer.close()
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class AESKeyTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.opts = {'cachedir': self.tmpdir,
+                     'sock_dir': self.tmpdir,
+                     'serial': 'msgpack'}
+        self.serial = salt.payload.Serial(self.opts)
+        aes = salt.crypt.Crypticle.generate_key_string()
+        self.aes_key = salt.master.AESKey(aes)
+        self.worker = salt.master.MWorker(
+            self.opts, None, None, salt.crypt.Crypticle(self.opts, aes),
+            self.aes_key)
+        self.worker.aes_funcs = FakeAESFuncs()
+        self.worker.aes_funcs.opts = {}
+        self.worker.clear_funcs = FakeClearFuncs()
+        self.worker.clear_funcs.opts = {}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def request(self, aes):
+        crypticle = salt.crypt.Crypticle(self.opts, aes)
+        frames = ['env', '', self.serial.dumps(
+            {'enc': 'aes',
+             'load': crypticle.dumps({'cmd': '_mine', 'id': 'minion'})})]
+        self.worker._handle_frames(frames, None)
+        return self.serial.loads(frames[-1])
+
+    def test_rotate(self):
+        old, _ = self.aes_key.get()
+        self.assertEqual(self.request(old), {'cmd': '_mine', 'id': 'minion'})
+        new = salt.crypt.Crypticle.generate_key_string()
+        self.aes_key.set(new)
+        # Requests do not touch the filesystem to find the rotated key
+        with patch('os.stat', side_effect=OSError):
+            self.assertEqual(self.request(old), '')
+            self.assertEqual(self.request(new),
+                             {'cmd': '_mine', 'id': 'minion'})
+        self.assertEqual(self.worker.aes_funcs.opts['aes'], new)
+        self.assertEqual(self.worker.k_gen, self.aes_key.generation)
+
+    def test_load_dropfile(self):
+        old = self.aes_key.get()
+        self.assertFalse(self.aes_key.load_dropfile(self.tmpdir))
+        salt.crypt.dropfile(self.tmpdir)
+        self.assertTrue(self.aes_key.load_dropfile(self.tmpdir))
+        aes, generation = self.aes_key.get()
+        self.assertEqual(generation, old[1] + 1)
+        self.assertNotEqual(aes, old[0])
+        with salt.utils.fopen(os.path.join(self.tmpdir, '.dfn')) as fp_:
+            self.assertEqual(fp_.read(), aes)
+        # The same dropfile is only loaded once
+        self.assertFalse(self.aes_key.load_dropfile(self.tmpdir))
+
+
+class MinionKeyCacheTestCase(TestCase):
+
+    use_inotify = False
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for name in ('minions', 'minions_pre', 'minions_rejected',
+                     'minions_denied'):
+            os.makedirs(os.path.join(self.tmpdir, name))
+        self.accepted = os.path.join(self.tmpdir, 'minions', 'minion')
+        salt.crypt.gen_keys(self.tmpdir, 'minion', 1024)
+        os.rename(os.path.join(self.tmpdir, 'minion.pub'), self.accepted)
+        with salt.utils.fopen(self.accepted) as fp_:
+            self.pub = fp_.read()
+        with patch('salt.fileserver.HAS_PYINOTIFY', self.use_inotify):
+            self.cache = salt.daemons.masterapi.MinionKeyCache(
+                {'pki_dir': self.tmpdir})
+
+    def tearDown(self):
+        if self.cache.watcher is not None:
+            self.cache.watcher.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_read(self):
+        pending = os.path.join(self.tmpdir, 'minions_pre', 'minion')
+        self.assertTrue(self.cache.exists(self.accepted))
+        self.assertFalse(self.cache.exists(pending))
+        self.assertEqual(self.cache.read(self.accepted), self.pub)
+        self.assertIsNone(self.cache.read(pending))
+        rsa = self.cache.rsa(self.accepted)
+        self.assertIs(self.cache.rsa(self.accepted), rsa)
+        self.assertRaises(RSA.RSAError, self.cache.rsa, pending)
+
+    def test_changed(self):
+        self.cache.rsa(self.accepted)
+        stats = os.stat(self.accepted)
+        with salt.utils.fopen(self.accepted, 'w') as fp_:
+            fp_.write('garbage')
+        os.utime(self.accepted, (stats.st_atime, stats.st_mtime + 10))
+        self.cache.refresh()
+        self.assertEqual(self.cache.read(self.accepted), 'garbage')
+        self.assertRaises(RSA.RSAError,
+                          self.cache.rsa, self.accepted)
+        os.remove(self.accepted)
+        self.cache.refresh()
+        self.assertFalse(self.cache.exists(self.accepted))
+
+    def test_rewritten(self):
+        # A key replaced within the mtime resolution of the file system
+        os.utime(self.accepted, (1400000000, 1400000000))
+        self.cache.refresh()
+        self.cache.rsa(self.accepted)
+        with salt.utils.fopen(self.accepted, 'w') as fp_:
+            fp_.write(self.pub.replace('A', 'B'))
+        os.utime(self.accepted, (1400000000, 1400000000))
+        self.cache.refresh()
+        self.assertEqual(self.cache.read(self.accepted),
+                         self.pub.replace('A', 'B'))
+        with salt.utils.fopen(self.accepted, 'w') as fp_:
+            fp_.write('garbage')
+        os.utime(self.accepted, (1400000000, 1400000000))
+        self.cache.refresh()
+        self.assertEqual(self.cache.read(self.accepted), 'garbage')
+
+    def test_auth(self):
+        opts = {'pki_dir': self.tmpdir,
+                'open_mode': False,
+                'max_minions': 0,
+                'auto_accept': False,
+                'auth_mode': 1,
+                'keysize': 1024,
+                'master_sign_pubkey': False,
+                'publish_port': 4505,
+                'aes': salt.crypt.Crypticle.generate_key_string(),
+                'aes_cipher': 'aes-cbc-hmac'}
+        # Only what _auth uses is set up
+        funcs = object.__new__(salt.master.ClearFuncs)
+        funcs.opts = opts
+        funcs.master_key = salt.crypt.MasterKeys(opts)
+        funcs.event = RecordingEvent(salt.payload.Serial('msgpack'))
+        funcs.auto_key = salt.daemons.masterapi.AutoKey(opts)
+        funcs.key_cache = self.cache
+        funcs.crypticle = salt.crypt.Crypticle(opts, opts['aes'])
+        salt.crypt.gen_keys(self.tmpdir, 'new', 1024)
+        with salt.utils.fopen(os.path.join(self.tmpdir, 'new.pub')) as fp_:
+            new_pub = fp_.read()
+        load = {'id': 'new', 'pub': new_pub}
+        self.assertEqual(funcs._auth(load)['load'], {'ret': True})
+        # Still pending
+        self.assertEqual(funcs._auth(load)['load'], {'ret': True})
+        os.rename(os.path.join(self.tmpdir, 'minions_pre', 'new'),
+                  os.path.join(self.tmpdir, 'minions', 'new'))
+        for _ in range(2):
+            ret = funcs._auth(load)
+            self.assertEqual(ret['enc'], 'pub')
+            priv = RSA.load_key(os.path.join(self.tmpdir, 'new.pem'))
+            self.assertEqual(priv.private_decrypt(ret['aes'], 4), opts['aes'])
+        # A different key for the same id is denied
+        load['pub'] = self.pub
+        self.assertEqual(funcs._auth(load)['load'], {'ret': False})
+
+
+@skipIf(not salt.fileserver.HAS_PYINOTIFY, 'pyinotify is not installed')
+class InotifyMinionKeyCacheTestCase(MinionKeyCacheTestCase):
+
+    use_inotify = True
+
+    def test_no_disk_access(self):
+        self.assertIsNotNone(self.cache.watcher)
+        self.cache.rsa(self.accepted)
+        with patch('os.stat', side_effect=OSError), \
+                patch('salt.utils.fopen', side_effect=IOError):
+            self.cache.refresh()
+            self.assertTrue(self.cache.exists(self.accepted))
+            self.assertEqual(self.cache.read(self.accepted), self.pub)
+            self.assertIsNotNone(self.cache.rsa(self.accepted))
+
+
+class RecordingEvent(object):
+    '''
+    Keep the frames of the events fired
+    '''
+    def __init__(self, serial):
+        self.serial = serial
+        self.events = []
+
+    def fire_event(self, data, tag):
+        self.events.append(
+            salt.utils.event.SaltEvent.make_frames(self.serial, tag, data))
+
+    def fire_ret_load(self, load):
+        pass
+
+
+class RecordingWriter(object):
+
+    def __init__(self):
+        self.loads = []
+
+    def put(self, load):
+        self.loads.append(load)
+
+
+class ReturnTestCase(TestCase):
+
+    def setUp(self):
+        self.opts = {'job_cache': True,
+                     'master_job_cache': 'local_cache',
+                     'id': 'master',
+                     'pki_dir': '/etc/salt/pki/master'}
+        self.serial = salt.payload.Serial('msgpack')
+        # Only what _return uses is set up
+        self.funcs = object.__new__(salt.master.AESFuncs)
+        self.funcs.opts = self.opts
+        self.funcs.serial = self.serial
+        self.funcs.event = RecordingEvent(self.serial)
+        self.funcs._event_lock = threading.Lock()
+        self.funcs.return_writer = RecordingWriter()
+        self.ret = {'file_|-motd_|-/etc/motd_|-managed': {'result': True}}
+
+    def test_return_serialized_once(self):
+        self.funcs._return({'jid': '1', 'id': 'minion', 'fun': 'state.sls',
+                            'return': self.ret})
+        self.assertEqual([evt[0] for evt in self.funcs.event.events],
+                         ['1', 'salt/job/1/ret/minion'])
+        for evt in self.funcs.event.events:
+            data = self.serial.loads(evt[2])
+            self.assertEqual(data['return'], self.ret)
+            self.assertEqual(self.serial.loads(evt[1])['id'], 'minion')
+        load = self.funcs.return_writer.loads[0]
+        self.assertIsInstance(load['return'], salt.payload.Raw)
+        # The job cache writes the serialized return as it is
+        self.assertEqual(self.serial.loads(self.serial.dumps(load['return'])),
+                         self.ret)
+
+    def test_other_job_cache(self):
+        self.opts['master_job_cache'] = 'mysql'
+        self.funcs._return({'jid': '1', 'id': 'minion', 'return': self.ret})
+        self.assertEqual(self.funcs.return_writer.loads[0]['return'],
+                         self.ret)
+
+
+class PublishCipherTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for name in ('minions', 'minions_pre', 'minions_rejected',
+                     'minions_denied'):
+            os.makedirs(os.path.join(self.tmpdir, name))
+        self.opts = {'pki_dir': self.tmpdir,
+                     'cachedir': self.tmpdir,
+                     'open_mode': False,
+                     'max_minions': 0,
+                     'auto_accept': True,
+                     'auth_mode': 1,
+                     'keysize': 1024,
+                     'master_sign_pubkey': False,
+                     'publish_port': 4505,
+                     'aes': salt.crypt.Crypticle.generate_key_string(),
+                     'aes_cipher': 'aes-gcm'}
+        # Only what _auth and _publish_crypticle use is set up
+        self.funcs = object.__new__(salt.master.ClearFuncs)
+        self.funcs.opts = self.opts
+        self.funcs.master_key = salt.crypt.MasterKeys(self.opts)
+        self.funcs.event = RecordingEvent(salt.payload.Serial('msgpack'))
+        self.funcs.auto_key = salt.daemons.masterapi.AutoKey(self.opts)
+        self.funcs.key_cache = salt.daemons.masterapi.MinionKeyCache(
+            self.opts)
+        self.funcs.crypticle = salt.crypt.Crypticle(self.opts,
+                                                    self.opts['aes'])
+        salt.crypt.gen_keys(self.tmpdir, 'minion', 1024)
+        with salt.utils.fopen(os.path.join(self.tmpdir, 'minion.pub')) as fp_:
+            self.pub = fp_.read()
+
+    def tearDown(self):
+        if self.funcs.key_cache.watcher is not None:
+            self.funcs.key_cache.watcher.stop()
+        shutil.rmtree(self.tmpdir)
+
+    @skipIf(not salt.crypt.HAS_AESGCM, 'cryptography is not installed')
+    def test_old_minion(self):
+        self.assertEqual(self.funcs._publish_crypticle().cipher, 'aes-gcm')
+        load = {'id': 'minion', 'pub': self.pub}
+        self.assertNotIn('cipher', self.funcs._auth(load))
+        self.assertEqual(self.funcs._publish_crypticle().cipher,
+                         'aes-cbc-hmac')
+        # Upgraded
+        load['ciphers'] = list(salt.crypt.Crypticle.CIPHERS)
+        self.assertEqual(self.funcs._auth(load)['cipher'], 'aes-gcm')
+        self.assertEqual(self.funcs._publish_crypticle().cipher, 'aes-gcm')
+
+    @skipIf(not salt.crypt.HAS_AESGCM, 'cryptography is not installed')
+    def test_old_minion_deleted(self):
+        self.funcs._auth({'id': 'minion', 'pub': self.pub})
+        os.remove(os.path.join(self.tmpdir, 'minions', 'minion'))
+        self.assertEqual(self.funcs._publish_crypticle().cipher, 'aes-gcm')
+
+    @skipIf(NO_MOCK, NO_MOCK_REASON)
+    def test_master_without_aesgcm(self):
+        with patch('salt.crypt.HAS_AESGCM', False):
+            self.funcs.crypticle = salt.crypt.Crypticle(self.opts,
+                                                        self.opts['aes'])
+        load = {'id': 'minion', 'pub': self.pub,
+                'ciphers': list(salt.crypt.Crypticle.CIPHERS)}
+        # The master falls back to aes-cbc-hmac, so do its minions
+        self.assertNotIn('cipher', self.funcs._auth(load))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.tmpdir, 'aes_cbc_minions')))
+        self.assertEqual(self.funcs._publish_crypticle().cipher,
+                         'aes-cbc-hmac')
+
+
+class PillarTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        opts = {'pki_dir': self.tmpdir,
+                'cachedir': os.path.join(self.tmpdir, 'cache'),
+                'pillar_roots': {
+                    'base': [os.path.join(self.tmpdir, 'pillar')]},
+                'minion_data_cache': False}
+        # Only what _pillar uses is set up
+        self.funcs = object.__new__(salt.master.AESFuncs)
+        self.funcs.opts = opts
+        self.funcs._pillar_lock = threading.Lock()
+        self.funcs.pillar_cache = salt.pillar.PillarCache(opts)
+
+    def tearDown(self):
+        self.funcs.pillar_cache.watcher.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_cached_while_compiling(self):
+        load = {'id': 'web1', 'grains': {'os': 'Debian'}}
+        self.funcs.pillar_cache.store(dict(load, grains={'os': 'Debian',
+                                                         'id': 'web1'}),
+                                      {'role': 'web'}, [])
+        ret = []
+        # Another thread is compiling a pillar
+        with self.funcs._pillar_lock:
+            thread = threading.Thread(
+                target=lambda: ret.append(self.funcs._pillar(load)))
+            thread.daemon = True
+            thread.start()
+            thread.join(5)
+            self.assertEqual(ret, [{'role': 'web'}])
+
+
+class QueuingAESFuncs(object):
+    '''
+    Queue a return, which the writer holds on to for a minute, and say so
+    '''
+    def __init__(self, opts, crypticle):
+        def returner(load):
+            with salt.utils.fopen(opts['written'], 'a') as fp_:
+                fp_.write(load['id'] + '\n')
+        self.return_writer = salt.utils.job_cache.ReturnWriter(
+            {'master_job_cache': 'fake', 'job_cache_batch_interval': 60,
+             'cachedir': opts['sock_dir']},
+            {'fake.returner': returner})
+        self.return_writer.put({'jid': '1', 'id': 'minion'})
+        with salt.utils.fopen(opts['queued'], 'w'):
+            pass
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class MWorkerStopTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.opts = {'sock_dir': self.tmpdir,
+                     'serial': 'msgpack',
+                     'worker_io_threads': 0,
+                     'queued': os.path.join(self.tmpdir, 'queued'),
+                     'written': os.path.join(self.tmpdir, 'written')}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_sigterm_flushes_returns(self):
+        with patch('salt.master.AESFuncs', QueuingAESFuncs), \
+                patch('salt.master.ClearFuncs', lambda *args: None):
+            worker = salt.master.MWorker(self.opts, None, None, None)
+            worker.start()
+        try:
+            deadline = time.time() + 10
+            while not os.path.exists(self.opts['queued']):
+                self.assertLess(time.time(), deadline)
+                time.sleep(0.05)
+            worker.terminate()
+            worker.join(10)
+            self.assertFalse(worker.is_alive())
+        finally:
+            salt.master.clean_proc(worker)
+        with salt.utils.fopen(self.opts['written']) as fp_:
+            self.assertEqual(fp_.read(), 'minion\n')
+
+
+class MasterOptsTestCase(TestCase):
+
+    def setUp(self):
+        self.aes_funcs = object.__new__(salt.master.AESFuncs)
+        self.aes_funcs.opts = dict(salt.config.DEFAULT_MASTER_OPTS)
+        self.aes_funcs.opts.update({'pillar_opts_lean': True,
+                                    'aes': 'secret'})
+        self.aes_funcs._file_envs = lambda: ['base', 'dev']
+        self.aes_funcs.master_opts_doc = None
+
+    def test_master_opts(self):
+        # The options the minion file client asks for, without an id
+        mopts = self.aes_funcs._master_opts({'cmd': '_master_opts'})
+        self.assertEqual(mopts['renderer'], 'yaml_jinja')
+        self.assertEqual(mopts['state_top'], 'top.sls')
+        self.assertEqual(mopts['file_roots'], {'base': [], 'dev': []})
+        self.assertEqual(
+            self.aes_funcs._master_opts({'cmd': '_master_opts',
+                                         'env_only': True}),
+            {'file_roots': {'base': [], 'dev': []}})
+
+    def test_master_opts_doc(self):
+        ret = self.aes_funcs._master_opts_doc({'cmd': '_master_opts_doc',
+                                               'id': 'web1'})
+        self.assertEqual(ret['version'],
+                         salt.pillar.master_opts_doc(self.aes_funcs.opts)[0])
+        self.assertNotIn('aes', ret['opts'])
+        self.assertEqual(self.aes_funcs._master_opts_doc({}), {})
+        self.aes_funcs.opts['pillar_opts_lean'] = False
+        self.assertEqual(
+            self.aes_funcs._master_opts_doc({'id': 'web1'}), {})
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(MultiplexedMWorkerTestCase, AESKeyTestCase,
+              MinionKeyCacheTestCase, InotifyMinionKeyCacheTestCase,
+              ReturnTestCase, MasterOptsTestCase, MWorkerStopTestCase,
+              PillarTestCase, PublishCipherTestCase, needs_daemon=False)
@@ -7,6 +7,10 @@
     ~~~~~~~~~~~~~~~~~~~~~~~
 '''
 
+# Import python libs
+import tempfile
+import threading
+
 # Import Salt Testing libs
 from salttesting import skipIf, TestCase
 from salttesting.helpers import ensure_in_syspath, MockWraps
@@ -48,6 +52,64 @@ class PayloadTestCase(TestCase):
             self.assertEqual(idata, odata)
 
 
+class SerialTestCase(TestCase):
+
+    def setUp(self):
+        self.serial = salt.payload.Serial({'serial': 'msgpack'})
+        self.data = {'jid': '20141218134518235862',
+                     'id': 'minion',
+                     'return': {'file_|-motd_|-/etc/motd_|-managed': {
+                         'result': True, 'changes': {}, 'comment': 'ok'}}}
+
+    def test_dumps(self):
+        self.assertEqual(self.serial.dumps(self.data),
+                         msgpack.packb(self.data))
+        self.assertEqual(self.serial.loads(self.serial.dumps(self.data)),
+                         self.data)
+        self.assertEqual(salt.payload.unpackage(
+                         salt.payload.package(self.data)), self.data)
+
+    def test_raw(self):
+        ret = self.serial.dumps(self.data['return'])
+        self.assertEqual(self.serial.dumps(salt.payload.Raw(ret)), ret)
+        load = dict(self.data, **{'return': salt.payload.Raw(ret)})
+        self.assertEqual(self.serial.loads(self.serial.dumps_raw(load)),
+                         self.data)
+
+    def test_iter_load(self):
+        with tempfile.TemporaryFile() as fp_:
+            for num in range(10):
+                fp_.write(self.serial.dumps(dict(self.data, num=num)))
+            fp_.seek(0)
+            self.assertEqual(
+                [msg['num'] for msg in self.serial.iter_load(fp_, 100)],
+                range(10)
+            )
+
+    def test_thread_packers(self):
+        serializer = self.serial.serializer
+        self.assertIs(salt.payload.Serial('msgpack').serializer, serializer)
+        packers = [serializer._packers.packer]
+        thread = threading.Thread(
+            target=lambda: packers.append(serializer._packers.packer))
+        thread.start()
+        thread.join()
+        self.assertIs(serializer._packers.packer, packers[0])
+        self.assertIsNot(packers[1], packers[0])
+
+    def test_failed_pack(self):
+        # A failed message must not leak into the next one
+        for dumps in (self.serial.dumps, self.serial.dumps_raw):
+            self.assertRaises(TypeError, dumps, {'a': {'b': object()}})
+            self.assertEqual(dumps({'b': 1}), msgpack.packb({'b': 1}))
+            self.assertEqual(self.serial.loads(dumps(self.data)), self.data)
+
+    def test_fallbacks(self):
+        self.assertIs(salt.payload.Serial('nope').serializer,
+                      self.serial.serializer)
+        self.assertEqual(self.serial.loads('\xc1'), {})
+
+
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(PayloadTestCase, needs_daemon=False)
+    run_tests(PayloadTestCase, SerialTestCase, needs_daemon=False)
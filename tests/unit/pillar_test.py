@@ -7,7 +7,12 @@
     ~~~~~~~~~~~~~~~~~~~~~~
 '''
 
+# Import python libs
+import os
+import shutil
 import tempfile
+import threading
+import time
 
 # Import Salt Testing libs
 from salttesting import skipIf, TestCase
@@ -16,7 +21,10 @@ from salttesting.mock import NO_MOCK, NO_MOCK_REASON, MagicMock, patch
 ensure_in_syspath('../')
 
 # Import salt libs
+import salt.config
 import salt.pillar
+import salt.template
+import salt.utils
 
 
 @skipIf(NO_MOCK, NO_MOCK_REASON)
@@ -173,6 +181,419 @@ ssh:
         client.get_state.side_effect = get_state
 
 
+PILLAR_FILES = {
+    'top.sls': '''
+base:
+  '*':
+    - common
+  'role:web':
+    - match: grain
+    - web
+''',
+    'common.sls': '''
+role: {{ grains['role'] }}
+id: {{ opts['id'] }}
+''',
+    'web.sls': '''
+web: True
+''',
+}
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class ReusedPillarTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        roots = os.path.join(self.tmpdir, 'pillar')
+        os.makedirs(roots)
+        for name, source in PILLAR_FILES.items():
+            with salt.utils.fopen(os.path.join(roots, name), 'w') as fp_:
+                fp_.write(source)
+        self.opts = dict(salt.config.DEFAULT_MASTER_OPTS)
+        self.opts.update({'cachedir': self.tmpdir,
+                          'pillar_roots': {'base': [roots]},
+                          'file_roots': {'base': [self.tmpdir]},
+                          'extension_modules': self.tmpdir,
+                          'pillar_opts': False,
+                          'ext_pillar': []})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_set_minion(self):
+        pillar = salt.pillar.Pillar(self.opts, {'role': 'web'}, 'web1',
+                                    None, functions={})
+        self.assertEqual(pillar.compile_pillar(),
+                         {'role': 'web', 'id': 'web1', 'web': True})
+        # The loaders are not built again
+        with patch('salt.loader.render', side_effect=AssertionError), \
+                patch('salt.loader.pillars', side_effect=AssertionError):
+            pillar.set_minion({'role': 'db'}, 'db1', None,
+                              {'libvirt': {}})
+            self.assertEqual(pillar.compile_pillar(),
+                             {'role': 'db', 'id': 'db1'})
+            self.assertEqual(pillar.opts['ext_pillar'], [{'libvirt': {}}])
+            pillar.set_minion({'role': 'web'}, 'web2', None)
+            self.assertEqual(pillar.compile_pillar(),
+                             {'role': 'web', 'id': 'web2', 'web': True})
+        # The ext of a minion is not added to the master options
+        self.assertEqual(pillar.opts['ext_pillar'], [])
+        self.assertEqual(self.opts['ext_pillar'], [])
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class PillarCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.roots = os.path.join(self.tmpdir, 'pillar')
+        os.makedirs(self.roots)
+        for name, source in PILLAR_FILES.items():
+            self.write(name, source)
+        self.opts = dict(salt.config.DEFAULT_MASTER_OPTS)
+        self.opts.update({'cachedir': self.tmpdir,
+                          'pillar_roots': {'base': [self.roots]},
+                          'file_roots': {'base': [self.tmpdir]},
+                          'extension_modules': self.tmpdir,
+                          'pillar_opts': False,
+                          'ext_pillar': [],
+                          'pillar_cache': True})
+        self.cache = salt.pillar.PillarCache(self.opts)
+        self.compiled = 0
+
+    def tearDown(self):
+        self.cache.watcher.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, source):
+        path = os.path.join(self.roots, name)
+        with salt.utils.fopen(path, 'w') as fp_:
+            fp_.write(source)
+        # Make sure the mtime of a rewritten file changes
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + len(source)))
+
+    def pillar(self, role='web', **kwargs):
+        load = {'id': 'web1', 'grains': {'role': role}, 'saltenv': None}
+        load.update(kwargs)
+        data = self.cache.get(load)
+        if data is None:
+            self.compiled += 1
+            pillar = salt.pillar.Pillar(self.opts, load['grains'], load['id'],
+                                        None, functions={})
+            with salt.template.track_files() as files:
+                data = pillar.compile_pillar()
+            self.cache.store(load, data, files)
+        return data
+
+    def test_hit(self):
+        self.assertEqual(self.pillar(),
+                         {'role': 'web', 'id': 'web1', 'web': True})
+        self.assertEqual(self.pillar(),
+                         {'role': 'web', 'id': 'web1', 'web': True})
+        self.assertEqual(self.compiled, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(
+            sorted(os.path.basename(path) for path in
+                   self.cache.cache.values()[0]['files']),
+            ['common.sls', 'top.sls', 'web.sls'])
+        # Another minion
+        self.pillar(id='web2')
+        self.assertEqual(self.compiled, 2)
+
+    def test_grains_change(self):
+        self.pillar()
+        self.assertEqual(self.pillar(role='db'), {'role': 'db', 'id': 'web1'})
+        self.assertEqual(self.compiled, 2)
+
+    def test_refresh(self):
+        self.pillar()
+        self.pillar(refresh=True)
+        self.pillar()
+        self.assertEqual(self.compiled, 2)
+
+    def test_file_change(self):
+        self.pillar()
+        self.pillar(id='web2')
+        self.pillar(role='db', id='db1')
+        # Only the pillars compiled from the file are dropped
+        self.write('web.sls', 'web: False')
+        self.assertFalse(self.pillar()['web'])
+        self.assertEqual(self.compiled, 4)
+        self.pillar(role='db', id='db1')
+        self.assertEqual(self.compiled, 4)
+        # A new file drops every pillar
+        self.write('other.sls', 'other: True')
+        self.pillar(role='db', id='db1')
+        self.assertEqual(self.compiled, 5)
+
+    def test_ttl(self):
+        self.pillar()
+        with patch('time.time', return_value=time.time() + 3601):
+            self.pillar()
+        self.assertEqual(self.compiled, 2)
+        self.opts['ext_pillar'] = [{'hiera': '/etc/hiera.yaml'}]
+        self.opts['ext_pillar_cache_ttl'] = {'hiera': 60, 'cmd_yaml': 0}
+        cache = salt.pillar.PillarCache(self.opts)
+        self.assertEqual(cache._ttl(None), 60)
+        self.assertEqual(cache._ttl({'libvirt': {}}), 60)
+        cache.ext_pillar = [{'cmd_yaml': 'cat /etc/salt/yaml'}]
+        load = {'id': 'web1', 'grains': {}}
+        cache.store(load, {'cmd': True}, set())
+        self.assertIsNone(cache.get(load))
+        cache.watcher.stop()
+
+    def test_shared(self):
+        self.pillar()
+        # The cache of another master worker
+        worker = self.cache
+        self.cache = salt.pillar.PillarCache(self.opts)
+        try:
+            self.pillar()
+            self.assertEqual(self.compiled, 1)
+            # A refresh in one worker is seen by the other
+            self.pillar(refresh=True)
+            self.assertEqual(self.compiled, 2)
+            self.cache, worker = worker, self.cache
+            self.pillar()
+            self.assertEqual(self.compiled, 2)
+            self.write('web.sls', 'web: False')
+            self.assertFalse(self.pillar()['web'])
+            self.cache, worker = worker, self.cache
+            self.assertFalse(self.pillar()['web'])
+            self.assertEqual(self.compiled, 3)
+        finally:
+            worker.watcher.stop()
+
+    def test_cleared(self):
+        self.pillar()
+        # The master was restarted
+        salt.pillar.clear_pillar_cache(self.opts)
+        self.pillar()
+        self.assertEqual(self.compiled, 2)
+
+    def test_errors_not_cached(self):
+        self.write('web.sls', '{{ undefined_variable.foo }}')
+        self.assertIn('_errors', self.pillar())
+        self.pillar()
+        self.assertEqual(self.compiled, 2)
+
+
+class ExtPillarTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.opts = dict(salt.config.DEFAULT_MASTER_OPTS)
+        self.opts.update({'cachedir': self.tmpdir,
+                          'pillar_roots': {'base': [self.tmpdir]},
+                          'file_roots': {'base': [self.tmpdir]},
+                          'extension_modules': self.tmpdir,
+                          'pillar_opts': False,
+                          'ext_pillar': [{'first': 0.3},
+                                         {'broken': 0},
+                                         {'second': 0.3}],
+                          'ext_pillar_threads': 4})
+        self.release = threading.Event()
+        self.seen = {}
+
+    def tearDown(self):
+        self.release.set()
+        shutil.rmtree(self.tmpdir)
+
+    def source(self, name):
+        def ext_pillar(minion_id, pillar, delay):
+            self.seen[name] = dict(pillar)
+            time.sleep(delay)
+            return {name: minion_id, 'last': name}
+        return ext_pillar
+
+    def broken(self, minion_id, pillar, delay):
+        raise ValueError('broken')
+
+    def hung(self, minion_id, pillar, delay):
+        self.release.wait()
+        return {'hung': True}
+
+    def pillar(self):
+        pillar = salt.pillar.Pillar(self.opts, {}, 'web1', None, functions={})
+        pillar.ext_pillars = {'first': self.source('first'),
+                              'second': self.source('second'),
+                              'broken': self.broken,
+                              'hung': self.hung}
+        return pillar
+
+    def test_concurrent(self):
+        pillar = self.pillar()
+        start = time.time()
+        data = pillar.ext_pillar({'sls': True}, None)
+        self.assertLess(time.time() - start, 0.55)
+        # Merged in the configured order
+        self.assertEqual(data, {'sls': True, 'first': 'web1',
+                                'second': 'web1', 'last': 'second'})
+        # Every source gets the pillar of the SLS files
+        self.assertEqual(self.seen['second'], {'sls': True})
+        self.assertEqual(
+            [(item['name'], item['result'])
+             for item in pillar.ext_pillar_times],
+            [('first', 'ok'), ('broken', 'error'), ('second', 'ok')])
+        self.assertGreaterEqual(pillar.ext_pillar_times[0]['time'], 0.3)
+
+    def test_sequential(self):
+        self.opts['ext_pillar_threads'] = 0
+        pillar = self.pillar()
+        data = pillar.ext_pillar({'sls': True}, None)
+        self.assertEqual(data['last'], 'second')
+        # A source sees the data of the ones before it
+        self.assertEqual(self.seen['second'],
+                         {'sls': True, 'first': 'web1', 'last': 'first'})
+        self.assertEqual(len(pillar.ext_pillar_times), 3)
+
+    def test_timeout(self):
+        self.opts['ext_pillar'] = [{'hung': 0}, {'first': 0}]
+        self.opts['ext_pillar_timeouts'] = {'hung': 0.2}
+        pillar = self.pillar()
+        start = time.time()
+        data = pillar.ext_pillar({}, None)
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(data, {'first': 'web1', 'last': 'first'})
+        self.assertEqual(pillar.ext_pillar_times[0]['result'], 'timeout')
+        self.assertEqual(pillar._ext_pillar_timeout('first'), 60)
+        pillar.opts['ext_pillar_timeout'] = 0
+        self.assertIsNone(pillar._ext_pillar_timeout('first'))
+
+
+    def test_single_source_timeout(self):
+        self.opts['ext_pillar'] = [{'hung': 0}]
+        self.opts['ext_pillar_timeout'] = 0.2
+        pillar = self.pillar()
+        start = time.time()
+        self.assertEqual(pillar.ext_pillar({'sls': True}, None),
+                         {'sls': True})
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(pillar.ext_pillar_times[0]['result'], 'timeout')
+
+    def test_timeout_from_start(self):
+        # The second source waits for the only thread before it runs
+        self.opts['ext_pillar'] = [{'first': 0.3}, {'second': 0.3}]
+        self.opts['ext_pillar_threads'] = 1
+        self.opts['ext_pillar_timeout'] = 0.5
+        pillar = self.pillar()
+        data = pillar.ext_pillar({}, None)
+        self.assertEqual(data['last'], 'second')
+        self.assertEqual([item['result'] for item in pillar.ext_pillar_times],
+                         ['ok', 'ok'])
+
+    def test_stuck_pool_replaced(self):
+        self.opts['ext_pillar'] = [{'hung': 0}]
+        self.opts['ext_pillar_threads'] = 1
+        self.opts['ext_pillar_timeout'] = 0.2
+        self.pillar().ext_pillar({}, None)
+        # The thread of the pool is still stuck in the hung source
+        self.opts['ext_pillar'] = [{'first': 0}]
+        pillar = self.pillar()
+        self.assertEqual(pillar.ext_pillar({}, None),
+                         {'first': 'web1', 'last': 'first'})
+        self.assertEqual(pillar.ext_pillar_times[0]['result'], 'ok')
+
+
+class FakeChannel(object):
+    '''
+    Serve the shared master options like the master does
+    '''
+    def __init__(self, version, doc):
+        self.version = version
+        self.doc = doc
+        self.loads = []
+
+    def send(self, load, tries=3, timeout=60):
+        self.loads.append(load)
+        return {'version': self.version, 'opts': self.doc}
+
+    def crypted_transfer_decode_dictentry(self, load, dictkey=None, tries=3,
+                                          timeout=60):
+        self.loads.append(load)
+        return self.pillar
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class LeanPillarTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        roots = os.path.join(self.tmpdir, 'pillar')
+        os.makedirs(roots)
+        for name, source in PILLAR_FILES.items():
+            with salt.utils.fopen(os.path.join(roots, name), 'w') as fp_:
+                fp_.write(source)
+        self.opts = dict(salt.config.DEFAULT_MASTER_OPTS)
+        self.opts.update({'cachedir': self.tmpdir,
+                          'pillar_roots': {'base': [roots]},
+                          'file_roots': {'base': [self.tmpdir]},
+                          'extension_modules': self.tmpdir,
+                          'ext_pillar': [],
+                          'aes': 'secret'})
+        salt.pillar._MASTER_OPTS.clear()
+
+    def tearDown(self):
+        salt.pillar._MASTER_OPTS.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def test_ref(self):
+        pillar = salt.pillar.Pillar(self.opts, {'role': 'web'}, 'web1',
+                                    None, functions={})
+        mopts = pillar.compile_pillar()['master']
+        version, doc = salt.pillar.master_opts_doc(self.opts)
+        self.assertNotIn('aes', doc)
+        self.assertEqual(salt.pillar.master_opts_doc(dict(self.opts))[0],
+                         version)
+        ref = salt.pillar.master_opts_ref(mopts, version, doc)
+        self.assertEqual(ref['_version'], version)
+        self.assertEqual(ref['id'], 'web1')
+        self.assertLess(len(ref), 8)
+        self.assertEqual(salt.pillar.expand_master_opts(ref, doc), mopts)
+        # Other master options have another version
+        self.opts['timeout'] = 1234
+        self.assertNotEqual(salt.pillar.master_opts_doc(self.opts)[0],
+                            version)
+
+    def remote(self, channel):
+        opts = {'cachedir': self.tmpdir, 'serial': 'msgpack'}
+        with patch('salt.transport.Channel.factory', return_value=channel):
+            return salt.pillar.RemotePillar(opts, {}, 'web1', None)
+
+    def test_remote(self):
+        version, doc = salt.pillar.master_opts_doc(self.opts)
+        channel = FakeChannel(version, doc)
+        channel.pillar = {'role': 'web',
+                          'master': {'_version': version, 'id': 'web1'}}
+        expected = dict(doc, id='web1')
+        self.assertEqual(self.remote(channel).compile_pillar()['master'],
+                         expected)
+        self.assertTrue(channel.loads[0]['master_opts_ref'])
+        self.assertEqual(channel.loads[1], {'cmd': '_master_opts_doc',
+                                            'id': 'web1',
+                                            'version': version})
+        # Fetched once
+        channel.pillar['master'] = {'_version': version, 'id': 'web1'}
+        self.remote(channel).compile_pillar()
+        self.assertEqual(len(channel.loads), 3)
+        # Read from the cachedir
+        salt.pillar._MASTER_OPTS.clear()
+        channel.pillar['master'] = {'_version': version, 'id': 'web1'}
+        self.assertEqual(self.remote(channel).compile_pillar()['master'],
+                         expected)
+        self.assertEqual(len(channel.loads), 4)
+
+    def test_full_master(self):
+        channel = FakeChannel(None, None)
+        channel.pillar = {'master': {'id': 'web1'}}
+        self.assertEqual(self.remote(channel).compile_pillar(),
+                         {'master': {'id': 'web1'}})
+        self.assertEqual(len(channel.loads), 1)
+
+
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(PillarTestCase, needs_daemon=False)
+    run_tests(PillarTestCase, ReusedPillarTestCase, PillarCacheTestCase,
+              ExtPillarTestCase, LeanPillarTestCase, needs_daemon=False)
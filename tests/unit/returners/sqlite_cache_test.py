@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.returners.sqlite_cache_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+'''
+
+# Import python libs
+import datetime
+import shutil
+import tempfile
+import threading
+
+# Import Salt Testing libs
+from salttesting import TestCase, skipIf
+from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import NO_MOCK, NO_MOCK_REASON, patch
+
+ensure_in_syspath('../../')
+
+# Import salt libs
+import salt.payload
+import salt.utils
+import salt.utils.job_cache
+from salt.returners import sqlite_cache
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+@skipIf(not sqlite_cache.HAS_SQLITE3, 'sqlite3 is not available')
+class SqliteCacheTestCase(TestCase):
+    '''
+    Test the sqlite job cache returner
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        sqlite_cache.__opts__ = {'cachedir': self.tmpdir,
+                                 'serial': 'msgpack',
+                                 'keep_jobs': 24,
+                                 'sqlite_cache.shards': 2}
+
+    def tearDown(self):
+        for key, conn in sqlite_cache._CONNS.items():
+            # The connections of the writer threads are closed once dropped
+            if key[1] == threading.current_thread().ident:
+                conn.close()
+        sqlite_cache._CONNS.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def _job(self, fun='test.ping'):
+        jid = sqlite_cache.prep_jid()
+        sqlite_cache.save_load(jid, {'fun': fun, 'arg': [], 'jid': jid})
+        return jid
+
+    def test_returns(self):
+        jid = self._job()
+        sqlite_cache.returner({'jid': jid, 'id': 'web1', 'return': True})
+        sqlite_cache.returner_batch([
+            {'jid': jid, 'id': 'web2', 'return': {'a': 1}, 'out': 'nested'},
+            # A replayed return is dropped
+            {'jid': jid, 'id': 'web1', 'return': False},
+            # An unknown jid is dropped
+            {'jid': '20140101000000000000', 'id': 'web1', 'return': False},
+        ])
+        self.assertEqual(
+            sqlite_cache.get_jid(jid),
+            {'web1': {'return': True},
+             'web2': {'return': {'a': 1}, 'out': 'nested'}}
+        )
+        self.assertEqual(sqlite_cache.get_load(jid)['fun'], 'test.ping')
+        self.assertEqual(sqlite_cache.get_load('20140101000000000000'), {})
+        self.assertEqual(sqlite_cache.get_minion_jids('web2'), [jid])
+
+    def test_raw_return(self):
+        jid = self._job()
+        serial = salt.payload.Serial(sqlite_cache.__opts__)
+        # The master hands on the return serialized once
+        sqlite_cache.returner({'jid': jid, 'id': 'web1',
+                               'return': salt.payload.Raw(
+                                   serial.dumps({'a': 1}))})
+        self.assertEqual(sqlite_cache.get_jid(jid),
+                         {'web1': {'return': {'a': 1}}})
+
+    def test_pending_returns(self):
+        jid = self._job()
+        writer = salt.utils.job_cache.ReturnWriter(
+            dict(sqlite_cache.__opts__, master_job_cache='sqlite_cache',
+                 job_cache_batch_interval=60),
+            {'sqlite_cache.returner_batch': sqlite_cache.returner_batch})
+        writer.put({'jid': jid, 'id': 'web1', 'return': True})
+        # Queued and not written yet
+        self.assertEqual(sqlite_cache.get_jid(jid), {'web1': {'return': True}})
+        writer.flush()
+        self.assertEqual(sqlite_cache.get_jid(jid), {'web1': {'return': True}})
+
+    def test_nocache(self):
+        jid = sqlite_cache.prep_jid(nocache=True)
+        sqlite_cache.returner({'jid': jid, 'id': 'web1', 'return': True})
+        self.assertEqual(sqlite_cache.get_jid(jid), {})
+
+    def test_standalone_return(self):
+        load = {'jid': 'req', 'id': 'web1', 'return': True}
+        sqlite_cache.returner(load)
+        self.assertNotEqual(load['jid'], 'req')
+        self.assertEqual(
+            sqlite_cache.get_jid(load['jid']), {'web1': {'return': True}}
+        )
+
+    def test_get_jids(self):
+        jids = [self._job('test.ping'), self._job('test.echo')]
+        ret = sqlite_cache.get_jids()
+        self.assertEqual(sorted(ret), jids)
+        self.assertEqual(ret[jids[1]]['Function'], 'test.echo')
+        self.assertEqual(list(sqlite_cache.get_jids(start=jids[1])), [jids[1]])
+        self.assertEqual(list(sqlite_cache.get_jids(end=jids[1])), [jids[0]])
+        self.assertEqual(
+            sqlite_cache.get_jids(
+                end=datetime.datetime.now() - datetime.timedelta(hours=1)
+            ),
+            {}
+        )
+
+    def test_clean_old_jobs(self):
+        old = datetime.datetime.now() - datetime.timedelta(hours=48)
+        with patch('salt.utils.gen_jid',
+                   return_value='{0:%Y%m%d%H%M%S%f}'.format(old)):
+            old_jid = self._job()
+        sqlite_cache.returner({'jid': old_jid, 'id': 'web1', 'return': True})
+        new_jid = self._job()
+        sqlite_cache.clean_old_jobs()
+        self.assertEqual(list(sqlite_cache.get_jids()), [new_jid])
+        self.assertEqual(sqlite_cache.get_jid(old_jid), {})
+        self.assertEqual(sqlite_cache.get_minion_jids('web1'), [])
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(SqliteCacheTestCase, needs_daemon=False)
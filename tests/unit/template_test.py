@@ -3,6 +3,11 @@
     :codeauthor: :email: `Mike Place <mp@saltstack.com>`
 '''
 
+# Import python libs
+import os
+import shutil
+import tempfile
+
 # Import Salt Testing libs
 from salttesting import TestCase
 from salttesting.helpers import ensure_in_syspath
@@ -10,6 +15,10 @@ from salttesting.helpers import ensure_in_syspath
 ensure_in_syspath('../')
 
 # Import Salt libs
+import salt.config
+import salt.pillar
+import salt.utils
+import salt.utils.templates
 from salt import template
 
 
@@ -35,6 +44,206 @@ class TemplateTestCase(TestCase):
         self.assertIn(('fake_json_func', ''), ret)
         self.assertNotIn(('OBVIOUSLY_NOT_HERE', ''), ret)
 
+
+PILLAR_FILES = {
+    'top.sls': '''
+base:
+  '*':
+    - role
+    - calls
+    - include
+''',
+    'role.sls': '''
+role: {{ grains['role'] }}
+{% if 'site' in grains %}
+site: {{ grains['site'] }}
+{% endif %}
+''',
+    'calls.sls': '''
+os: {{ salt['grains.get']('os') }}
+''',
+    'include.sls': '''
+{% from 'lib.jinja' import port %}
+port: {{ port }}
+''',
+    'lib.jinja': '''
+{% set port = 80 %}
+''',
+}
+
+
+class RenderCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.roots = os.path.join(self.tmpdir, 'pillar')
+        os.makedirs(self.roots)
+        for name, source in PILLAR_FILES.items():
+            self.write(name, source)
+        self.opts = dict(salt.config.DEFAULT_MASTER_OPTS)
+        self.opts.update({'cachedir': self.tmpdir,
+                          'pillar_roots': {'base': [self.roots]},
+                          'file_roots': {'base': [self.tmpdir]},
+                          'extension_modules': self.tmpdir,
+                          'pillar_opts': False,
+                          'ext_pillar': [],
+                          'render_cache': True})
+        self.calls = []
+        self.grains = {'role': 'web', 'os': 'Debian'}
+        self.functions = {'grains.get': self.grains_get,
+                          'test.random': self.random}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, source):
+        path = os.path.join(self.roots, name)
+        with salt.utils.fopen(path, 'w') as fp_:
+            fp_.write(source)
+        # Make sure the mtime of a rewritten file changes
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + len(source)))
+
+    def grains_get(self, key):
+        self.calls.append(key)
+        return self.grains.get(key)
+
+    def random(self):
+        self.calls.append('random')
+        return len(self.calls)
+
+    def pillar(self, grains, id_='web1'):
+        return salt.pillar.Pillar(self.opts, grains, id_, None,
+                                  functions=self.functions)
+
+    def test_reuse(self):
+        pillar = self.pillar(self.grains)
+        expected = {'role': 'web', 'os': 'Debian', 'port': 80}
+        self.assertEqual(pillar.compile_pillar(), expected)
+        self.assertEqual(pillar.render_cache.hits, 0)
+        misses = pillar.render_cache.misses
+        # Another minion with the same grains gets the same data, the
+        # functions called are checked again
+        pillar.set_minion(dict(self.grains), 'web2', None)
+        del self.calls[:]
+        self.assertEqual(pillar.compile_pillar(), expected)
+        self.assertEqual(pillar.render_cache.hits, misses)
+        self.assertEqual(self.calls, ['os'])
+
+    def test_inputs_change(self):
+        pillar = self.pillar(self.grains)
+        pillar.compile_pillar()
+        pillar.set_minion({'role': 'db', 'os': 'Debian'}, 'db1', None)
+        self.assertEqual(pillar.compile_pillar()['role'], 'db')
+        # A missing key which is then set is noticed
+        pillar.set_minion({'role': 'db', 'os': 'Debian', 'site': 'par'},
+                          'db2', None)
+        self.assertEqual(pillar.compile_pillar()['site'], 'par')
+        self.grains['os'] = 'RedHat'
+        self.assertEqual(pillar.compile_pillar()['os'], 'RedHat')
+        # Both sets of grains are kept
+        pillar.set_minion({'role': 'web', 'os': 'RedHat'}, 'web1', None)
+        hits = pillar.render_cache.hits
+        self.assertEqual(pillar.compile_pillar()['role'], 'web')
+        self.assertEqual(pillar.render_cache.hits, hits + 4)
+
+    def test_included_file_change(self):
+        pillar = self.pillar(self.grains)
+        self.assertEqual(pillar.compile_pillar()['port'], 80)
+        self.write('lib.jinja', '{% set port = 8080 %}')
+        self.assertEqual(pillar.compile_pillar()['port'], 8080)
+
+    def test_uncached_function(self):
+        self.write('calls.sls', "rand: {{ salt['test.random']() }}")
+        pillar = self.pillar(self.grains)
+        self.assertEqual(pillar.compile_pillar()['rand'], 1)
+        self.assertEqual(pillar.compile_pillar()['rand'], 2)
+
+    def test_volatile(self):
+        for source in ('rand: {{ range(100)|random }}',
+                       'rand: {{ lipsum() }}',
+                       "now: {{ None|strftime('%s') }}",
+                       "date: {{ '1040814000'|strftime }}"):
+            self.write('calls.sls', source)
+            pillar = self.pillar(self.grains)
+            pillar.compile_pillar()
+            misses = pillar.render_cache.misses
+            pillar.compile_pillar()
+            # Only calls.sls is rendered again
+            self.assertEqual(pillar.render_cache.hits, misses - 1)
+        # The date of a timestamp does not change
+        self.write('calls.sls', 'date: {{ 1040814000|strftime }}')
+        pillar = self.pillar(self.grains)
+        pillar.compile_pillar()
+        misses = pillar.render_cache.misses
+        pillar.compile_pillar()
+        self.assertEqual(pillar.render_cache.hits, misses)
+
+    def test_cached_data_copied(self):
+        pillar = self.pillar(self.grains)
+        pillar.compile_pillar()['role'] = 'changed'
+        self.assertEqual(pillar.compile_pillar()['role'], 'web')
+
+    def test_serialized_inputs(self):
+        self.write('calls.sls', "grains: {{ grains|yaml }}\n"
+                                "json: {{ grains|json }}")
+        pillar = self.pillar(self.grains)
+        self.assertEqual(pillar.compile_pillar()['grains'], self.grains)
+        self.assertEqual(pillar.compile_pillar()['json'], self.grains)
+        pillar.set_minion(dict(self.grains, site='par'), 'web1', None)
+        self.assertEqual(pillar.compile_pillar()['grains']['site'], 'par')
+
+    def test_copied_inputs(self):
+        self.write('calls.sls', "{% set copied = {} %}"
+                                "{% do copied.update(grains) %}"
+                                "copied: {{ copied|json }}\n"
+                                "kwargs: {{ dict(**grains)|json }}")
+        pillar = self.pillar(self.grains)
+        self.assertEqual(pillar.compile_pillar()['copied'], self.grains)
+        pillar.set_minion(dict(self.grains, site='par'), 'web1', None)
+        data = pillar.compile_pillar()
+        self.assertEqual(data['copied']['site'], 'par')
+        self.assertEqual(data['kwargs']['site'], 'par')
+
+    def test_size(self):
+        self.opts['render_cache_size'] = 2
+        pillar = self.pillar(self.grains)
+        pillar.compile_pillar()
+        self.assertEqual(len(pillar.render_cache.data), 2)
+
+    def test_disabled(self):
+        self.opts['render_cache'] = False
+        pillar = self.pillar(self.grains)
+        self.assertIsNone(pillar.render_cache)
+        self.assertEqual(pillar.compile_pillar()['role'], 'web')
+
+
+class JinjaCodeCacheTestCase(TestCase):
+
+    def render(self, tmplstr, **opts):
+        context = {'opts': opts, 'saltenv': None, 'name': 'world'}
+        return salt.utils.templates.render_jinja_tmpl(tmplstr, context)
+
+    def test_reuse(self):
+        tmplstr = u'{% if True %}\nhello {{ name }}{% endif %}'
+        self.assertEqual(self.render(tmplstr), u'\nhello world')
+        code = salt.utils.templates._JINJA_CODE[(tmplstr, False, False)]
+        self.assertEqual(self.render(tmplstr), u'\nhello world')
+        self.assertIs(
+            salt.utils.templates._JINJA_CODE[(tmplstr, False, False)], code)
+        # The whitespace options change the code
+        self.assertEqual(self.render(tmplstr, jinja_trim_blocks=True),
+                         u'hello world')
+
+    def test_size(self):
+        for num in range(salt.utils.templates.JINJA_CODE_CACHE_SIZE + 10):
+            self.render(u'{0}'.format(num))
+        self.assertEqual(len(salt.utils.templates._JINJA_CODE),
+                         salt.utils.templates.JINJA_CODE_CACHE_SIZE)
+        self.assertNotIn((u'0', False, False),
+                         salt.utils.templates._JINJA_CODE)
+
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(TemplateTestCase, needs_daemon=False)
+    run_tests(TemplateTestCase, RenderCacheTestCase, JinjaCodeCacheTestCase,
+              needs_daemon=False)
@@ -14,6 +14,8 @@ ensure_in_syspath('../../')
 # Import salt libs
 from salt.utils import cache
 
+import copy
+import pickle
 import time
 
 
@@ -45,6 +47,52 @@ class CacheDictTestCase(TestCase):
         self.assertRaises(KeyError, cd.__getitem__, 'foo')
 
 
+class RecordingDictTestCase(TestCase):
+
+    def setUp(self):
+        self.orig = {'os': 'Debian', 'roles': ['web']}
+        self.record = cache.RecordingDict(self.orig)
+
+    def test_lookups(self):
+        self.assertEqual(self.record['os'], 'Debian')
+        self.assertNotIn('site', self.record)
+        self.assertEqual(self.record.deps(),
+                         {'all': False, 'values': {'os': 'Debian'},
+                          'missing': ['site']})
+
+    def test_copies(self):
+        for copier in (copy.copy, copy.deepcopy, lambda data: data.copy(),
+                       lambda data: pickle.loads(pickle.dumps(data, 2))):
+            record = cache.RecordingDict(self.orig)
+            ret = copier(record)
+            self.assertIs(type(ret), dict)
+            self.assertEqual(ret, self.orig)
+            self.assertTrue(record.used_all)
+
+    def test_writes(self):
+        self.record.update({'site': 'par'}, id='web1')
+        self.assertEqual(self.record.setdefault('os', 'RedHat'), 'Debian')
+        self.record.setdefault('env', 'prod')
+        self.assertEqual(self.orig['site'], 'par')
+        self.assertEqual(self.orig['id'], 'web1')
+        self.assertEqual(self.orig['env'], 'prod')
+        self.assertFalse(self.record.used_all)
+
+    def test_mapping(self):
+        # C code copying the view goes through its keys
+        for copier in (dict, lambda data: (lambda **kwargs: kwargs)(**data),
+                       lambda data: {}.update(data)):
+            record = cache.RecordingDict(self.orig)
+            mapping = cache.RecordingMapping(record)
+            copier(mapping)
+            self.assertTrue(record.used_all)
+        mapping = cache.RecordingMapping(cache.RecordingDict(self.orig))
+        self.assertEqual(mapping['os'], 'Debian')
+        self.assertEqual(mapping, self.orig)
+        self.assertEqual(copy.deepcopy(mapping), self.orig)
+
+
+
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(CacheDictTestCase, needs_daemon=False)
+    run_tests(CacheDictTestCase, RecordingDictTestCase, needs_daemon=False)
@@ -9,7 +9,12 @@
 
 # Import python libs
 import os
+import copy
+import json
+import pickle
 import hashlib
+import shutil
+import tempfile
 import time
 import zmq
 from contextlib import contextmanager
@@ -23,6 +28,7 @@ ensure_in_syspath('../../')
 
 # Import salt libs
 import integration
+import salt.payload
 from salt.utils.process import clean_proc
 from salt.utils import event
 
@@ -34,8 +40,9 @@ if getattr(zmq, 'IPC_PATH_MAX_LEN', 103) <= 103:
 
 
 @contextmanager
-def eventpublisher_process():
-    proc = event.EventPublisher({'sock_dir': SOCK_DIR})
+def eventpublisher_process(**opts):
+    opts['sock_dir'] = SOCK_DIR
+    proc = event.EventPublisher(opts)
     proc.start()
     try:
         if os.environ.get('TRAVIS_PYTHON_VERSION', None) is not None:
@@ -262,6 +269,139 @@ class TestSaltEvent(TestCase):
             self.assertGotEvent(evt2, {'data': 'foo2'})
             self.assertGotEvent(evt1, {'data': 'foo1'})
 
+    def test_event_split(self):
+        '''Test tag and data are split without deserializing'''
+        self.assertEqual(event.SaltEvent.split('{0:|<20}\x81data'.format('evt1')),
+                         ('evt1', '\x81data'))
+        self.assertEqual(
+            event.SaltEvent.split('salt/job/20141018123456789012/new\n\ndata'),
+            ('salt/job/20141018123456789012/new', 'data')
+        )
+
+    def test_event_publisher_frames(self):
+        '''Test the publisher sends the tag and the header in frames of their own'''
+        with eventpublisher_process():
+            me = event.MasterEvent(SOCK_DIR)
+            me.fire_event({'data': 'foo1', 'jid': '1234', 'id': 'minion1'},
+                          'salt/job/1234/ret/minion1')
+            self.assertTrue(me.poller.poll(5000))
+            tag, header, data = me.sub.recv_multipart()
+            self.assertEqual(tag, 'salt/job/1234/ret/minion1')
+            self.assertEqual(me.serial.loads(header),
+                             {'jid': '1234', 'id': 'minion1', 'size': len(data)})
+            self.assertEqual(me.serial.loads(data)['data'], 'foo1')
+
+    def test_event_lazy_data(self):
+        '''Test the data of an event is only deserialized once it is used'''
+        with eventpublisher_process():
+            me = event.MasterEvent(SOCK_DIR)
+            me.fire_event({'data': 'foo1', 'fun': 'test.ping'}, 'evt1')
+            evt = me.get_event(tag='evt1', full=True)
+            self.assertIsInstance(evt, event.LazyEvent)
+            self.assertEqual(evt['tag'], 'evt1')
+            self.assertEqual(evt.header['fun'], 'test.ping')
+            self.assertNotIn('data', evt._dict)
+            self.assertIn('data', evt)
+            self.assertGotEvent(evt['data'], {'data': 'foo1'})
+            self.assertEqual(sorted(dict(evt)), ['data', 'tag'])
+
+    def test_event_tag_subscription(self):
+        '''Test only the events of the subscribed tags are received'''
+        with eventpublisher_process():
+            me = event.MasterEvent(SOCK_DIR)
+            me.subscribe('salt/job/1234/')
+            me.subscribe('evt1')
+            me.unsubscribe('')
+            self.assertEqual(me.subscriptions, set(['salt/job/1234/', 'evt1']))
+            # Subscriptions are set up asynchronously
+            time.sleep(0.5)
+            me.fire_event({'data': 'foo1'}, 'salt/job/4321/ret/minion1')
+            me.fire_event({'data': 'foo2'}, 'evt2')
+            me.fire_event({'data': 'foo3'}, 'salt/job/1234/ret/minion1')
+            me.fire_event({'data': 'foo4'}, 'evt1')
+            evt = me.get_event(tag='', full=True)
+            self.assertEqual(evt['tag'], 'salt/job/1234/ret/minion1')
+            self.assertGotEvent(evt['data'], {'data': 'foo3'})
+            self.assertGotEvent(me.get_event(tag=''), {'data': 'foo4'})
+            self.assertIsNone(me.get_event(tag='', wait=1))
+            me.subscribe('')
+            me.fire_event({'data': 'foo2'}, 'evt2')
+            self.assertGotEvent(me.get_event(tag='evt2'), {'data': 'foo2'})
+
+    def test_lazy_event(self):
+        '''Test a lazy event acts like the dict of the event'''
+        serial = salt.payload.Serial({'serial': 'msgpack'})
+        mdata = serial.dumps({'jid': '1234', 'return': True})
+        evt = event.LazyEvent('evt1', mdata, serial)
+        self.assertEqual(evt.get('tag'), 'evt1')
+        self.assertEqual(evt.header, {'jid': '1234', 'size': len(mdata)})
+        evt = event.LazyEvent('evt1', mdata, serial)
+        self.assertEqual(serial.loads(serial.dumps(evt)),
+                         {'tag': 'evt1', 'data': {'jid': '1234', 'return': True}})
+        evt = event.LazyEvent('evt1', mdata, serial)
+        self.assertEqual(json.loads(json.dumps(dict(evt)))['data']['jid'],
+                         '1234')
+        evt = event.LazyEvent('evt1', mdata, serial)
+        self.assertEqual(evt.get('data'), {'jid': '1234', 'return': True})
+        self.assertRaises(KeyError, evt.__getitem__, 'missing')
+
+    def test_lazy_event_copies(self):
+        '''Test the copies of a lazy event have the data'''
+        serial = salt.payload.Serial({'serial': 'msgpack'})
+        mdata = serial.dumps({'jid': '1234'})
+        expected = {'tag': 'evt1', 'data': {'jid': '1234'}}
+
+        def update(evt):
+            ret = {}
+            ret.update(evt)
+            return ret
+
+        def kwargs(**kwargs):
+            return kwargs
+        for copier in (dict, update, lambda evt: dict(**evt),
+                       lambda evt: kwargs(**evt), copy.copy, copy.deepcopy,
+                       lambda evt: pickle.loads(pickle.dumps(evt)),
+                       lambda evt: pickle.loads(pickle.dumps(evt, 2))):
+            evt = event.LazyEvent('evt1', mdata, serial)
+            ret = copier(evt)
+            self.assertEqual(ret, expected)
+            self.assertIs(type(ret), dict)
+
+    def test_event_journal_seq(self):
+        '''Test journaled events are numbered and can be read back'''
+        cachedir = tempfile.mkdtemp()
+        try:
+            with eventpublisher_process(event_journal=True, cachedir=cachedir):
+                me = event.MasterEvent(SOCK_DIR)
+                me.fire_event({'data': 'foo1'}, 'evt1')
+                me.fire_event({'data': 'foo2'}, 'evt2')
+                evt1 = me.get_event(tag='evt1', full=True)
+                evt2 = me.get_event(tag='evt2', full=True)
+                self.assertEqual(evt2.seq, evt1.seq + 1)
+                journal = event.EventJournal({'cachedir': cachedir})
+                self.assertEqual(
+                    [(evt.seq, evt['tag'], evt['data']['data'])
+                     for evt in journal.read(since=evt1.seq - 1)],
+                    [(evt1.seq, 'evt1', 'foo1'), (evt2.seq, 'evt2', 'foo2')]
+                )
+        finally:
+            shutil.rmtree(cachedir)
+
+    def test_event_job_tracker(self):
+        '''Test the publisher fires the complete event of a job'''
+        with eventpublisher_process(job_tracker=True, timeout=5):
+            me = event.MasterEvent(SOCK_DIR)
+            me.subscribe('salt/job/1/complete')
+            me.unsubscribe('')
+            me.fire_event({'jid': '1', 'fun': 'test.ping',
+                           'minions': ['m1', 'm2']}, 'salt/job/1/new')
+            me.fire_event({'jid': '1', 'id': 'm2'}, 'salt/job/1/ret/m2')
+            me.fire_event({'jid': '1', 'id': 'm1'}, 'salt/job/1/ret/m1')
+            evt = me.get_event(tag='salt/job/1/', full=True)
+            self.assertEqual(evt['tag'], 'salt/job/1/complete')
+            self.assertEqual(evt['data']['minions'], ['m1', 'm2'])
+            self.assertEqual(evt['data']['stragglers'], [])
+
     def test_event_many(self):
         '''Test a large number of events, one at a time'''
         with eventpublisher_process():
@@ -285,6 +425,170 @@ class TestSaltEvent(TestCase):
                 self.assertGotEvent(evt, {'data': '{0}'.format(i)}, 'Event {0}'.format(i))
 
 
+class EventJournalTestCase(TestCase):
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+        self.opts = {'cachedir': self.cachedir,
+                     'event_journal_segment_size': 200,
+                     'event_journal_segments': 3}
+        self.journal = event.EventJournal(self.opts)
+        self.journal.open()
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.cachedir)
+
+    def append(self, tag, **data):
+        serial = self.journal.serial
+        mdata = serial.dumps(data)
+        mheader = serial.dumps(event.SaltEvent.make_header(data, len(mdata)))
+        return self.journal.append(tag, mheader, mdata)
+
+    def read(self, **kwargs):
+        return [(evt.seq, evt['tag'])
+                for evt in event.EventJournal(self.opts).read(**kwargs)]
+
+    def test_read(self):
+        self.assertEqual(self.append('salt/job/1/new', jid='1'), 1)
+        self.assertEqual(self.append('salt/job/2/new', jid='2'), 2)
+        self.assertEqual(self.append('salt/job/1/ret/m1', jid='1', id='m1'), 3)
+        # Nothing is read before the events are flushed
+        self.assertEqual(self.read(), [])
+        self.journal.flush()
+        self.assertEqual(self.read(),
+                         [(1, 'salt/job/1/new'),
+                          (2, 'salt/job/2/new'),
+                          (3, 'salt/job/1/ret/m1')])
+        self.assertEqual(self.read(tag='salt/job/1/', since=1),
+                         [(3, 'salt/job/1/ret/m1')])
+        evt = list(event.EventJournal(self.opts).read(since=2))[0]
+        self.assertEqual(evt.header['id'], 'm1')
+        self.assertEqual(evt['data'], {'jid': '1', 'id': 'm1'})
+
+    def test_rotate(self):
+        for ind in range(30):
+            self.append('evt', num=ind)
+        self.journal.flush()
+        segments = self.journal._segments()
+        self.assertEqual(len(segments), 3)
+        events = self.read()
+        self.assertEqual(events[0][0], segments[0])
+        self.assertEqual(events[-1][0], 30)
+        self.assertEqual(self.read(since=28), [(29, 'evt'), (30, 'evt')])
+        # Segments last written to before the start time are skipped
+        self.assertEqual(self.read(start_time=time.time() + 10), [])
+
+    def test_reopen(self):
+        self.append('evt1')
+        self.append('evt2')
+        self.journal.close()
+        # Cut the last record short, as if the publisher died writing it
+        path = self.journal._segment_path(1)
+        with open(path, 'r+b') as fp_:
+            fp_.truncate(os.path.getsize(path) - 3)
+        self.journal = event.EventJournal(self.opts)
+        self.journal.open()
+        self.assertEqual(self.journal.seq, 1)
+        self.assertEqual(self.append('evt3'), 2)
+        self.journal.flush()
+        self.assertEqual(self.read(), [(1, 'evt1'), (2, 'evt3')])
+
+
+class RecordingJobTracker(event.JobTracker):
+    '''
+    Record the find_job requests instead of publishing them
+    '''
+    def __init__(self, opts):
+        super(RecordingJobTracker, self).__init__(opts)
+        self.found = []
+
+    def find_job(self, jid, minions):
+        self.found.append((jid, sorted(minions)))
+
+
+class JobTrackerTestCase(TestCase):
+    def setUp(self):
+        self.tracker = RecordingJobTracker({'timeout': 5,
+                                            'gather_job_timeout': 2})
+        self.serial = self.tracker.serial
+
+    def events(self, frames):
+        ret = []
+        for tag, _, mdata in frames:
+            data = self.serial.loads(mdata)
+            self.assertIn('_stamp', data)
+            del data['_stamp']
+            ret.append((tag, data))
+        return ret
+
+    def fire(self, tag, now=0, **data):
+        frames = event.SaltEvent.make_frames(self.serial, tag, data)
+        return self.events(self.tracker.handle(*frames, now=now))
+
+    def check(self, now):
+        return self.events(self.tracker.check(now))
+
+    def complete(self, jid, minions, stragglers):
+        return [('salt/job/{0}/complete'.format(jid),
+                 {'jid': jid, 'minions': minions, 'stragglers': stragglers})]
+
+    def test_complete(self):
+        self.assertEqual(self.tracker.wait(), None)
+        self.fire('salt/job/1/new', jid='1', fun='test.ping',
+                  minions=['m1', 'm2'])
+        self.assertEqual(self.tracker.wait(now=1), 4001)
+        self.assertEqual(self.fire('salt/job/1/ret/m1', jid='1', id='m1'), [])
+        # Unrelated events are passed over
+        self.assertEqual(self.fire('salt/job/2/ret/m2', jid='2', id='m2'), [])
+        self.assertEqual(self.fire('1', jid='1', id='m2'), [])
+        self.assertEqual(self.fire('salt/job/1/ret/m2', jid='1', id='m2'),
+                         self.complete('1', ['m1', 'm2'], []))
+        self.assertEqual(self.tracker.jobs, {})
+        self.assertEqual(self.check(100), [])
+        self.assertEqual(self.tracker.found, [])
+
+    def test_no_minions(self):
+        self.assertEqual(self.fire('salt/job/1/new', jid='1', minions=[]),
+                         self.complete('1', [], []))
+
+    def test_stragglers(self):
+        self.fire('salt/job/1/new', jid='1', fun='test.ping',
+                  minions=['m1', 'm2', 'm3'])
+        self.fire('salt/job/1/ret/m1', jid='1', id='m1')
+        self.assertEqual(self.check(4), [])
+        self.assertEqual(self.tracker.found, [])
+        self.assertEqual(self.check(5), [])
+        self.assertEqual(self.tracker.found, [('1', ['m2', 'm3'])])
+        # The find_job job itself is not tracked
+        self.fire('salt/job/2/new', jid='2', fun='saltutil.find_job',
+                  arg=['1'], minions=['m2', 'm3'])
+        self.assertNotIn('2', self.tracker.jobs)
+        self.fire('salt/job/2/ret/m2', jid='2', id='m2',
+                  **{'return': {'jid': '1'}})
+        self.fire('salt/job/2/ret/m3', jid='2', id='m3', **{'return': {}})
+        self.assertEqual(self.tracker.wait(now=6), 1001)
+        # m2 still runs the job, which is given another 5 seconds
+        self.assertEqual(self.check(7),
+                         [('salt/job/1/running',
+                           {'jid': '1', 'running': ['m2']})])
+        self.assertEqual(self.check(11), [])
+        self.assertEqual(self.check(12), [])
+        self.assertEqual(self.tracker.found[-1], ('1', ['m2', 'm3']))
+        self.assertEqual(self.check(14),
+                         self.complete('1', ['m1', 'm2', 'm3'], ['m2', 'm3']))
+        self.assertEqual(self.tracker.finds, {})
+
+    def test_client_timeout(self):
+        self.fire('salt/job/1/new', jid='1', fun='test.sleep',
+                  minions=['m1'], timeout=60)
+        self.check(30)
+        self.assertEqual(self.tracker.found, [])
+        self.check(60)
+        self.assertEqual(self.tracker.found, [('1', ['m1'])])
+        self.assertEqual(self.check(62), self.complete('1', ['m1'], ['m1']))
+
+
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(TestSaltEvent, needs_daemon=False)
+    run_tests(TestSaltEvent, EventJournalTestCase, JobTrackerTestCase,
+              needs_daemon=False)
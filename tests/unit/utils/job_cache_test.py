@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.utils.job_cache_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the job cache write-behind queue
+'''
+
+# Import python libs
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Import Salt Testing libs
+from salttesting import TestCase
+from salttesting.helpers import ensure_in_syspath
+ensure_in_syspath('../../')
+
+# Import salt libs
+import salt.payload
+import salt.utils
+from salt.utils import job_cache
+
+
+class ReturnWriterTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.opts = {'master_job_cache': 'fake',
+                     'cachedir': self.tmpdir,
+                     'job_cache_batch_size': 3,
+                     'job_cache_batch_interval': 0.05,
+                     'job_cache_queue_size': 5}
+        self.written = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _loads(self, count):
+        return [{'jid': '1', 'id': 'minion{0}'.format(num), 'return': True}
+                for num in range(count)]
+
+    def test_batches(self):
+        batches = []
+        writer = job_cache.ReturnWriter(
+            self.opts, {'fake.returner_batch': batches.append})
+        for load in self._loads(7):
+            writer.put(load)
+        writer.flush()
+        self.assertEqual(sum(len(batch) for batch in batches), 7)
+        self.assertTrue(all(len(batch) <= 3 for batch in batches))
+
+    def test_single_returner(self):
+        writer = job_cache.ReturnWriter(
+            self.opts, {'fake.returner': self.written.append})
+        loads = self._loads(4)
+        for load in loads:
+            writer.put(load)
+        writer.flush()
+        self.assertEqual(self.written, loads)
+
+    def test_flush_does_not_wait(self):
+        self.opts['job_cache_batch_interval'] = 60
+        writer = job_cache.ReturnWriter(
+            self.opts, {'fake.returner': self.written.append})
+        writer.put(self._loads(1)[0])
+        start = time.time()
+        writer.flush()
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(len(self.written), 1)
+        writer.flush()
+
+    def test_failing_returner(self):
+        def returner(load):
+            if load['id'] == 'minion0':
+                raise IOError('disk full')
+            self.written.append(load)
+        writer = job_cache.ReturnWriter(self.opts, {'fake.returner': returner})
+        for load in self._loads(2):
+            writer.put(load)
+        writer.flush()
+        self.assertEqual([load['id'] for load in self.written], ['minion1'])
+
+    def test_backpressure(self):
+        release = threading.Event()
+
+        def returner_batch(batch):
+            release.wait()
+            self.written.extend(batch)
+        writer = job_cache.ReturnWriter(
+            self.opts, {'fake.returner_batch': returner_batch})
+        producer = threading.Thread(
+            target=lambda: [writer.put(load) for load in self._loads(20)])
+        producer.daemon = True
+        producer.start()
+        producer.join(0.5)
+        # The writer is stuck, so the bounded queue stops the producer
+        self.assertTrue(producer.is_alive())
+        release.set()
+        producer.join(5)
+        writer.flush()
+        self.assertEqual(len(self.written), 20)
+
+    def test_pending(self):
+        self.opts['job_cache_batch_interval'] = 60
+        writer = job_cache.ReturnWriter(
+            self.opts, {'fake.returner': self.written.append})
+        writer.put({'jid': '1', 'id': 'minion0',
+                    'return': salt.payload.Raw(
+                        writer.serial.dumps({'a': 1})),
+                    'out': 'nested'})
+        writer.put({'jid': '2', 'id': 'minion1', 'return': True})
+        # Seen by every process before the writer gets to it
+        self.assertEqual(self.written, [])
+        self.assertEqual(
+            job_cache.pending_returns(self.opts, '1'),
+            {'minion0': {'return': {'a': 1}, 'out': 'nested'}})
+        writer.flush()
+        self.assertEqual(len(self.written), 2)
+        self.assertEqual(job_cache.pending_returns(self.opts, '1'), {})
+        self.assertEqual(
+            os.listdir(os.path.join(self.tmpdir, job_cache.PENDING_DIR)), [])
+
+    def test_recover(self):
+        # The spool file of a worker which died
+        proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+        proc.wait()
+        spool_dir = os.path.join(self.tmpdir, job_cache.PENDING_DIR)
+        os.makedirs(spool_dir)
+        serial = salt.payload.Serial(self.opts)
+        path = os.path.join(spool_dir, '{0}-1-1.p'.format(proc.pid))
+        with salt.utils.fopen(path, 'wb') as fp_:
+            for load in self._loads(2):
+                fp_.write(serial.dumps(load))
+        writer = job_cache.ReturnWriter(
+            self.opts, {'fake.returner': self.written.append})
+        writer.start()
+        writer.flush()
+        self.assertEqual(self.written, self._loads(2))
+        self.assertEqual(os.listdir(spool_dir), [])
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(ReturnWriterTestCase, needs_daemon=False)
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.utils.minions_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the minion targeting routines
+'''
+
+# Import python libs
+import os
+import shutil
+import tempfile
+import time
+
+# Import Salt Testing libs
+from salttesting import TestCase, skipIf
+from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import NO_MOCK, NO_MOCK_REASON, patch
+ensure_in_syspath('../../')
+
+# Import salt libs
+import salt.payload
+import salt.utils
+from salt.utils import minions
+
+
+class CkMinionsTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.opts = {'pki_dir': os.path.join(self.tmpdir, 'pki'),
+                     'cachedir': os.path.join(self.tmpdir, 'cache'),
+                     'transport': 'zeromq',
+                     'minion_data_cache': True,
+                     'serial': 'msgpack'}
+        os.makedirs(os.path.join(self.opts['pki_dir'], 'minions'))
+        os.makedirs(os.path.join(self.opts['cachedir'], 'minions'))
+        self.serial = salt.payload.Serial(self.opts)
+        self.add_minion('web1', {'os': 'Ubuntu', 'ipv4': ['10.0.0.1']},
+                        {'role': 'web'})
+        self.add_minion('web2', {'os': 'CentOS', 'ipv4': ['10.0.1.2']},
+                        {'role': 'web'})
+        self.add_minion('db1', {'os': 'Ubuntu', 'ipv4': ['192.168.0.5']},
+                        {'role': 'db'})
+        minions._INDEXES.clear()
+        self.ckminions = minions.CkMinions(self.opts)
+
+    def tearDown(self):
+        minions._INDEXES.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def add_minion(self, id_, grains=None, pillar=None):
+        with salt.utils.fopen(
+                os.path.join(self.opts['pki_dir'], 'minions', id_), 'w'):
+            pass
+        if grains is not None:
+            self.write_data(id_, grains, pillar)
+
+    def write_data(self, id_, grains, pillar):
+        cdir = os.path.join(self.opts['cachedir'], 'minions', id_)
+        if not os.path.isdir(cdir):
+            os.makedirs(cdir)
+        with salt.utils.fopen(os.path.join(cdir, 'data.p'), 'w+b') as fp_:
+            fp_.write(self.serial.dumps({'grains': grains, 'pillar': pillar}))
+        minions.minion_data_changed(self.opts, id_)
+
+    def check(self, expr, expr_form):
+        return sorted(self.ckminions.check_minions(expr, expr_form))
+
+    def test_id_matchers(self):
+        self.assertEqual(self.check('web*', 'glob'), ['web1', 'web2'])
+        self.assertEqual(self.check('web1,db1,nope', 'list'), ['db1', 'web1'])
+        self.assertEqual(self.check(r'^web\d$', 'pcre'), ['web1', 'web2'])
+
+    def test_data_matchers(self):
+        self.assertEqual(self.check('os:Ubuntu', 'grain'), ['db1', 'web1'])
+        self.assertEqual(self.check('os:Cent.*', 'grain_pcre'), ['web2'])
+        self.assertEqual(self.check('role:web', 'pillar'), ['web1', 'web2'])
+        self.assertEqual(self.check('10.0.0.0/16', 'ipcidr'), ['web1', 'web2'])
+        self.assertEqual(self.check('192.168.0.5', 'ipcidr'), ['db1'])
+        self.assertEqual(self.check('10.0.0.0/16/1', 'ipcidr'), [])
+
+    def test_compound(self):
+        self.assertEqual(
+            self.check('G@os:Ubuntu and not L@web1,web2 or S@10.0.1.0/24',
+                       'compound'),
+            ['db1', 'web2']
+        )
+        self.assertEqual(
+            self.check('web* not I@role:db', 'compound'), ['web1', 'web2']
+        )
+        self.assertEqual(
+            self.check('( G@os:CentOS or db1 ) and E@.*1$', 'compound'),
+            ['db1']
+        )
+        self.assertEqual(self.check('G@os:Ubuntu and', 'compound'), [])
+        self.assertEqual(self.check('not web1', 'compound'), [])
+        self.assertEqual(self.check('( web1', 'compound'), [])
+        self.assertEqual(self.check('X@foo or web1', 'compound'), [])
+
+    def test_compile_compound(self):
+        tree = minions.compile_compound('G@os:Ubuntu and not E@^web')
+        self.assertEqual(
+            tree,
+            ('and', ('leaf', 'G', 'os:Ubuntu'), ('not', ('leaf', 'E', '^web')))
+        )
+        self.assertIs(
+            minions.compile_compound('G@os:Ubuntu and not E@^web'), tree
+        )
+
+    def test_minion_without_data_always_matches(self):
+        self.add_minion('new1')
+        self.assertEqual(
+            self.check('os:Ubuntu', 'grain'), ['db1', 'new1', 'web1']
+        )
+
+    def test_key_changes(self):
+        self.assertEqual(self.check('*', 'glob'), ['db1', 'web1', 'web2'])
+        os.remove(os.path.join(self.opts['pki_dir'], 'minions', 'web2'))
+        self.add_minion('app1', {'os': 'Ubuntu'}, {})
+        self.assertEqual(self.check('*', 'glob'), ['app1', 'db1', 'web1'])
+        self.assertEqual(
+            self.check('os:Ubuntu', 'grain'), ['app1', 'db1', 'web1']
+        )
+
+    def test_data_changes(self):
+        self.assertEqual(self.check('os:Ubuntu', 'grain'), ['db1', 'web1'])
+        self.write_data('web2', {'os': 'Ubuntu'}, {'role': 'db'})
+        self.assertEqual(
+            self.check('os:Ubuntu', 'grain'), ['db1', 'web1', 'web2']
+        )
+        self.assertEqual(self.check('role:db', 'pillar'), ['db1', 'web2'])
+
+    def test_unchanged_mtime(self):
+        # Changed within the mtime granularity of the filesystem
+        now = int(time.time())
+        pki_dir = os.path.join(self.opts['pki_dir'], 'minions')
+        datap = os.path.join(self.opts['cachedir'], 'minions', 'web2',
+                             'data.p')
+        for path in (pki_dir, datap):
+            os.utime(path, (now, now))
+        self.assertEqual(self.check('os:Ubuntu', 'grain'), ['db1', 'web1'])
+        self.add_minion('app1')
+        os.utime(pki_dir, (now, now))
+        self.assertEqual(self.check('os:Ubuntu', 'grain'),
+                         ['app1', 'db1', 'web1'])
+        self.write_data('web2', {'os': 'Ubuntu'}, {'role': 'web'})
+        os.utime(datap, (now, now))
+        self.assertEqual(self.check('os:Ubuntu', 'grain'),
+                         ['app1', 'db1', 'web1', 'web2'])
+
+    @skipIf(NO_MOCK, NO_MOCK_REASON)
+    def test_old_files(self):
+        # Files modified long ago are only read again once they change
+        old = time.time() - 3600
+        for path in (os.path.join(self.opts['pki_dir'], 'minions'),
+                     os.path.join(self.opts['cachedir'], 'minions', 'web1',
+                                  'data.p')):
+            os.utime(path, (old, old))
+        self.assertEqual(self.check('os:Ubuntu', 'grain'), ['db1', 'web1'])
+        index = self.ckminions.index
+        with patch('os.listdir', side_effect=AssertionError):
+            self.assertFalse(index.refresh_ids())
+        self.write_data('web1', {'os': 'CentOS'}, {})
+        os.utime(os.path.join(self.opts['cachedir'], 'minions', 'web1',
+                              'data.p'), (old, old))
+        self.assertEqual(self.check('os:Ubuntu', 'grain'), ['db1'])
+
+    def test_journal_rotation(self):
+        self.assertEqual(self.check('os:Ubuntu', 'grain'), ['db1', 'web1'])
+        orig = minions.INDEX_JOURNAL_MAX
+        minions.INDEX_JOURNAL_MAX = 0
+        try:
+            self.write_data('web2', {'os': 'Ubuntu'}, {})
+        finally:
+            minions.INDEX_JOURNAL_MAX = orig
+        self.assertEqual(
+            self.check('os:Ubuntu', 'grain'), ['db1', 'web1', 'web2']
+        )
+
+    def test_index_is_shared(self):
+        self.assertIs(
+            minions.CkMinions(self.opts).index, self.ckminions.index
+        )
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(CkMinionsTestCase, needs_daemon=False)
@@ -4,6 +4,7 @@ Test the verification routines
 '''
 
 # Import Python libs
+import gc
 import getpass
 import os
 import sys
@@ -133,6 +134,9 @@ class TestVerify(TestCase):
                 'raising this value.'
             )
 
+            # Release file descriptors held by garbage from earlier tests so
+            # that they do not count against the lowered limit below
+            gc.collect()
             mof_s, mof_h = resource.getrlimit(resource.RLIMIT_NOFILE)
             tempdir = tempfile.mkdtemp(prefix='fake-keys')
             keys_dir = os.path.join(tempdir, 'minions')
@@ -210,8 +214,8 @@ class TestVerify(TestCase):
                     self.skipTest('We\'ve hit the max open files setting')
                 raise
             finally:
-                shutil.rmtree(tempdir)
                 resource.setrlimit(resource.RLIMIT_NOFILE, (mof_s, mof_h))
+                shutil.rmtree(tempdir)
 
 
 if __name__ == '__main__':